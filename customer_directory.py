@@ -0,0 +1,108 @@
+import logging
+
+import db_operations
+import search_index
+
+
+class CustomerDirectory:
+    """
+    Process-wide, in-memory copy of the Customers table shared by every window.
+
+    It is read from the database once (load(), called at startup) and then kept current in place
+    by the add/update/delete customer functions in db_operations, which notify it after each
+    commit. Windows showing customers register a listener to refresh when it changes. Name
+    completion ranks the most active customers first (as of loading); names added later go last.
+    All methods must be called from the Tk thread.
+    """
+
+    def __init__(self):
+        self._customers = None  # CustomerID -> (CustomerID, name, contact, address), oldest first; None until loaded
+        self._order = {}  # CustomerID -> position in the list, higher is newer
+        self._next_order = 0
+        self._name_index = None  # search_index.PrefixIndex of names, most active first
+        self._text_index = None  # search_index.TrigramIndex over name, contact and address
+        self._listeners = []
+        db_operations.add_customer_listener(self._on_customer_change)
+
+    def load(self):
+        """(Re)reads every customer from the database and notifies the listeners."""
+        self._customers = {}
+        self._order = {}
+        self._text_index = search_index.TrigramIndex()
+        for order, customer in enumerate(reversed(db_operations.fetch_all_customers())):  # Oldest first
+            self._customers[customer[0]] = customer
+            self._order[customer[0]] = order
+            self._text_index.add(*customer)
+        self._next_order = len(self._order)
+        self._name_index = search_index.PrefixIndex(db_operations.fetch_customer_names_by_activity())
+        logging.info(f"Customer directory loaded ({len(self._customers)} customers).")
+        self._notify()
+
+    def _ensure_loaded(self):
+        if self._customers is None:
+            self.load()
+
+    def customers(self):
+        """Returns every customer as (CustomerID, name, contact, address), newest first."""
+        self._ensure_loaded()
+        return list(reversed(self._customers.values()))
+
+    def get(self, customer_id):
+        self._ensure_loaded()
+        return self._customers.get(customer_id)
+
+    def search(self, text):
+        """Returns the customers with text (any case) inside their name, contact or address, newest first."""
+        self._ensure_loaded()
+        matching_ids = sorted(self._text_index.search(text), key=self._order.__getitem__, reverse=True)
+        return [self._customers[customer_id] for customer_id in matching_ids]
+
+    def lookup_name(self, name):
+        """Returns the stored spelling of a customer name (any case), or None if there is no such customer."""
+        self._ensure_loaded()
+        return self._name_index.lookup(name)
+
+    def complete(self, prefix, limit=search_index.COMPLETION_LIMIT):
+        """Returns up to limit customer names starting with prefix (any case), most active first."""
+        self._ensure_loaded()
+        return self._name_index.complete(prefix, limit)
+
+    def add_listener(self, listener):
+        """Registers listener() to be called after every change to the directory."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _on_customer_change(self, action, customer_id, customer):
+        if self._customers is None:
+            return  # Not loaded yet; load() will read the change from the database
+        old_customer = self._customers.get(customer_id)
+        name_rank = None
+        if old_customer is not None:  # A rename keeps the customer's activity rank
+            name_rank = self._name_index.rank(old_customer[1])
+            self._name_index.remove(old_customer[1])
+        if action == "deleted":
+            self._customers.pop(customer_id, None)
+            self._order.pop(customer_id, None)
+            self._text_index.remove(customer_id)
+        else:
+            if old_customer is None:  # Newest: goes to the end, which customers() lists first
+                self._order[customer_id] = self._next_order
+                self._next_order += 1
+            self._customers[customer_id] = customer  # An update keeps its place in the list
+            self._text_index.add(*customer)
+            self._name_index.add(customer[1], name_rank)
+        self._notify()
+
+    def _notify(self):
+        for listener in list(self._listeners):
+            try:
+                listener()
+            except Exception:
+                logging.exception(f"Error notifying customer directory listener {listener!r}.")
+
+
+directory = CustomerDirectory()
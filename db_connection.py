@@ -0,0 +1,205 @@
+import sqlite3
+import threading
+import logging
+import configparser
+import os
+from contextlib import contextmanager
+
+# --- Connection Pool Settings ---
+STATEMENT_CACHE_SIZE = 256  # Prepared statements cached per connection (sqlite3 default is 128)
+MAX_READER_CONNECTIONS = 4  # Long-lived reader connections, each bound to one thread
+CONNECT_TIMEOUT = 5.0  # Seconds to wait on a locked database before raising
+
+# --- Durability / Performance Profiles ---
+# Applied to every pooled connection. WAL lets history readers run while the cashier's sale is written.
+# cache_size is negative KiB (SQLite convention); mmap_size is bytes; busy_timeout is milliseconds.
+DURABILITY_PROFILES = {
+    "safe": {  # fsync on every commit; survives power loss with no lost sales
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "mmap_size": 0,
+        "cache_size": -8000,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 10000,
+    },
+    "balanced": {  # WAL + NORMAL: a power cut may lose the last commits but never corrupts the file
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -32000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "fast": {  # No fsync; only for stations on a UPS or demo machines
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 2000,
+    },
+}
+DEFAULT_PROFILE = "balanced"
+
+# --- Config File ---
+# Optional INI file next to the database, e.g.:
+#   [database]
+#   profile = safe
+#   cache_size = -16000   ; any profile setting can be overridden individually
+CONFIG_FILENAME = "pos_config.ini"
+CONFIG_SECTION = "database"
+
+
+def load_durability_settings(config_path=CONFIG_FILENAME):
+    """
+    Reads the durability profile (and any per-setting overrides) from the config file.
+    Falls back to DEFAULT_PROFILE if the file is missing or names an unknown profile.
+    Returns a tuple: (profile_name, settings_dict).
+    """
+    profile_name = DEFAULT_PROFILE
+    overrides = {}
+    if os.path.exists(config_path):
+        parser = configparser.ConfigParser(inline_comment_prefixes=(";", "#"))
+        try:
+            parser.read(config_path, encoding="utf-8")
+        except configparser.Error as e:
+            logging.error(f"Could not parse config file '{config_path}': {e}. Using '{DEFAULT_PROFILE}' profile.")
+            parser = None
+        if parser is not None and parser.has_section(CONFIG_SECTION):
+            section = parser[CONFIG_SECTION]
+            requested = section.get("profile", DEFAULT_PROFILE).strip().lower()
+            if requested in DURABILITY_PROFILES:
+                profile_name = requested
+            else:
+                logging.warning(f"Unknown durability profile '{requested}' in '{config_path}'. "
+                                f"Using '{DEFAULT_PROFILE}'.")
+            for key, default in DURABILITY_PROFILES[DEFAULT_PROFILE].items():
+                if key in section:
+                    value = section[key].strip()
+                    # Numeric settings need integers, mode settings need words
+                    if isinstance(default, int) and value.lstrip("-").isdigit():
+                        overrides[key] = int(value)
+                    elif isinstance(default, str) and value.isalpha():
+                        overrides[key] = value.upper()
+                    else:
+                        logging.warning(f"Ignoring invalid value '{value}' for '{key}' in '{config_path}'.")
+    settings = dict(DURABILITY_PROFILES[profile_name])
+    settings.update(overrides)
+    logging.info(f"Using database durability profile '{profile_name}'"
+                 f"{f' with overrides {overrides}' if overrides else ''}.")
+    return profile_name, settings
+
+
+class ConnectionManager:
+    """
+    Keeps one long-lived writer connection plus a small pool of thread-affine
+    reader connections to a single SQLite database file.
+
+    Connections are opened lazily on first use and stay open until close_all()
+    is called, so callers no longer pay the open/parse-schema cost per query.
+    """
+
+    def __init__(self, database, settings=None, max_readers=MAX_READER_CONNECTIONS,
+                 cached_statements=STATEMENT_CACHE_SIZE):
+        self.database = database
+        self.settings = dict(settings) if settings else dict(DURABILITY_PROFILES[DEFAULT_PROFILE])
+        self.max_readers = max_readers
+        self.cached_statements = cached_statements
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._readers = {}  # thread ident -> (thread, connection)
+        self._readers_lock = threading.Lock()
+
+    def _connect(self, read_only=False):
+        """Opens and configures a new connection to the database."""
+        conn = sqlite3.connect(self.database, timeout=CONNECT_TIMEOUT, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.execute("PRAGMA foreign_keys = ON;")
+        self._apply_settings(conn, read_only)
+        if read_only:
+            conn.execute("PRAGMA query_only = ON;")  # Guard against accidental writes on reader connections
+        logging.debug(f"Opened {'reader' if read_only else 'writer'} connection to '{self.database}'.")
+        return conn
+
+    def _apply_settings(self, conn, read_only):
+        """Applies the durability/performance pragmas to a freshly opened connection."""
+        settings = self.settings
+        conn.execute(f"PRAGMA busy_timeout = {int(settings['busy_timeout'])};")
+        if not read_only:
+            # journal_mode is persistent in the file and needs write access, so only the writer sets it.
+            mode = conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']};").fetchone()[0]
+            if mode.upper() != str(settings['journal_mode']).upper():
+                logging.warning(f"Requested journal_mode={settings['journal_mode']} but database is using '{mode}'.")
+        conn.execute(f"PRAGMA synchronous = {settings['synchronous']};")
+        conn.execute(f"PRAGMA mmap_size = {int(settings['mmap_size'])};")
+        conn.execute(f"PRAGMA cache_size = {int(settings['cache_size'])};")
+        conn.execute(f"PRAGMA temp_store = {settings['temp_store']};")
+
+    @contextmanager
+    def writer(self):
+        """
+        Borrows the shared writer connection for the duration of the block.
+        Writers are serialized; an exception inside the block rolls back any open transaction.
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            if conn.in_transaction:
+                # Never leak an uncommitted transaction to the next borrower.
+                logging.warning("Writer connection returned with an open transaction; rolling back.")
+                conn.rollback()
+
+    @contextmanager
+    def reader(self):
+        """
+        Borrows the calling thread's reader connection for the duration of the block.
+        Threads beyond the pool size get a short-lived connection that is closed afterwards.
+        """
+        conn, transient = self._reader_for_current_thread()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if transient:
+                conn.close()
+
+    def _reader_for_current_thread(self):
+        ident = threading.get_ident()
+        entry = self._readers.get(ident)
+        if entry is not None and entry[0] is threading.current_thread():
+            return entry[1], False
+        with self._readers_lock:
+            self._prune_dead_readers()
+            if len(self._readers) < self.max_readers:
+                conn = self._connect(read_only=True)
+                self._readers[ident] = (threading.current_thread(), conn)
+                return conn, False
+        logging.debug("Reader pool exhausted; using a transient connection.")
+        return self._connect(read_only=True), True
+
+    def _prune_dead_readers(self):
+        """Closes reader connections whose owning thread has exited. Caller holds _readers_lock."""
+        for ident, (thread, conn) in list(self._readers.items()):
+            if not thread.is_alive():
+                conn.close()
+                del self._readers[ident]
+
+    def close_all(self):
+        """Closes every pooled connection. Call when no queries are in flight (shutdown, restore)."""
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            for _, conn in self._readers.values():
+                conn.close()
+            self._readers.clear()
+        logging.info(f"Closed all pooled connections to '{self.database}'.")
@@ -0,0 +1,115 @@
+import queue
+import logging
+import concurrent.futures
+
+# --- Executor Settings ---
+# Kept at or below db_connection.MAX_READER_CONNECTIONS so every worker keeps a pooled reader.
+MAX_QUERY_WORKERS = 2
+POLL_INTERVAL_MS = 25  # How often the Tk thread checks for finished queries while any are pending
+
+
+class QueryExecutor:
+    """
+    Runs slow db_operations calls on worker threads so a window's Tk event loop never blocks.
+
+    Each request is submitted under a key (usually the widget it fills). Results come back on the
+    Tk thread through widget.after(), in the on_done/on_error callbacks. A newer request for the
+    same key supersedes the older one: if the older one has not started it is cancelled, and if
+    it is already running its result is discarded when it arrives.
+
+    Long jobs can report progress: with on_progress, func also gets a progress_callback keyword
+    argument, callable from the worker, whose values reach on_progress on the Tk thread.
+    """
+
+    def __init__(self, widget, max_workers=MAX_QUERY_WORKERS, poll_interval_ms=POLL_INTERVAL_MS):
+        self.widget = widget
+        self.poll_interval_ms = poll_interval_ms
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                           thread_name_prefix="db-query")
+        self._finished = queue.Queue()  # (key, generation, event, payload), filled by worker threads
+        self._current = {}  # key -> (generation, future, on_done, on_error, on_progress) of the latest request
+        self._generation = 0
+        self._poll_job = None
+        self._closed = False
+
+    def submit(self, key, func, *args, on_done=None, on_error=None, on_progress=None, **kwargs):
+        """
+        Runs func(*args, **kwargs) on a worker thread. on_done(result) or on_error(exception) is
+        then called on the Tk thread, unless another submit() or cancel() for key came first.
+        With on_progress, func is also passed progress_callback (see the class docstring).
+        Must be called from the Tk thread.
+        """
+        if self._closed:
+            logging.warning(f"Query '{key}' submitted after the executor was shut down; ignored.")
+            return
+        self.cancel(key)
+        self._generation += 1
+        generation = self._generation
+        if on_progress is not None:
+            kwargs["progress_callback"] = lambda value: self._finished.put((key, generation, "progress", value))
+        future = self._pool.submit(func, *args, **kwargs)
+        self._current[key] = (generation, future, on_done, on_error, on_progress)
+        future.add_done_callback(lambda done: self._finished.put((key, generation, "done", done)))
+        self._schedule_poll()
+
+    def cancel(self, key):
+        """Drops the pending request for key, if any. Its callbacks will not be called."""
+        current = self._current.pop(key, None)
+        if current is not None:
+            current[1].cancel()  # Only succeeds if the query has not started yet
+
+    def is_pending(self, key):
+        return key in self._current
+
+    def shutdown(self):
+        """Stops polling and discards all pending results. Call when the owning window is destroyed."""
+        self._closed = True
+        if self._poll_job is not None:
+            try:
+                self.widget.after_cancel(self._poll_job)
+            except Exception:
+                pass  # The widget may already be gone
+            self._poll_job = None
+        for key in list(self._current):
+            self.cancel(key)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule_poll(self):
+        if self._poll_job is None and not self._closed:
+            self._poll_job = self.widget.after(self.poll_interval_ms, self._poll)
+
+    def _poll(self):
+        """Delivers finished results on the Tk thread, then keeps polling while requests are pending."""
+        self._poll_job = None
+        while True:
+            try:
+                key, generation, event, payload = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            current = self._current.get(key)
+            if current is None or current[0] != generation:
+                continue  # Superseded or cancelled
+            _, _, on_done, on_error, on_progress = current
+            if event == "progress":
+                try:
+                    on_progress(payload)
+                except Exception:
+                    logging.exception(f"Error reporting progress of background query '{key}'.")
+                continue
+            del self._current[key]
+            future = payload
+            if future.cancelled():
+                continue
+            error = future.exception()
+            try:
+                if error is not None:
+                    if on_error is not None:
+                        on_error(error)
+                    else:
+                        logging.error(f"Background query '{key}' failed: {error!r}")
+                elif on_done is not None:
+                    on_done(future.result())
+            except Exception:
+                logging.exception(f"Error delivering result of background query '{key}'.")
+        if self._current:
+            self._schedule_poll()
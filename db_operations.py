@@ -1,195 +1,1254 @@
 import sqlite3
 import os
+import csv
+import shutil
+import json
 import datetime
+import threading
 from tkinter import messagebox # Keep messagebox import here for DB errors shown directly
 import logging # Assuming logging is used elsewhere
 
+import db_connection
+
 # --- Constants ---
 CURRENCY_SYMBOL = "₱" # This is also in gui_utils.py, ensure consistency or single source
 DATABASE_FILENAME = "pos_system.db" # database file
 
 # --- Default Product Data (Used if DB is empty initially) ---
 # Ensure key products used in UI/logic exist here if DB is new
+# Money is stored as integer cents throughout (7500 == ₱75.00); gui_utils formats it for display.
 DEFAULT_PRODUCTS = {
-    "Sample Prod": 75.00,
-    "Sample Prod 1": 35.00,
-    "Sample Prod 2": 60.00,
-    "Very Long Product Name Example": 100.00, # Example for testing layout
-    "Refill (20)": 20.00,
-    "Refill (25)": 25.00,
-    "Custom Sale": 0.00, # Placeholder, price usually overridden
-    "Container": 200.00,
-    "Ice Cubes (1kg)": 20.00, # Add other products as needed
+    "Sample Prod": 7500,
+    "Sample Prod 1": 3500,
+    "Sample Prod 2": 6000,
+    "Very Long Product Name Example": 10000, # Example for testing layout
+    "Refill (20)": 2000,
+    "Refill (25)": 2500,
+    "Custom Sale": 0, # Placeholder, price usually overridden
+    "Container": 20000,
+    "Ice Cubes (1kg)": 2000, # Add other products as needed
+}
+
+# --- Shared Connection Pool ---
+# One long-lived writer plus thread-affine readers; every function below borrows from it.
+# Pragmas (WAL, synchronous, cache sizes...) come from the profile selected in pos_config.ini.
+DURABILITY_PROFILE, _durability_settings = db_connection.load_durability_settings()
+_connections = db_connection.ConnectionManager(DATABASE_FILENAME, settings=_durability_settings)
+
+# --- Managed Index Set ---
+# Secondary indexes backing the report queries. Created by migrate_indexes() and
+# verified by check_report_query_plans(). Timestamps are ISO strings, so range filters sort correctly.
+MANAGED_INDEXES = {
+    # Date-range reports (fetch_sales_stats, summaries); TotalCents makes the SUM index-only.
+    # SaleID also orders the newest-first history pages, keyset on (SaleTimestamp, SaleID).
+    "idx_sales_timestamp":
+        "CREATE INDEX IF NOT EXISTS idx_sales_timestamp ON Sales (SaleTimestamp, SaleID, TotalCents)",
+    # Case-insensitive customer lookups over a date range; covering for per-customer totals
+    "idx_sales_customer_timestamp":
+        "CREATE INDEX IF NOT EXISTS idx_sales_customer_timestamp "
+        "ON Sales (CustomerName COLLATE NOCASE, SaleTimestamp, TotalCents)",
+    # Customer purchase history by ID (and the rename/ON DELETE SET NULL lookups from Customers)
+    "idx_sales_customer_id":
+        "CREATE INDEX IF NOT EXISTS idx_sales_customer_id ON Sales (CustomerID, SaleTimestamp)",
+    # Sales -> SaleItems join (and the ON DELETE CASCADE lookup)
+    "idx_saleitems_sale_product":
+        "CREATE INDEX IF NOT EXISTS idx_saleitems_sale_product ON SaleItems (SaleID, ProductID)",
+    # Products -> SaleItems lookup when a product is deleted (name snapshot + ON DELETE SET NULL)
+    "idx_saleitems_product":
+        "CREATE INDEX IF NOT EXISTS idx_saleitems_product ON SaleItems (ProductID)",
+}
+
+# --- Daily Rollup Tables ---
+# Per-day totals kept current by triggers on Sales/SaleItems, so whole-day report ranges
+# read one row per day instead of every sale. SaleDate is the 'YYYY-MM-DD' prefix of SaleTimestamp.
+# Created and backfilled by migrate_rollups(). Sales/SaleItems rows are only ever inserted or
+# deleted by the app (customer/product snapshot names aside, which the rollups do not depend on),
+# so INSERT/DELETE triggers are enough to keep them exact.
+# DailyProductSales is keyed like SaleItems: (ProductID, '') for live products, so renames need
+# no rollup changes, and (0, name snapshot) for items whose product was deleted or never matched.
+ROLLUP_TABLES = {
+    "DailySales": """
+        CREATE TABLE IF NOT EXISTS DailySales (
+            SaleDate TEXT PRIMARY KEY,
+            RevenueCents INTEGER NOT NULL DEFAULT 0,
+            SaleCount INTEGER NOT NULL DEFAULT 0,
+            ItemCount INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """,
+    "DailyProductSales": """
+        CREATE TABLE IF NOT EXISTS DailyProductSales (
+            SaleDate TEXT NOT NULL,
+            ProductID INTEGER NOT NULL DEFAULT 0,
+            ProductName TEXT NOT NULL DEFAULT '',
+            Quantity INTEGER NOT NULL DEFAULT 0,
+            RevenueCents INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (SaleDate, ProductID, ProductName)
+        ) WITHOUT ROWID
+    """,
+}
+
+ROLLUP_TRIGGERS = {
+    # New sale header: one more sale and its total on that day
+    "trg_sales_rollup_insert": """
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_insert AFTER INSERT ON Sales
+        BEGIN
+            INSERT OR IGNORE INTO DailySales (SaleDate) VALUES (substr(NEW.SaleTimestamp, 1, 10));
+            UPDATE DailySales
+            SET RevenueCents = RevenueCents + NEW.TotalCents, SaleCount = SaleCount + 1
+            WHERE SaleDate = substr(NEW.SaleTimestamp, 1, 10);
+        END
+    """,
+    # New line item: the day comes from its (already inserted) sale header
+    "trg_saleitems_rollup_insert": """
+        CREATE TRIGGER IF NOT EXISTS trg_saleitems_rollup_insert AFTER INSERT ON SaleItems
+        BEGIN
+            UPDATE DailySales
+            SET ItemCount = ItemCount + NEW.Quantity
+            WHERE SaleDate = (SELECT substr(SaleTimestamp, 1, 10) FROM Sales WHERE SaleID = NEW.SaleID);
+            INSERT OR IGNORE INTO DailyProductSales (SaleDate, ProductID, ProductName)
+            SELECT substr(SaleTimestamp, 1, 10), IFNULL(NEW.ProductID, 0), IFNULL(NEW.ProductName, '')
+            FROM Sales WHERE SaleID = NEW.SaleID;
+            UPDATE DailyProductSales
+            SET Quantity = Quantity + NEW.Quantity, RevenueCents = RevenueCents + NEW.SubtotalCents
+            WHERE SaleDate = (SELECT substr(SaleTimestamp, 1, 10) FROM Sales WHERE SaleID = NEW.SaleID)
+              AND ProductID = IFNULL(NEW.ProductID, 0) AND ProductName = IFNULL(NEW.ProductName, '');
+        END
+    """,
+    # Sale deleted: subtract the header and all of its items while the items still exist.
+    # The ON DELETE CASCADE that follows is ignored by trg_saleitems_rollup_delete.
+    "trg_sales_rollup_delete": """
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_delete BEFORE DELETE ON Sales
+        BEGIN
+            UPDATE DailyProductSales
+            SET Quantity = Quantity - (SELECT SUM(Quantity) FROM SaleItems
+                                       WHERE SaleID = OLD.SaleID
+                                         AND IFNULL(ProductID, 0) = DailyProductSales.ProductID
+                                         AND IFNULL(ProductName, '') = DailyProductSales.ProductName),
+                RevenueCents = RevenueCents - (SELECT SUM(SubtotalCents) FROM SaleItems
+                                               WHERE SaleID = OLD.SaleID
+                                                 AND IFNULL(ProductID, 0) = DailyProductSales.ProductID
+                                                 AND IFNULL(ProductName, '') = DailyProductSales.ProductName)
+            WHERE SaleDate = substr(OLD.SaleTimestamp, 1, 10)
+              AND (ProductID, ProductName) IN (SELECT IFNULL(ProductID, 0), IFNULL(ProductName, '')
+                                               FROM SaleItems WHERE SaleID = OLD.SaleID);
+            DELETE FROM DailyProductSales WHERE SaleDate = substr(OLD.SaleTimestamp, 1, 10) AND Quantity <= 0;
+            UPDATE DailySales
+            SET RevenueCents = RevenueCents - OLD.TotalCents,
+                SaleCount = SaleCount - 1,
+                ItemCount = ItemCount - COALESCE((SELECT SUM(Quantity) FROM SaleItems WHERE SaleID = OLD.SaleID), 0)
+            WHERE SaleDate = substr(OLD.SaleTimestamp, 1, 10);
+            DELETE FROM DailySales WHERE SaleDate = substr(OLD.SaleTimestamp, 1, 10) AND SaleCount <= 0;
+        END
+    """,
+    # Single item deleted from a sale that still exists (cascaded deletes were handled above)
+    "trg_saleitems_rollup_delete": """
+        CREATE TRIGGER IF NOT EXISTS trg_saleitems_rollup_delete AFTER DELETE ON SaleItems
+        WHEN EXISTS (SELECT 1 FROM Sales WHERE SaleID = OLD.SaleID)
+        BEGIN
+            UPDATE DailySales
+            SET ItemCount = ItemCount - OLD.Quantity
+            WHERE SaleDate = (SELECT substr(SaleTimestamp, 1, 10) FROM Sales WHERE SaleID = OLD.SaleID);
+            UPDATE DailyProductSales
+            SET Quantity = Quantity - OLD.Quantity, RevenueCents = RevenueCents - OLD.SubtotalCents
+            WHERE SaleDate = (SELECT substr(SaleTimestamp, 1, 10) FROM Sales WHERE SaleID = OLD.SaleID)
+              AND ProductID = IFNULL(OLD.ProductID, 0) AND ProductName = IFNULL(OLD.ProductName, '');
+            DELETE FROM DailyProductSales
+            WHERE SaleDate = (SELECT substr(SaleTimestamp, 1, 10) FROM Sales WHERE SaleID = OLD.SaleID)
+              AND ProductID = IFNULL(OLD.ProductID, 0) AND ProductName = IFNULL(OLD.ProductName, '')
+              AND Quantity <= 0;
+        END
+    """,
+    # Product deleted: its SaleItems switch to a name snapshot (trg_products_snapshot_delete),
+    # so move its rollup rows to the matching (0, name) key, merging with any existing ones.
+    "trg_products_rollup_delete": """
+        CREATE TRIGGER IF NOT EXISTS trg_products_rollup_delete BEFORE DELETE ON Products
+        BEGIN
+            INSERT INTO DailyProductSales (SaleDate, ProductID, ProductName, Quantity, RevenueCents)
+            SELECT SaleDate, 0, OLD.ProductName, Quantity, RevenueCents
+            FROM DailyProductSales WHERE ProductID = OLD.ProductID
+            ON CONFLICT (SaleDate, ProductID, ProductName) DO UPDATE
+            SET Quantity = Quantity + excluded.Quantity, RevenueCents = RevenueCents + excluded.RevenueCents;
+            DELETE FROM DailyProductSales WHERE ProductID = OLD.ProductID;
+        END
+    """,
+}
+
+# --- Report Result Cache ---
+# fetch_sales_stats() and fetch_product_summary_by_date_range() results for ranges that ended
+# before today, stored as JSON so they survive restarts. A past range only changes when one of its
+# sales is added (back-dated), edited or deleted, or a product is renamed; the triggers below then
+# drop just the cached ranges containing that sale. Generation counts those changes, so a result
+# computed before a change is never stored after it. Created by migrate_report_cache().
+REPORT_CACHE_TABLES = {
+    "ReportCache": """
+        CREATE TABLE IF NOT EXISTS ReportCache (
+            QueryName TEXT NOT NULL,
+            RangeStart TEXT NOT NULL,
+            RangeEnd TEXT NOT NULL,
+            CustomerName TEXT NOT NULL DEFAULT '',
+            ResultJSON TEXT NOT NULL,
+            PRIMARY KEY (QueryName, RangeStart, RangeEnd, CustomerName)
+        ) WITHOUT ROWID
+    """,
+    "ReportCacheState": """
+        CREATE TABLE IF NOT EXISTS ReportCacheState (
+            StateID INTEGER PRIMARY KEY CHECK (StateID = 1),
+            Generation INTEGER NOT NULL DEFAULT 0
+        )
+    """,
+}
+
+def _report_cache_invalidation_sql(timestamp_sql):
+    """Trigger body statements dropping the cached ranges that contain timestamp_sql."""
+    return f"""
+            DELETE FROM ReportCache WHERE RangeStart <= {timestamp_sql} AND RangeEnd > {timestamp_sql};
+            UPDATE ReportCacheState SET Generation = Generation + 1;"""
+
+_SALE_ITEM_TIMESTAMP_SQL = "(SELECT SaleTimestamp FROM Sales WHERE SaleID = {row}.SaleID)"
+
+REPORT_CACHE_TRIGGERS = {
+    "trg_sales_cache_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_sales_cache_insert AFTER INSERT ON Sales
+        BEGIN{_report_cache_invalidation_sql("NEW.SaleTimestamp")}
+        END
+    """,
+    "trg_sales_cache_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_sales_cache_delete AFTER DELETE ON Sales
+        BEGIN{_report_cache_invalidation_sql("OLD.SaleTimestamp")}
+        END
+    """,
+    # Also covers customer renames, which rewrite the Sales.CustomerName snapshots
+    "trg_sales_cache_update": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_sales_cache_update
+        AFTER UPDATE OF SaleTimestamp, TotalCents, CustomerName, CustomerID ON Sales
+        BEGIN{_report_cache_invalidation_sql("OLD.SaleTimestamp")}{_report_cache_invalidation_sql("NEW.SaleTimestamp")}
+        END
+    """,
+    "trg_saleitems_cache_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_saleitems_cache_insert AFTER INSERT ON SaleItems
+        BEGIN{_report_cache_invalidation_sql(_SALE_ITEM_TIMESTAMP_SQL.format(row="NEW"))}
+        END
+    """,
+    "trg_saleitems_cache_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_saleitems_cache_delete AFTER DELETE ON SaleItems
+        BEGIN{_report_cache_invalidation_sql(_SALE_ITEM_TIMESTAMP_SQL.format(row="OLD"))}
+        END
+    """,
+    # Product summaries show the current product name, so a rename affects every cached one
+    "trg_products_cache_rename": """
+        CREATE TRIGGER IF NOT EXISTS trg_products_cache_rename AFTER UPDATE OF ProductName ON Products
+        BEGIN
+            DELETE FROM ReportCache WHERE QueryName = 'product_summary';
+            UPDATE ReportCacheState SET Generation = Generation + 1;
+        END
+    """,
+}
+
+# --- Full-Text Search Index ---
+# FTS5 word-prefix search over customers (name, contact, address) and receipts (customer name and
+# the names of the products on them), kept in step by the triggers below and created by
+# migrate_search_index(). CustomerSearch reads its text from Customers (external content), so it
+# only stores the index; SaleSearch stores each receipt's product names, keyed by SaleID.
+# SQLite builds without FTS5 skip these objects and searches fall back to LIKE scans.
+SEARCH_RESULT_LIMIT = 100 # Default row limit for search_customers() and search_sales()
+_search_index_ready = False # Set by initialize_db() once the FTS5 tables are known to exist
+
+SEARCH_TABLES = {
+    "CustomerSearch": """
+        CREATE VIRTUAL TABLE IF NOT EXISTS CustomerSearch USING fts5(
+            CustomerName, ContactNumber, Address,
+            content='Customers', content_rowid='CustomerID', prefix='2 3'
+        )
+    """,
+    "SaleSearch": """
+        CREATE VIRTUAL TABLE IF NOT EXISTS SaleSearch USING fts5(CustomerName, ProductNames, prefix='2 3')
+    """,
 }
 
+# Product names on one receipt, current name first and the deleted-product snapshot otherwise
+_SALE_PRODUCT_NAMES_SQL = """(SELECT group_concat(COALESCE(p.ProductName, si.ProductName), ' ')
+                                  FROM SaleItems si LEFT JOIN Products p ON p.ProductID = si.ProductID
+                                  WHERE si.SaleID = {sale_id})"""
+
+_CUSTOMER_SEARCH_DELETE_SQL = """
+            INSERT INTO CustomerSearch (CustomerSearch, rowid, CustomerName, ContactNumber, Address)
+            VALUES ('delete', OLD.CustomerID, OLD.CustomerName, OLD.ContactNumber, OLD.Address);"""
+_CUSTOMER_SEARCH_INSERT_SQL = """
+            INSERT INTO CustomerSearch (rowid, CustomerName, ContactNumber, Address)
+            VALUES (NEW.CustomerID, NEW.CustomerName, NEW.ContactNumber, NEW.Address);"""
+
+SEARCH_TRIGGERS = {
+    "trg_customers_search_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_customers_search_insert AFTER INSERT ON Customers
+        BEGIN{_CUSTOMER_SEARCH_INSERT_SQL}
+        END
+    """,
+    # External content tables must be told the old text to remove it from the index
+    "trg_customers_search_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_customers_search_delete AFTER DELETE ON Customers
+        BEGIN{_CUSTOMER_SEARCH_DELETE_SQL}
+        END
+    """,
+    "trg_customers_search_update": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_customers_search_update
+        AFTER UPDATE OF CustomerName, ContactNumber, Address ON Customers
+        BEGIN{_CUSTOMER_SEARCH_DELETE_SQL}{_CUSTOMER_SEARCH_INSERT_SQL}
+        END
+    """,
+    # The header is saved before its items, which fill in ProductNames as they arrive
+    "trg_sales_search_insert": """
+        CREATE TRIGGER IF NOT EXISTS trg_sales_search_insert AFTER INSERT ON Sales
+        BEGIN
+            INSERT INTO SaleSearch (rowid, CustomerName, ProductNames) VALUES (NEW.SaleID, NEW.CustomerName, '');
+        END
+    """,
+    "trg_sales_search_delete": """
+        CREATE TRIGGER IF NOT EXISTS trg_sales_search_delete AFTER DELETE ON Sales
+        BEGIN
+            DELETE FROM SaleSearch WHERE rowid = OLD.SaleID;
+        END
+    """,
+    # Customer renames rewrite the Sales.CustomerName snapshots (trg_customers_rename)
+    "trg_sales_search_update": """
+        CREATE TRIGGER IF NOT EXISTS trg_sales_search_update AFTER UPDATE OF CustomerName ON Sales
+        BEGIN
+            UPDATE SaleSearch SET CustomerName = NEW.CustomerName WHERE rowid = NEW.SaleID;
+        END
+    """,
+    "trg_saleitems_search_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_saleitems_search_insert AFTER INSERT ON SaleItems
+        BEGIN
+            UPDATE SaleSearch SET ProductNames = {_SALE_PRODUCT_NAMES_SQL.format(sale_id="NEW.SaleID")}
+            WHERE rowid = NEW.SaleID;
+        END
+    """,
+    # Items cascaded from a deleted sale find no SaleSearch row left to update
+    "trg_saleitems_search_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_saleitems_search_delete AFTER DELETE ON SaleItems
+        BEGIN
+            UPDATE SaleSearch SET ProductNames = IFNULL({_SALE_PRODUCT_NAMES_SQL.format(sale_id="OLD.SaleID")}, '')
+            WHERE rowid = OLD.SaleID;
+        END
+    """,
+    # A deleted product's items keep its name as a snapshot, so only renames change the text
+    "trg_products_search_rename": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_products_search_rename AFTER UPDATE OF ProductName ON Products
+        BEGIN
+            UPDATE SaleSearch SET ProductNames = {_SALE_PRODUCT_NAMES_SQL.format(sale_id="SaleSearch.rowid")}
+            WHERE rowid IN (SELECT SaleID FROM SaleItems WHERE ProductID = NEW.ProductID);
+        END
+    """,
+}
+
+# --- Report Query SQL ---
+# Shared by the fetch functions and check_report_query_plans() so the checked plan is the one that runs.
+# Customer filters use COLLATE NOCASE so they can seek idx_sales_customer_timestamp.
+# Product summaries group line items by the name shown: the product's current one, or the
+# SaleItems snapshot for products that were deleted. A product deleted and added again under
+# the same name therefore still gets a single row.
+_CUSTOMER_FILTER_SQL = " AND CustomerName = ? COLLATE NOCASE"
+
+def _sales_stats_sql(filter_by_customer=False):
+    """Returns the (totals, item count) queries used by fetch_sales_stats."""
+    customer_filter_sql = _CUSTOMER_FILTER_SQL if filter_by_customer else ""
+    query_sales = ("SELECT COALESCE(SUM(TotalCents), 0), COUNT(SaleID) "
+                   f"FROM Sales WHERE SaleTimestamp >= ? AND SaleTimestamp < ?{customer_filter_sql}")
+    query_items = ("SELECT COALESCE(SUM(Quantity), 0) "
+                   "FROM SaleItems JOIN Sales ON SaleItems.SaleID = Sales.SaleID "
+                   f"WHERE Sales.SaleTimestamp >= ? AND Sales.SaleTimestamp < ?{customer_filter_sql}")
+    return query_sales, query_items
+
+def _product_summary_sql(filter_by_customer=False):
+    """Returns the per-product aggregate query used by the product summary reports."""
+    customer_filter_sql = _CUSTOMER_FILTER_SQL if filter_by_customer else ""
+    return f"""
+        SELECT
+            COALESCE(p.ProductName, si.ProductName) as ProductName,
+            SUM(si.Quantity) as TotalQuantity,
+            SUM(si.SubtotalCents) as TotalRevenue
+        FROM SaleItems si
+        JOIN Sales s ON si.SaleID = s.SaleID
+        LEFT JOIN Products p ON p.ProductID = si.ProductID
+        WHERE s.SaleTimestamp >= ? AND s.SaleTimestamp < ?{customer_filter_sql}
+        GROUP BY COALESCE(p.ProductName, si.ProductName)
+        ORDER BY ProductName COLLATE NOCASE
+    """
+
+# Whole days [first_day, end_day) straight from the rollup table
+_ROLLUP_SALES_STATS_SQL = """
+    SELECT COALESCE(SUM(RevenueCents), 0), COALESCE(SUM(ItemCount), 0), COALESCE(SUM(SaleCount), 0)
+    FROM DailySales
+    WHERE SaleDate >= ? AND SaleDate < ?
+"""
+
+def _dashboard_sql(period_count):
+    """
+    Returns the fetch_dashboard_stats query: one pass over the DailySales days spanning every
+    period, with (revenue, items, sales) columns per period from conditional aggregation.
+    Takes (start, end) for each of the three columns of each period, then the overall range.
+    """
+    columns = []
+    for _ in range(period_count):
+        for column in ("RevenueCents", "ItemCount", "SaleCount"):
+            columns.append(f"COALESCE(SUM(CASE WHEN SaleDate >= ? AND SaleDate < ? THEN {column} END), 0)")
+    return f"""
+        SELECT {', '.join(columns)}
+        FROM DailySales
+        WHERE SaleDate >= ? AND SaleDate < ?
+    """
+
+# Bucket-start expressions over DailySales.SaleDate for fetch_sales_buckets()
+SALES_BUCKET_KEYS = {
+    "day": "SaleDate",
+    # strftime('%w') is 0 for Sunday, so this steps back to the Monday of the ISO week
+    "week": "date(SaleDate, '-' || ((CAST(strftime('%w', SaleDate) AS INTEGER) + 6) % 7) || ' days')",
+    "month": "substr(SaleDate, 1, 7) || '-01'",
+}
+
+def _sales_buckets_sql(bucket):
+    """Returns the GROUP BY query used by fetch_sales_buckets for one bucket size."""
+    return f"""
+        SELECT
+            {SALES_BUCKET_KEYS[bucket]} AS BucketStart,
+            SUM(RevenueCents),
+            SUM(ItemCount),
+            SUM(SaleCount)
+        FROM DailySales
+        WHERE SaleDate >= ? AND SaleDate < ?
+        GROUP BY BucketStart
+        ORDER BY BucketStart
+    """
+
+def _rollup_product_summary_sql(partial_range_count=0):
+    """
+    Returns the product summary query that reads whole days from DailyProductSales and
+    unions in raw SaleItems for each partial-day timestamp range.
+    """
+    raw_branches = "".join("""
+            UNION ALL
+            SELECT IFNULL(si.ProductID, 0), IFNULL(si.ProductName, ''), si.Quantity, si.SubtotalCents
+            FROM SaleItems si
+            JOIN Sales s ON si.SaleID = s.SaleID
+            WHERE s.SaleTimestamp >= ? AND s.SaleTimestamp < ?""" for _ in range(partial_range_count))
+    return f"""
+        SELECT
+            COALESCE(p.ProductName, d.ProductName) as ProductName,
+            SUM(d.Quantity) as TotalQuantity,
+            SUM(d.RevenueCents) as TotalRevenue
+        FROM (
+            SELECT ProductID, ProductName, Quantity, RevenueCents
+            FROM DailyProductSales
+            WHERE SaleDate >= ? AND SaleDate < ?{raw_branches}
+        ) d
+        LEFT JOIN Products p ON p.ProductID = d.ProductID
+        GROUP BY COALESCE(p.ProductName, d.ProductName)
+        ORDER BY ProductName COLLATE NOCASE
+    """
+
+_CUSTOMER_PURCHASES_BY_DATE_SQL = """
+    SELECT
+        s.SaleTimestamp,
+        COALESCE(p.ProductName, si.ProductName),
+        si.Quantity,
+        si.PriceAtSaleCents,
+        si.SubtotalCents
+    FROM SaleItems si
+    JOIN Sales s ON si.SaleID = s.SaleID
+    LEFT JOIN Products p ON p.ProductID = si.ProductID
+    WHERE s.CustomerID = ?
+      AND s.SaleTimestamp >= ?
+      AND s.SaleTimestamp < ?
+    ORDER BY s.SaleTimestamp ASC -- Show oldest first for history
+"""
+
+# Sales of a deleted customer (CustomerID NULL) are grouped by their name snapshot
+_SALES_SUMMARY_BY_CUSTOMER_SQL = """
+    SELECT
+        COALESCE(c.CustomerName, s.CustomerName) as CustomerName,
+        SUM(s.TotalCents) as TotalSales
+    FROM Sales s
+    LEFT JOIN Customers c ON c.CustomerID = s.CustomerID
+    WHERE s.SaleTimestamp >= ? AND s.SaleTimestamp < ?
+    GROUP BY s.CustomerID, CASE WHEN s.CustomerID IS NULL THEN lower(s.CustomerName) END
+    ORDER BY CustomerName COLLATE NOCASE -- Order case-insensitively
+"""
+
+_ALL_CUSTOMER_PURCHASES_SQL = """
+    SELECT
+        s.SaleTimestamp,
+        COALESCE(p.ProductName, si.ProductName),
+        si.Quantity,
+        si.PriceAtSaleCents,
+        si.SubtotalCents
+    FROM SaleItems si
+    JOIN Sales s ON si.SaleID = s.SaleID
+    LEFT JOIN Products p ON p.ProductID = si.ProductID
+    WHERE s.CustomerID = ?
+    ORDER BY s.SaleTimestamp ASC -- Show oldest first for history
+"""
+
+CUSTOMER_HISTORY_PAGE_SIZE = 100 # Line items per fetch_customer_purchase_page() call
+
+def _customer_purchases_page_sql(after_key=False):
+    """
+    Returns the newest-first customer purchase history page query used by fetch_customer_purchase_page.
+    Pages are keyset on (SaleTimestamp, SaleItemID); the timestamp bound is kept separate so the
+    customer's idx_sales_customer_id range is cut at the cursor instead of being filtered row by row.
+    """
+    keyset_sql = " AND s.SaleTimestamp <= ? AND (s.SaleTimestamp < ? OR si.SaleItemID < ?)" if after_key else ""
+    return f"""
+        SELECT
+            s.SaleTimestamp,
+            COALESCE(p.ProductName, si.ProductName),
+            si.Quantity,
+            si.PriceAtSaleCents,
+            si.SubtotalCents,
+            si.SaleItemID
+        FROM Sales s
+        JOIN SaleItems si ON si.SaleID = s.SaleID
+        LEFT JOIN Products p ON p.ProductID = si.ProductID
+        WHERE s.CustomerID = ?{keyset_sql}
+        ORDER BY s.SaleTimestamp DESC, si.SaleItemID DESC
+        LIMIT ?
+    """
+
+# Lifetime totals plus the product bought in the largest quantity (most recently bought on a tie)
+_CUSTOMER_PURCHASE_SUMMARY_SQL = """
+    SELECT
+        COALESCE(SUM(s.TotalCents), 0),
+        COUNT(*),
+        MAX(s.SaleTimestamp),
+        (SELECT COALESCE(p.ProductName, si.ProductName)
+         FROM Sales fs
+         JOIN SaleItems si ON si.SaleID = fs.SaleID
+         LEFT JOIN Products p ON p.ProductID = si.ProductID
+         WHERE fs.CustomerID = ?
+         GROUP BY IFNULL(si.ProductID, 0), IFNULL(si.ProductName, '')
+         ORDER BY SUM(si.Quantity) DESC, MAX(fs.SaleTimestamp) DESC
+         LIMIT 1)
+    FROM Sales s
+    WHERE s.CustomerID = ?
+"""
+
+SALES_PAGE_SIZE = 200 # Rows per fetch_sales_page() call
+
+# Search filters accepted by fetch_sales_page() and fetch_sales_since(); every key is optional:
+#   customer_prefix: case-insensitive start of CustomerName, searched as a NOCASE range so it
+#                    seeks idx_sales_customer_timestamp instead of scanning
+#   start_dt, end_dt_exclusive: ISO timestamp range
+#   min_total_cents, max_total_cents: inclusive TotalCents range
+#   sale_id: a single SaleID
+#   text: words that must each start a word of the customer or a product name on the receipt,
+#         looked up in the SaleSearch full-text index
+SALES_FILTER_KEYS = ("customer_prefix", "start_dt", "end_dt_exclusive", "min_total_cents", "max_total_cents",
+                     "sale_id", "text")
+_PREFIX_UPPER_BOUND = "\U0010ffff" # Sorts after every character that can follow a prefix
+
+def _fts_match_query(text):
+    """
+    Turns typed search text into an FTS5 MATCH query in which every word must start a word of
+    the row ('jua cruz' finds 'Juan dela Cruz'). Words are quoted, so FTS5 syntax is not interpreted.
+    Returns None for blank text.
+    """
+    words = text.split()
+    if not words:
+        return None
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+
+def _like_pattern(word):
+    """Returns a LIKE pattern (used with ESCAPE '\\') matching word anywhere in a value."""
+    escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def _sale_text_filter_sql(text, column_prefix=""):
+    """
+    Returns (sql, params) restricting sales to those matching text in the customer or product
+    names: an FTS5 lookup when the search index exists, otherwise a LIKE test per word.
+    """
+    c = column_prefix
+    match_query = _fts_match_query(text)
+    if match_query is None:
+        return "", []
+    if _search_index_ready:
+        return f" AND {c}SaleID IN (SELECT rowid FROM SaleSearch WHERE SaleSearch MATCH ?)", [match_query]
+    sale_id_sql = f"{c}SaleID" if c else "Sales.SaleID" # Qualified: SaleItems has a SaleID too
+    sql, params = "", []
+    for word in text.split():
+        pattern = _like_pattern(word)
+        sql += (f" AND ({c}CustomerName LIKE ? ESCAPE '\\' OR EXISTS ("
+                f"SELECT 1 FROM SaleItems ti LEFT JOIN Products tp ON tp.ProductID = ti.ProductID "
+                f"WHERE ti.SaleID = {sale_id_sql} AND COALESCE(tp.ProductName, ti.ProductName) LIKE ? ESCAPE '\\'))")
+        params += [pattern, pattern]
+    return sql, params
+
+def _sales_filter_sql(filters, column_prefix=""):
+    """
+    Returns (sql, params) for the ' AND ...' conditions of a sales search filter dict
+    (see SALES_FILTER_KEYS). Raises ValueError for unknown keys.
+    """
+    if not filters:
+        return "", []
+    unknown = set(filters) - set(SALES_FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown sales filter(s) {sorted(unknown)}; expected any of {SALES_FILTER_KEYS}")
+    c = column_prefix
+    sql, params = "", []
+    if filters.get("customer_prefix"):
+        sql += f" AND {c}CustomerName >= ? COLLATE NOCASE AND {c}CustomerName < ? COLLATE NOCASE"
+        params += [filters["customer_prefix"], filters["customer_prefix"] + _PREFIX_UPPER_BOUND]
+    if filters.get("start_dt") is not None:
+        sql += f" AND {c}SaleTimestamp >= ?"
+        params.append(filters["start_dt"])
+    if filters.get("end_dt_exclusive") is not None:
+        sql += f" AND {c}SaleTimestamp < ?"
+        params.append(filters["end_dt_exclusive"])
+    if filters.get("min_total_cents") is not None:
+        sql += f" AND {c}TotalCents >= ?"
+        params.append(filters["min_total_cents"])
+    if filters.get("max_total_cents") is not None:
+        sql += f" AND {c}TotalCents <= ?"
+        params.append(filters["max_total_cents"])
+    if filters.get("sale_id") is not None:
+        sql += f" AND {c}SaleID = ?"
+        params.append(filters["sale_id"])
+    if filters.get("text"):
+        text_sql, text_params = _sale_text_filter_sql(filters["text"], column_prefix)
+        sql += text_sql
+        params += text_params
+    return sql, params
+
+def _sales_page_sql(after_key=False, filter_sql=""):
+    """
+    Returns the newest-first sales history page query used by fetch_sales_page.
+    ReceiptNo counts the matching sales oldest-first (1 = first sale). The first page derives it
+    from the match count in the same statement; later pages continue from the last number shown.
+    """
+    if after_key:
+        receipt_base_sql = "?"
+        keyset_sql = " AND (SaleTimestamp, SaleID) < (?, ?)"
+    else:
+        receipt_base_sql = f"(SELECT COUNT(*) FROM Sales WHERE 1 = 1{filter_sql})"
+        keyset_sql = ""
+    return f"""
+        SELECT
+            SaleID,
+            SaleTimestamp,
+            TotalCents,
+            CustomerName,
+            {receipt_base_sql} - ROW_NUMBER() OVER (ORDER BY SaleTimestamp DESC, SaleID DESC) + 1 AS ReceiptNo
+        FROM Sales
+        WHERE 1 = 1{filter_sql}{keyset_sql}
+        ORDER BY SaleTimestamp DESC, SaleID DESC
+        LIMIT ?
+    """
+
+def _sales_since_sql(filter_sql="", outer_filter_sql=""):
+    """
+    Returns the query used by fetch_sales_since: sales with SaleID above a watermark, newest
+    first, numbered like _sales_page_sql by counting the (few) matches that sort after each one.
+    filter_sql is the unqualified filter for the subqueries, outer_filter_sql the same with 's.'.
+    """
+    return f"""
+        SELECT
+            s.SaleID,
+            s.SaleTimestamp,
+            s.TotalCents,
+            s.CustomerName,
+            (SELECT COUNT(*) FROM Sales WHERE 1 = 1{filter_sql})
+            - (SELECT COUNT(*) FROM Sales
+               WHERE (SaleTimestamp, SaleID) > (s.SaleTimestamp, s.SaleID){filter_sql}) AS ReceiptNo
+        FROM Sales s
+        WHERE s.SaleID > ?{outer_filter_sql}
+        ORDER BY +s.SaleTimestamp DESC, s.SaleID DESC -- '+': seek the SaleID range, sort the few rows
+    """
+
+# (label, sql, indexes the plan must use) for check_report_query_plans()
+# "PRIMARY KEY" stands for a seek on a WITHOUT ROWID rollup table's key.
+REPORT_QUERY_PLAN_CHECKS = [
+    ("fetch_sales_stats (rollup days)", _ROLLUP_SALES_STATS_SQL, ("PRIMARY KEY",)),
+    ("fetch_sales_buckets", _sales_buckets_sql("week"), ("PRIMARY KEY",)),
+    ("fetch_dashboard_stats", _dashboard_sql(4), ("PRIMARY KEY",)),
+    ("fetch_product_summary_by_date_range (rollup days + partial edges)", _rollup_product_summary_sql(2),
+     ("PRIMARY KEY", "idx_sales_timestamp", "idx_saleitems_sale_product")),
+    ("fetch_sales_page (first)", _sales_page_sql(), ("idx_sales_timestamp",)),
+    ("fetch_sales_page (next)", _sales_page_sql(after_key=True), ("idx_sales_timestamp",)),
+    ("fetch_sales_page (customer prefix)", _sales_page_sql(filter_sql=_sales_filter_sql({"customer_prefix": "a"})[0]),
+     ("idx_sales_customer_timestamp",)),
+    ("fetch_sales_page (sale ID)", _sales_page_sql(filter_sql=_sales_filter_sql({"sale_id": 1})[0]),
+     ("INTEGER PRIMARY KEY",)),
+    ("fetch_sales_since", _sales_since_sql(), ("INTEGER PRIMARY KEY", "idx_sales_timestamp")),
+    ("fetch_sales_stats (totals)", _sales_stats_sql()[0], ("idx_sales_timestamp",)),
+    ("fetch_sales_stats (items)", _sales_stats_sql()[1], ("idx_sales_timestamp", "idx_saleitems_sale_product")),
+    ("fetch_sales_stats (customer totals)", _sales_stats_sql(True)[0], ("idx_sales_customer_timestamp",)),
+    ("fetch_sales_stats (customer items)", _sales_stats_sql(True)[1],
+     ("idx_sales_customer_timestamp", "idx_saleitems_sale_product")),
+    ("fetch_product_summary_by_date_range (under one day)", _product_summary_sql(),
+     ("idx_sales_timestamp", "idx_saleitems_sale_product")),
+    ("fetch_product_summary_by_date_range (customer)", _product_summary_sql(True),
+     ("idx_sales_customer_timestamp", "idx_saleitems_sale_product")),
+    ("fetch_customer_purchase_details_by_date", _CUSTOMER_PURCHASES_BY_DATE_SQL,
+     ("idx_sales_customer_id", "idx_saleitems_sale_product")),
+    ("fetch_all_customer_purchase_details", _ALL_CUSTOMER_PURCHASES_SQL,
+     ("idx_sales_customer_id", "idx_saleitems_sale_product")),
+    ("fetch_customer_purchase_page (first)", _customer_purchases_page_sql(),
+     ("idx_sales_customer_id", "idx_saleitems_sale_product")),
+    ("fetch_customer_purchase_page (next)", _customer_purchases_page_sql(after_key=True),
+     ("idx_sales_customer_id", "idx_saleitems_sale_product")),
+    ("fetch_customer_purchase_summary", _CUSTOMER_PURCHASE_SUMMARY_SQL,
+     ("idx_sales_customer_id", "idx_saleitems_sale_product")),
+]
+
 # --- Database Helper Functions (SQLite) ---
 
+def _show_db_error(title, message):
+    """
+    Shows an error dialog for read functions that may also run on db_executor worker threads.
+    Tk must only be touched from the main thread, so elsewhere the (already logged) error is not shown.
+    """
+    if threading.current_thread() is threading.main_thread():
+        messagebox.showerror(title, message)
+
+def close_connections():
+    """Closes all pooled connections (e.g. before the database file is replaced by a restore)."""
+    _connections.close_all()
+
+def backup_database_to(backup_path):
+    """
+    Writes a consistent copy of the database to backup_path using SQLite's online backup API.
+    A plain file copy would miss commits still sitting in the WAL file. Raises sqlite3.Error on failure.
+    """
+    with _connections.reader() as conn:
+        backup_conn = sqlite3.connect(backup_path)
+        try:
+            conn.backup(backup_conn)
+        finally:
+            backup_conn.close()
+    logging.info(f"Database backed up to '{backup_path}' via the online backup API.")
+
+def restore_database_from(backup_path):
+    """
+    Replaces the database file with backup_path. Closes the pool first and removes any
+    leftover WAL/shared-memory files so they cannot be replayed onto the restored file.
+    """
+    close_connections()
+    for suffix in ("-wal", "-shm"):
+        sidecar = DATABASE_FILENAME + suffix
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+    shutil.copy2(backup_path, DATABASE_FILENAME)
+    logging.info(f"Database file replaced with '{backup_path}'.")
+
 def initialize_db():
-    """Creates the database file and tables if they don't exist."""
-    db_exists = os.path.exists(DATABASE_FILENAME)
-    conn = None
+    """
+    Creates the database file if needed and applies any pending schema migrations.
+    A database already at SCHEMA_VERSION costs a single PRAGMA user_version read.
+    """
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;") # Enable foreign keys
-
-        # Products Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Products (
-                ProductID INTEGER PRIMARY KEY AUTOINCREMENT,
-                ProductName TEXT NOT NULL UNIQUE,
-                Price REAL NOT NULL CHECK (Price >= 0)
-            )
-        ''')
-        # Sales Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Sales (
-                SaleID INTEGER PRIMARY KEY AUTOINCREMENT,
-                SaleTimestamp TEXT NOT NULL,
-                TotalAmount REAL NOT NULL CHECK (TotalAmount >= 0),
-                CustomerName TEXT DEFAULT 'N/A'
-            )
-        ''')
-        # Add CustomerName column to Sales if missing (backward compatibility)
-        cursor.execute("PRAGMA table_info(Sales)")
-        columns = [info[1] for info in cursor.fetchall()]
-        if 'CustomerName' not in columns:
-            logging.info("Adding CustomerName column to Sales table...")
-            cursor.execute("ALTER TABLE Sales ADD COLUMN CustomerName TEXT DEFAULT 'N/A'")
-            logging.info("CustomerName column added.")
-
-        # SaleItems Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS SaleItems (
-                SaleItemID INTEGER PRIMARY KEY AUTOINCREMENT,
-                SaleID INTEGER NOT NULL,
-                ProductName TEXT NOT NULL,
-                Quantity INTEGER NOT NULL CHECK (Quantity > 0),
-                PriceAtSale REAL NOT NULL,
-                Subtotal REAL NOT NULL,
-                FOREIGN KEY (SaleID) REFERENCES Sales (SaleID) ON DELETE CASCADE
-            )
-        ''')
-        # Customers Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Customers (
-                CustomerID INTEGER PRIMARY KEY AUTOINCREMENT,
-                CustomerName TEXT NOT NULL UNIQUE COLLATE NOCASE,
-                ContactNumber TEXT,
-                Address TEXT,
-                DateAdded TEXT DEFAULT CURRENT_TIMESTAMP -- Added DateAdded column
-            )
-        ''')
-        # Add ContactNumber, Address, and DateAdded columns if they don't exist (backward compatibility)
-        cursor.execute("PRAGMA table_info(Customers)")
-        customer_columns = [info[1] for info in cursor.fetchall()]
-        if 'ContactNumber' not in customer_columns:
-            logging.info("Adding ContactNumber column to Customers table...")
-            cursor.execute("ALTER TABLE Customers ADD COLUMN ContactNumber TEXT")
-            logging.info("ContactNumber column added.")
-        if 'Address' not in customer_columns:
-            logging.info("Adding Address column to Customers table...")
-            cursor.execute("ALTER TABLE Customers ADD COLUMN Address TEXT")
-            logging.info("Address column added.")
-        # --- Add DateAdded column if missing ---
-        if 'DateAdded' not in customer_columns:
-            logging.info("Adding DateAdded column to Customers table...")
-            try:
-                # Add column with default for new rows, existing rows get NULL initially
-                cursor.execute("ALTER TABLE Customers ADD COLUMN DateAdded TEXT DEFAULT CURRENT_TIMESTAMP")
-                logging.info("DateAdded column added.")
-            except sqlite3.Error as e:
-                logging.error(f"Error adding DateAdded column: {e}")
-
-
-        # Populate Products if DB was just created or Products table is empty
-        populate_defaults = False
-        if not db_exists:
-             logging.info(f"Database '{DATABASE_FILENAME}' not found. Creating tables and populating Products with defaults.")
-             populate_defaults = True
-        else:
-             cursor.execute("SELECT COUNT(*) FROM Products")
-             count = cursor.fetchone()[0]
-             if count == 0:
-                 logging.info(f"Database '{DATABASE_FILENAME}' found but Products table is empty. Populating with defaults.")
-                 populate_defaults = True
-             else:
-                 logging.info(f"Database '{DATABASE_FILENAME}' and tables found with existing products.")
-
-        if populate_defaults:
-            try:
-                # Use INSERT OR IGNORE to avoid errors if a default product somehow exists
-                default_items = list(DEFAULT_PRODUCTS.items())
-                cursor.executemany("INSERT OR IGNORE INTO Products (ProductName, Price) VALUES (?, ?)", default_items)
-                conn.commit()
-                logging.info("Default products inserted (or ignored if existing).")
-            except sqlite3.Error as e:
-                logging.exception("Error inserting default products.") # Log traceback
-                conn.rollback()
-
-        conn.commit() # Commit any schema changes
+        with _connections.writer() as conn:
+            applied = migrate_schema(conn)
+            _detect_search_index(conn.cursor())
     except sqlite3.Error as e:
         logging.exception("Database initialization error.") # Log traceback
         messagebox.showerror("Database Error", f"Could not initialize database.\nError: {e}")
         raise # Re-raise the exception after logging and showing message
+    if applied:
+        check_report_query_plans() # Indexes may have changed; make sure the reports still use them
+
+def migrate_schema(conn):
+    """
+    Brings the database up to SCHEMA_VERSION by applying each pending step in SCHEMA_MIGRATIONS.
+    Every step runs in its own transaction together with the PRAGMA user_version bump, so an
+    interrupted upgrade resumes at the failed step on the next launch. Derived objects (report
+    indexes, rollup tables and triggers, the report cache, the search index) are then recreated
+    from their current definitions.
+    Returns the list of versions applied (empty if the database was already current).
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    current_version = cursor.fetchone()[0]
+    if current_version >= SCHEMA_VERSION:
+        if current_version > SCHEMA_VERSION:
+            logging.warning(f"Database schema version {current_version} is newer than this app "
+                            f"supports ({SCHEMA_VERSION}).")
+        logging.info(f"Database '{DATABASE_FILENAME}' is at schema version {current_version}.")
+        return []
+
+    applied = []
+    # Table rebuilds drop and rename tables, which must not fire ON DELETE CASCADE.
+    # foreign_keys can only be changed outside a transaction, so it is off for the whole run.
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for version, description, migrate in SCHEMA_MIGRATIONS:
+            if version <= current_version:
+                continue
+            logging.info(f"Applying schema migration {version}: {description}...")
+            cursor.execute("BEGIN") # DDL does not open a transaction implicitly
+            if migrate is not None:
+                migrate(cursor)
+            cursor.execute("PRAGMA foreign_key_check")
+            violations = cursor.fetchall()
+            if violations:
+                logging.warning(f"Schema migration {version} left {len(violations)} rows with dangling "
+                                f"foreign keys, e.g. {violations[:3]}")
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+            applied.append(version)
+
+        cursor.execute("BEGIN")
+        migrate_indexes(cursor)
+        migrate_rollups(cursor)
+        migrate_report_cache(cursor)
+        migrate_search_index(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback() # foreign_keys cannot be changed inside the failed step's transaction
+        raise
     finally:
-        if conn:
-            conn.close()
+        cursor.execute("PRAGMA foreign_keys = ON")
+    logging.info(f"Database '{DATABASE_FILENAME}' migrated from schema version {current_version} to {SCHEMA_VERSION}.")
+    return applied
+
+# --- Schema Migration Steps ---
+# Each step takes a cursor inside an open transaction, with foreign keys off. Never edit a step
+# that has shipped; add a new one at the end of SCHEMA_MIGRATIONS instead. Steps only change the
+# base tables: indexes and rollups are recreated afterwards by migrate_schema().
+
+def _migration_base_schema(cursor):
+    """Creates the original tables and seeds Products with DEFAULT_PRODUCTS if it is empty."""
+    # Products Table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Products (
+            ProductID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ProductName TEXT NOT NULL UNIQUE,
+            Price REAL NOT NULL CHECK (Price >= 0)
+        )
+    ''')
+    # Sales Table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Sales (
+            SaleID INTEGER PRIMARY KEY AUTOINCREMENT,
+            SaleTimestamp TEXT NOT NULL,
+            TotalAmount REAL NOT NULL CHECK (TotalAmount >= 0),
+            CustomerName TEXT DEFAULT 'N/A'
+        )
+    ''')
+    # SaleItems Table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS SaleItems (
+            SaleItemID INTEGER PRIMARY KEY AUTOINCREMENT,
+            SaleID INTEGER NOT NULL,
+            ProductName TEXT NOT NULL,
+            Quantity INTEGER NOT NULL CHECK (Quantity > 0),
+            PriceAtSale REAL NOT NULL,
+            Subtotal REAL NOT NULL,
+            FOREIGN KEY (SaleID) REFERENCES Sales (SaleID) ON DELETE CASCADE
+        )
+    ''')
+    # Customers Table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Customers (
+            CustomerID INTEGER PRIMARY KEY AUTOINCREMENT,
+            CustomerName TEXT NOT NULL UNIQUE COLLATE NOCASE,
+            ContactNumber TEXT,
+            Address TEXT,
+            DateAdded TEXT DEFAULT CURRENT_TIMESTAMP -- Added DateAdded column
+        )
+    ''')
+
+    # Populate Products if the database is new (or an old one has no products)
+    cursor.execute("SELECT 1 FROM Products LIMIT 1")
+    if cursor.fetchone() is None:
+        logging.info("Products table is empty. Populating with defaults.")
+        # Price is still REAL pesos at this version; migration 5 converts it to cents
+        cursor.executemany("INSERT OR IGNORE INTO Products (ProductName, Price) VALUES (?, ?)",
+                           [(name, price_cents / 100) for name, price_cents in DEFAULT_PRODUCTS.items()])
+
+def _migration_legacy_columns(cursor):
+    """Adds columns that databases created by early versions of the app are missing."""
+    # Add CustomerName column to Sales if missing (backward compatibility)
+    cursor.execute("PRAGMA table_info(Sales)")
+    columns = [info[1] for info in cursor.fetchall()]
+    if 'CustomerName' not in columns:
+        logging.info("Adding CustomerName column to Sales table...")
+        cursor.execute("ALTER TABLE Sales ADD COLUMN CustomerName TEXT DEFAULT 'N/A'")
+
+    # Add ContactNumber, Address, and DateAdded columns if they don't exist (backward compatibility)
+    cursor.execute("PRAGMA table_info(Customers)")
+    customer_columns = [info[1] for info in cursor.fetchall()]
+    if 'ContactNumber' not in customer_columns:
+        logging.info("Adding ContactNumber column to Customers table...")
+        cursor.execute("ALTER TABLE Customers ADD COLUMN ContactNumber TEXT")
+    if 'Address' not in customer_columns:
+        logging.info("Adding Address column to Customers table...")
+        cursor.execute("ALTER TABLE Customers ADD COLUMN Address TEXT")
+    if 'DateAdded' not in customer_columns:
+        # ALTER TABLE cannot add a column with a non-constant default such as CURRENT_TIMESTAMP,
+        # so it is added without one; rows in these old databases keep NULL and sort as oldest.
+        logging.info("Adding DateAdded column to Customers table...")
+        cursor.execute("ALTER TABLE Customers ADD COLUMN DateAdded TEXT")
+
+def migrate_indexes(cursor):
+    """
+    Creates any index in MANAGED_INDEXES that the database is missing, then gathers
+    planner statistics for the new ones. Runs inside the caller's transaction.
+    Returns the list of index names that were created.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    existing = {row[0] for row in cursor.fetchall()}
+    created = []
+    for index_name, create_sql in MANAGED_INDEXES.items():
+        if index_name not in existing:
+            logging.info(f"Creating index {index_name}...")
+            cursor.execute(create_sql)
+            created.append(index_name)
+    for index_name in created:
+        cursor.execute(f"ANALYZE {index_name}")
+    if created:
+        logging.info(f"Index migration complete. Created: {', '.join(created)}")
+    return created
+
+def migrate_rollups(cursor):
+    """
+    Creates the daily rollup tables and their maintenance triggers if any are missing.
+    When something was missing the rollups may be out of step with Sales, so they are
+    rebuilt from the raw rows. Runs inside the caller's transaction.
+    Returns True if the rollups were (re)built.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+    existing = {row[0] for row in cursor.fetchall()}
+    if all(name in existing for name in list(ROLLUP_TABLES) + list(ROLLUP_TRIGGERS)):
+        return False
+
+    logging.info("Creating daily rollup tables/triggers and backfilling from existing sales...")
+    for create_sql in ROLLUP_TABLES.values():
+        cursor.execute(create_sql)
+    for create_sql in ROLLUP_TRIGGERS.values():
+        cursor.execute(create_sql)
+    rebuild_rollups(cursor)
+    return True
+
+def rebuild_rollups(cursor):
+    """Recomputes DailySales and DailyProductSales from Sales/SaleItems. Runs inside the caller's transaction."""
+    cursor.execute("DELETE FROM DailySales")
+    cursor.execute("DELETE FROM DailyProductSales")
+    cursor.execute("""
+        INSERT INTO DailySales (SaleDate, RevenueCents, SaleCount, ItemCount)
+        SELECT substr(s.SaleTimestamp, 1, 10), SUM(s.TotalCents), COUNT(*), COALESCE(SUM(i.Quantity), 0)
+        FROM Sales s
+        LEFT JOIN (SELECT SaleID, SUM(Quantity) AS Quantity FROM SaleItems GROUP BY SaleID) i
+               ON i.SaleID = s.SaleID
+        GROUP BY substr(s.SaleTimestamp, 1, 10)
+    """)
+    cursor.execute("""
+        INSERT INTO DailyProductSales (SaleDate, ProductID, ProductName, Quantity, RevenueCents)
+        SELECT substr(s.SaleTimestamp, 1, 10), IFNULL(si.ProductID, 0), IFNULL(si.ProductName, ''),
+               SUM(si.Quantity), SUM(si.SubtotalCents)
+        FROM SaleItems si
+        JOIN Sales s ON si.SaleID = s.SaleID
+        GROUP BY substr(s.SaleTimestamp, 1, 10), IFNULL(si.ProductID, 0), IFNULL(si.ProductName, '')
+    """)
+    cursor.execute("SELECT COUNT(*) FROM DailySales")
+    logging.info(f"Daily rollups rebuilt ({cursor.fetchone()[0]} days).")
+
+def migrate_report_cache(cursor):
+    """
+    Creates the report cache tables and invalidation triggers if any are missing, and empties
+    the cache: results cached before a schema migration may no longer match. Runs inside the
+    caller's transaction.
+    """
+    for create_sql in REPORT_CACHE_TABLES.values():
+        cursor.execute(create_sql)
+    for create_sql in REPORT_CACHE_TRIGGERS.values():
+        cursor.execute(create_sql)
+    cursor.execute("INSERT OR IGNORE INTO ReportCacheState (StateID) VALUES (1)")
+    cursor.execute("DELETE FROM ReportCache")
+    cursor.execute("UPDATE ReportCacheState SET Generation = Generation + 1")
+
+def _fts5_available(cursor):
+    """True if this SQLite build includes the FTS5 extension."""
+    cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+    return bool(cursor.fetchone()[0])
+
+def migrate_search_index(cursor):
+    """
+    Creates the full-text search tables and their sync triggers if any are missing, and fills
+    them from Customers and Sales. Skipped (searches then use LIKE) when SQLite lacks FTS5.
+    Runs inside the caller's transaction. Returns True if the search index was (re)built.
+    """
+    if not _fts5_available(cursor):
+        logging.warning("SQLite was built without FTS5; customer and receipt search will scan the tables.")
+        return False
+    cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+    existing = {row[0] for row in cursor.fetchall()}
+    if all(name in existing for name in list(SEARCH_TABLES) + list(SEARCH_TRIGGERS)):
+        return False
+
+    logging.info("Creating full-text search tables/triggers and indexing existing customers and sales...")
+    for create_sql in SEARCH_TABLES.values():
+        cursor.execute(create_sql)
+    for create_sql in SEARCH_TRIGGERS.values():
+        cursor.execute(create_sql)
+    rebuild_search_index(cursor)
+    return True
+
+def rebuild_search_index(cursor):
+    """Re-indexes every customer and sale for full-text search. Runs inside the caller's transaction."""
+    cursor.execute("INSERT INTO CustomerSearch (CustomerSearch) VALUES ('rebuild')")
+    cursor.execute("DELETE FROM SaleSearch")
+    cursor.execute("""
+        INSERT INTO SaleSearch (rowid, CustomerName, ProductNames)
+        SELECT s.SaleID, s.CustomerName, IFNULL(n.ProductNames, '')
+        FROM Sales s
+        LEFT JOIN (SELECT si.SaleID, group_concat(COALESCE(p.ProductName, si.ProductName), ' ') AS ProductNames
+                   FROM SaleItems si LEFT JOIN Products p ON p.ProductID = si.ProductID
+                   GROUP BY si.SaleID) n ON n.SaleID = s.SaleID
+    """)
+    cursor.execute("SELECT COUNT(*) FROM SaleSearch")
+    logging.info(f"Search index rebuilt ({cursor.fetchone()[0]} sales).")
+
+def _detect_search_index(cursor):
+    """Records whether the full-text search tables exist, choosing FTS5 or LIKE for the searches below."""
+    global _search_index_ready
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?)",
+                   tuple(SEARCH_TABLES))
+    _search_index_ready = cursor.fetchone()[0] == len(SEARCH_TABLES)
+    if not _search_index_ready:
+        logging.info("Full-text search index unavailable; searches will use LIKE scans.")
+
+def _rebuild_table(cursor, table_name, create_new_sql, select_sql):
+    """
+    Replaces table_name with the table created by create_new_sql (named '<table_name>_new'),
+    filled from select_sql over the old table. Keeps the AUTOINCREMENT counter so deleted IDs
+    are not reused. Foreign keys must be off, or dropping the old table would cascade.
+    """
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table_name,))
+    sequence = cursor.fetchone()
+    cursor.execute(create_new_sql)
+    cursor.execute(f"INSERT INTO {table_name}_new {select_sql}")
+    cursor.execute(f"DROP TABLE {table_name}")
+    cursor.execute(f"ALTER TABLE {table_name}_new RENAME TO {table_name}")
+    if sequence:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table_name))
+
+def _drop_rollups(cursor):
+    """Drops the rollup triggers and tables so migrate_schema() recreates them from the current definitions."""
+    for trigger_name in ROLLUP_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+    for table_name in ROLLUP_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+
+def _migration_integer_cents(cursor):
+    """Rebuilds Products, Sales and SaleItems with money as INTEGER cents instead of REAL pesos."""
+    _drop_rollups(cursor) # Their triggers reference the old column names
+    _rebuild_table(cursor, "Products", '''
+        CREATE TABLE Products_new (
+            ProductID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ProductName TEXT NOT NULL UNIQUE,
+            PriceCents INTEGER NOT NULL CHECK (PriceCents >= 0)
+        )
+    ''', "SELECT ProductID, ProductName, CAST(ROUND(Price * 100) AS INTEGER) FROM Products")
+    _rebuild_table(cursor, "Sales", '''
+        CREATE TABLE Sales_new (
+            SaleID INTEGER PRIMARY KEY AUTOINCREMENT,
+            SaleTimestamp TEXT NOT NULL,
+            TotalCents INTEGER NOT NULL CHECK (TotalCents >= 0),
+            CustomerName TEXT DEFAULT 'N/A'
+        )
+    ''', "SELECT SaleID, SaleTimestamp, CAST(ROUND(TotalAmount * 100) AS INTEGER), CustomerName FROM Sales")
+    _rebuild_table(cursor, "SaleItems", '''
+        CREATE TABLE SaleItems_new (
+            SaleItemID INTEGER PRIMARY KEY AUTOINCREMENT,
+            SaleID INTEGER NOT NULL,
+            ProductName TEXT NOT NULL,
+            Quantity INTEGER NOT NULL CHECK (Quantity > 0),
+            PriceAtSaleCents INTEGER NOT NULL,
+            SubtotalCents INTEGER NOT NULL,
+            FOREIGN KEY (SaleID) REFERENCES Sales (SaleID) ON DELETE CASCADE
+        )
+    ''', """SELECT SaleItemID, SaleID, ProductName, Quantity,
+                CAST(ROUND(PriceAtSale * 100) AS INTEGER), CAST(ROUND(Subtotal * 100) AS INTEGER)
+         FROM SaleItems""")
+
+def _migration_sale_item_product_ids(cursor):
+    """
+    Rebuilds SaleItems to reference Products.ProductID. Items whose name matches a product get
+    its ID and no name; the rest (products renamed or deleted before this version) keep their
+    name as a snapshot. Deleting a product later snapshots its name onto its items.
+    """
+    _drop_rollups(cursor) # DailyProductSales is rekeyed on ProductID
+    _rebuild_table(cursor, "SaleItems", '''
+        CREATE TABLE SaleItems_new (
+            SaleItemID INTEGER PRIMARY KEY AUTOINCREMENT,
+            SaleID INTEGER NOT NULL,
+            ProductID INTEGER, -- NULL once the product is deleted (or if it never matched one)
+            ProductName TEXT, -- Name snapshot, only set when ProductID is NULL
+            Quantity INTEGER NOT NULL CHECK (Quantity > 0),
+            PriceAtSaleCents INTEGER NOT NULL,
+            SubtotalCents INTEGER NOT NULL,
+            CHECK ((ProductID IS NULL) <> (ProductName IS NULL)),
+            FOREIGN KEY (SaleID) REFERENCES Sales (SaleID) ON DELETE CASCADE,
+            FOREIGN KEY (ProductID) REFERENCES Products (ProductID) ON DELETE SET NULL
+        )
+    ''', """SELECT si.SaleItemID, si.SaleID, p.ProductID, CASE WHEN p.ProductID IS NULL THEN si.ProductName END,
+                si.Quantity, si.PriceAtSaleCents, si.SubtotalCents
+         FROM SaleItems si
+         LEFT JOIN Products p ON p.ProductName = si.ProductName""")
+    # Runs before the ON DELETE SET NULL action, so the items keep the deleted product's name
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_products_snapshot_delete BEFORE DELETE ON Products
+        BEGIN
+            UPDATE SaleItems SET ProductID = NULL, ProductName = OLD.ProductName
+            WHERE ProductID = OLD.ProductID;
+        END
+    ''')
+
+def _migration_sale_customer_ids(cursor):
+    """
+    Adds Sales.CustomerID and backfills it by (case-insensitive) name. CustomerName stays as a
+    snapshot for receipts and walk-in ('N/A') sales, and follows renames of the customer.
+    """
+    # ALTER keeps the Sales rollup triggers; a REFERENCES column added this way must default to NULL
+    cursor.execute("ALTER TABLE Sales ADD COLUMN CustomerID INTEGER "
+                   "REFERENCES Customers (CustomerID) ON DELETE SET NULL")
+    # Customers.CustomerName is COLLATE NOCASE, so this matches any case variant via its UNIQUE index
+    cursor.execute("""
+        UPDATE Sales
+        SET CustomerID = (SELECT c.CustomerID FROM Customers c WHERE c.CustomerName = Sales.CustomerName)
+        WHERE CustomerName IS NOT NULL AND CustomerName != 'N/A'
+    """)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_customers_rename AFTER UPDATE OF CustomerName ON Customers
+        BEGIN
+            UPDATE Sales SET CustomerName = NEW.CustomerName WHERE CustomerID = NEW.CustomerID;
+        END
+    ''')
+
+def _migration_history_index(cursor):
+    """Drops idx_sales_timestamp so migrate_indexes() recreates it with SaleID for history paging."""
+    cursor.execute("DROP INDEX IF EXISTS idx_sales_timestamp")
+
+# (version, description, step) applied in order by migrate_schema()
+# A step of None has no base-table work: it was superseded by, or only adds objects for, the derived-object pass.
+SCHEMA_MIGRATIONS = [
+    (1, "base tables and default products", _migration_base_schema),
+    (2, "columns missing from early databases", _migration_legacy_columns),
+    (3, "report indexes", None), # Now done by migrate_indexes() at the end of migrate_schema()
+    (4, "daily rollup tables and triggers", None), # Now done by migrate_rollups() at the end of migrate_schema()
+    (5, "money columns as integer cents", _migration_integer_cents),
+    (6, "sale items reference products by ID", _migration_sale_item_product_ids),
+    (7, "sales reference customers by ID", _migration_sale_customer_ids),
+    (8, "sales timestamp index ordered by SaleID", _migration_history_index),
+    (9, "report result cache", None), # Created by migrate_report_cache() at the end of migrate_schema()
+    (10, "full-text search index", None), # Created by migrate_search_index() at the end of migrate_schema()
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+def _split_whole_days(start_dt_str, end_dt_exclusive_str):
+    """
+    Splits the timestamp range [start, end) into the whole days the rollup tables can answer
+    and the partial-day edges that still need raw rows.
+
+    Returns:
+        A tuple: (whole_days, partial_ranges) where whole_days is ('YYYY-MM-DD', 'YYYY-MM-DD')
+        (end exclusive) or None, and partial_ranges is a list of (start_iso, end_iso) tuples.
+        Unparseable input is returned as a single raw range.
+    """
+    try:
+        start_dt = datetime.datetime.fromisoformat(start_dt_str)
+        end_dt = datetime.datetime.fromisoformat(end_dt_exclusive_str)
+    except (TypeError, ValueError):
+        return None, [(start_dt_str, end_dt_exclusive_str)]
+
+    first_midnight = datetime.datetime.combine(start_dt.date(), datetime.time.min)
+    if first_midnight < start_dt:
+        first_midnight += datetime.timedelta(days=1)
+    last_midnight = datetime.datetime.combine(end_dt.date(), datetime.time.min)
+    if first_midnight >= last_midnight: # Less than one whole day in range
+        return None, [(start_dt_str, end_dt_exclusive_str)]
+
+    partial_ranges = []
+    if start_dt < first_midnight:
+        partial_ranges.append((start_dt_str, first_midnight.isoformat()))
+    if last_midnight < end_dt:
+        partial_ranges.append((last_midnight.isoformat(), end_dt_exclusive_str))
+    return (first_midnight.date().isoformat(), last_midnight.date().isoformat()), partial_ranges
+
+def check_report_query_plans():
+    """
+    Runs EXPLAIN QUERY PLAN on every report query in REPORT_QUERY_PLAN_CHECKS and verifies
+    that each one uses its expected indexes. Logs a warning for any query that does not.
+
+    Returns:
+        A dict: {label: (uses_expected_indexes, [plan detail lines])}. Empty on error.
+    """
+    results = {}
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            # EXPLAIN reads no table, so it neither reloads a schema changed by another connection
+            # nor replans a statement this pooled connection cached under an older schema. A real
+            # read reloads it, and naming the schema version gives each schema its own statements.
+            cursor.execute("SELECT COUNT(*) FROM sqlite_master")
+            cursor.execute("PRAGMA schema_version")
+            schema_version = cursor.fetchone()[0]
+            for label, sql, expected_indexes in REPORT_QUERY_PLAN_CHECKS:
+                params = [""] * sql.count("?")
+                cursor.execute(f"EXPLAIN QUERY PLAN /* schema {schema_version} */ {sql}", params)
+                plan = [row[3] for row in cursor.fetchall()]
+                plan_text = "\n".join(plan)
+                ok = all(index_name in plan_text for index_name in expected_indexes)
+                results[label] = (ok, plan)
+                if ok:
+                    logging.debug(f"Query plan OK for {label}: {plan}")
+                else:
+                    logging.warning(f"Report query '{label}' is not using {expected_indexes}. Plan: {plan}")
+    except sqlite3.Error as e:
+        logging.exception("Error checking report query plans.")
+    return results
 
 def fetch_products_from_db():
-    """Fetches all products from the SQLite database."""
+    """Fetches all products from the SQLite database as {ProductName: price in cents}."""
     products = {}
-    conn = None
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT ProductName, Price FROM Products ORDER BY ProductName")
-        rows = cursor.fetchall()
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT ProductName, PriceCents FROM Products ORDER BY ProductName")
+            rows = cursor.fetchall()
         for row in rows:
-            products[row[0]] = float(row[1])
+            products[row[0]] = row[1]
         logging.debug(f"Fetched {len(products)} products from DB.")
     except sqlite3.Error as e:
         logging.exception("Error fetching products from DB.")
         messagebox.showerror("Database Error", f"Could not fetch products.\nError: {e}")
-    finally:
-        if conn:
-            conn.close()
     return products
 
-def insert_product_to_db(name, price):
-    """Inserts a new product into the SQLite database."""
-    conn = None
+def insert_product_to_db(name, price_cents):
+    """Inserts a new product (price in integer cents) into the SQLite database."""
     success = False
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO Products (ProductName, Price) VALUES (?, ?)", (name, price))
-        conn.commit()
+        with _connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO Products (ProductName, PriceCents) VALUES (?, ?)", (name, price_cents))
+            conn.commit()
         success = True
-        logging.info(f"Inserted product '{name}' with price {price:.2f} into DB.")
+        logging.info(f"Inserted product '{name}' with price {price_cents} cents into DB.")
     except sqlite3.IntegrityError:
-        # This happens if UNIQUE constraint fails (product name exists)
-        if conn: conn.rollback() # Ensure rollback on IntegrityError
+        # This happens if UNIQUE constraint fails (product name exists); the writer has already rolled back
         logging.warning(f"Attempted to insert duplicate product: '{name}'.")
         messagebox.showwarning("Product Exists", f"Product '{name}' already exists in the database.")
     except sqlite3.Error as e:
-        if conn: conn.rollback()
         logging.exception(f"Error inserting product '{name}' into DB.")
         messagebox.showerror("Database Error", f"Could not add product '{name}'.\nError: {e}")
-    finally:
-        if conn:
-            conn.close()
     return success
 
 def delete_product_from_db(product_name):
     """Deletes a product from the SQLite database by name."""
-    conn = None
     success = False
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM Products WHERE ProductName = ?", (product_name,))
-        conn.commit()
+        with _connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM Products WHERE ProductName = ?", (product_name,))
+            conn.commit()
         if cursor.rowcount > 0:
             success = True
             logging.info(f"Deleted product '{product_name}' from database.")
@@ -197,202 +1256,499 @@ def delete_product_from_db(product_name):
             logging.warning(f"Product '{product_name}' not found in database for deletion.")
             messagebox.showwarning("Not Found", f"Product '{product_name}' was not found in the database.")
     except sqlite3.Error as e:
-        if conn: conn.rollback()
         logging.exception(f"Error deleting product '{product_name}' from DB.")
         messagebox.showerror("Database Error", f"Could not delete product '{product_name}'.\nError: {e}")
-    finally:
-        if conn:
-            conn.close()
     return success
 
-def update_product_in_db(original_name, new_name, new_price):
-    """Updates a product's name and price in the database."""
-    conn = None
+def update_product_in_db(original_name, new_name, new_price_cents):
+    """Updates a product's name and price (in integer cents) in the database."""
     success = False
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE Products SET ProductName = ?, Price = ? WHERE ProductName = ?",
-                       (new_name, new_price, original_name))
-        conn.commit()
+        with _connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE Products SET ProductName = ?, PriceCents = ? WHERE ProductName = ?",
+                           (new_name, new_price_cents, original_name))
+            conn.commit()
         if cursor.rowcount > 0:
             success = True
-            logging.info(f"Updated product '{original_name}' to '{new_name}', Price: {new_price:.2f}")
+            logging.info(f"Updated product '{original_name}' to '{new_name}', Price: {new_price_cents} cents")
         else:
             # This might happen if the product was deleted between selection and update attempt
             logging.warning(f"Product '{original_name}' not found in database for update.")
             messagebox.showwarning("Not Found", f"Product '{original_name}' was not found in the database.")
     except sqlite3.IntegrityError:
         # This happens if the new_name violates the UNIQUE constraint
-        if conn: conn.rollback()
         logging.warning(f"Update error for '{original_name}': Name '{new_name}' likely already exists.")
         messagebox.showerror("Update Error", f"Could not rename to '{new_name}'.\nA product with that name already exists.")
     except sqlite3.Error as e:
-        if conn: conn.rollback()
         logging.exception(f"Error updating product '{original_name}' in DB.")
         messagebox.showerror("Database Error", f"Could not update product '{original_name}'.\nError: {e}")
-    finally:
-        if conn:
-            conn.close()
     return success
 
 # --- DB Functions for Sales ---
-def save_sale_record(timestamp, total_amount, customer_name):
-    """Saves a sale header record and returns the new SaleID."""
-    conn = None
+# CustomerID is looked up by name (case-insensitively); 'N/A' and unknown names leave it NULL
+_INSERT_SALE_SQL = '''
+    INSERT INTO Sales (SaleTimestamp, TotalCents, CustomerName, CustomerID)
+    VALUES (?, ?, ?, (SELECT CustomerID FROM Customers WHERE CustomerName = ?))
+'''
+
+def save_sale_record(timestamp, total_cents, customer_name):
+    """
+    Saves a sale header record and returns the new SaleID.
+    Prefer commit_sale(), which writes the header and items in one transaction.
+    """
     sale_id = None
     timestamp_str = timestamp.isoformat()
     customer_name_to_save = customer_name if customer_name else 'N/A'
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO Sales (SaleTimestamp, TotalAmount, CustomerName) VALUES (?, ?, ?)",
-                       (timestamp_str, total_amount, customer_name_to_save))
-        sale_id = cursor.lastrowid
-        conn.commit()
-        logging.info(f"Saved sale record ID: {sale_id} for Customer: '{customer_name_to_save}', Total: {total_amount:.2f}")
+        with _connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_INSERT_SALE_SQL, (timestamp_str, total_cents, customer_name_to_save, customer_name_to_save))
+            sale_id = cursor.lastrowid
+            conn.commit()
+        logging.info(f"Saved sale record ID: {sale_id} for Customer: '{customer_name_to_save}', Total: {total_cents} cents")
     except sqlite3.Error as e:
-        if conn: conn.rollback()
+        sale_id = None
         logging.exception("Error saving sale record header.")
         messagebox.showerror("Database Error", f"Could not save sale record.\nError: {e}")
-    finally:
-        if conn: conn.close()
     return sale_id
 
-def save_sale_items_records(sale_id, sale_details_list):
+def _sale_item_rows(sale_details_list):
     """
-    Saves the items for a given sale.
-    Accepts sale_details_list as a list of dictionaries:
-    [{'name': str, 'price': float, 'quantity': int}, ...]
+    Converts sale detail dictionaries into (ProductName, Quantity, PriceAtSaleCents, SubtotalCents) rows.
+    Returns None if any item is invalid (missing key, non-integer price or quantity), so the caller
+    rejects the whole sale instead of saving part of it.
     """
-    if not sale_id:
-        logging.error("Attempted to save sale items with invalid SaleID.")
-        return False
-    conn = None
-    items_to_insert = []
+    item_rows = []
     for item_detail in sale_details_list:
         try:
             name = item_detail['name']
-            price = item_detail['price']
+            price = item_detail['price'] # Integer cents
+            if not isinstance(price, int):
+                raise TypeError(f"price must be integer cents, got {price!r}")
             quantity = item_detail['quantity']
-            subtotal = price * quantity
-            items_to_insert.append((sale_id, name, quantity, price, subtotal))
+            if not isinstance(quantity, int):
+                raise TypeError(f"quantity must be an integer, got {quantity!r}")
+            subtotal = price * quantity # Exact: integer arithmetic
+            item_rows.append((name, quantity, price, subtotal))
         except KeyError as ke:
             logging.error(f"Missing key {ke} in sale_details for item during save: {item_detail}")
-            continue # Skip this item
+            return None
         except Exception as ex:
-            logging.exception(f"Unexpected error processing item for saving: {item_detail}")
-            continue # Skip this item
+            logging.exception(f"Invalid item in sale_details during save: {item_detail}")
+            return None
+    return item_rows
+
+def _sale_item_insert_rows(cursor, sale_id, item_rows):
+    """
+    Turns _sale_item_rows() output into SaleItems insert rows for sale_id, replacing each
+    product name with its ProductID. Names with no matching product are kept as a snapshot.
+    """
+    names = list({row[0] for row in item_rows})
+    cursor.execute(f"SELECT ProductName, ProductID FROM Products WHERE ProductName IN ({', '.join('?' * len(names))})",
+                   names)
+    product_ids = dict(cursor.fetchall())
+    insert_rows = []
+    for name, quantity, price, subtotal in item_rows:
+        product_id = product_ids.get(name)
+        insert_rows.append((sale_id, product_id, None if product_id is not None else name,
+                            quantity, price, subtotal))
+    return insert_rows
+
+_INSERT_SALE_ITEM_SQL = '''
+    INSERT INTO SaleItems (SaleID, ProductID, ProductName, Quantity, PriceAtSaleCents, SubtotalCents)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+def commit_sale(timestamp, customer_name, sale_details_list):
+    """
+    Saves a complete sale (header and all items) in a single transaction and returns the new SaleID.
+    Accepts sale_details_list as a list of dictionaries:
+    [{'name': str, 'price': int (cents), 'quantity': int}, ...]
+    The header total is the sum of the item subtotals. Nothing is written if any item is invalid
+    or any insert fails, so a crash can never leave a header without its items. Returns None on failure.
+    """
+    item_rows = _sale_item_rows(sale_details_list)
+    if item_rows is None:
+        messagebox.showerror("Invalid Sale", "Could not save sale: one or more items are invalid.\n"
+                             "Nothing was saved; see the log for details.")
+        return None
+    if not item_rows:
+        logging.warning("Attempted to commit a sale with no items.")
+        return None
 
-    if not items_to_insert:
+    sale_id = None
+    timestamp_str = timestamp.isoformat()
+    customer_name_to_save = customer_name if customer_name else 'N/A'
+    total_cents = sum(row[3] for row in item_rows)
+    try:
+        with _connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_INSERT_SALE_SQL, (timestamp_str, total_cents, customer_name_to_save, customer_name_to_save))
+            sale_id = cursor.lastrowid
+            cursor.executemany(_INSERT_SALE_ITEM_SQL, _sale_item_insert_rows(cursor, sale_id, item_rows))
+            conn.commit() # Single commit (one fsync) for header and items
+        logging.info(f"Committed sale ID: {sale_id} for Customer: '{customer_name_to_save}', "
+                     f"{len(item_rows)} items, Total: {total_cents} cents")
+    except sqlite3.Error as e:
+        sale_id = None
+        logging.exception("Error committing sale.")
+        messagebox.showerror("Database Error", f"Could not save sale.\nError: {e}")
+    return sale_id
+
+def save_sale_items_records(sale_id, sale_details_list):
+    """
+    Saves the items for a given sale.
+    Accepts sale_details_list as a list of dictionaries:
+    [{'name': str, 'price': int (cents), 'quantity': int}, ...]
+    Prefer commit_sale(), which writes the header and items in one transaction.
+    """
+    if not sale_id:
+        logging.error("Attempted to save sale items with invalid SaleID.")
+        return False
+    item_rows = _sale_item_rows(sale_details_list)
+
+    if not item_rows:
         logging.warning(f"No valid items found to insert for SaleID: {sale_id}")
         return False
 
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.executemany('''
-            INSERT INTO SaleItems (SaleID, ProductName, Quantity, PriceAtSale, Subtotal)
-            VALUES (?, ?, ?, ?, ?)
-        ''', items_to_insert)
-        conn.commit()
-        logging.info(f"Saved {len(items_to_insert)} items for SaleID: {sale_id}")
+        with _connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(_INSERT_SALE_ITEM_SQL, _sale_item_insert_rows(cursor, sale_id, item_rows))
+            conn.commit()
+        logging.info(f"Saved {len(item_rows)} items for SaleID: {sale_id}")
         return True
     except sqlite3.Error as e:
-        if conn: conn.rollback()
         logging.exception(f"Error saving sale items for SaleID {sale_id}.")
         messagebox.showerror("Database Error", f"Could not save sale items for SaleID {sale_id}.\nError: {e}")
         return False
-    finally:
-        if conn: conn.close()
 
 
 def fetch_sales_list_from_db(customer_name=None):
-    """Fetches basic info for all sales, ordered oldest first. Optionally filters by customer name."""
-    conn = None
+    """
+    Fetches (SaleID, SaleTimestamp, TotalCents, CustomerName) for all sales, ordered oldest first.
+    Optionally filters by customer name.
+    """
     sales_list = []
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        query = "SELECT SaleID, SaleTimestamp, TotalAmount, CustomerName FROM Sales"
+        query = "SELECT SaleID, SaleTimestamp, TotalCents, CustomerName FROM Sales"
         params = []
         if customer_name and customer_name != "All Customers":
-            query += " WHERE CustomerName = ?"
+            query += " WHERE CustomerName = ? COLLATE NOCASE"
             params.append(customer_name)
         query += " ORDER BY SaleTimestamp ASC" # Keep oldest first
-        cursor.execute(query, params)
-        sales_list = cursor.fetchall()
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            sales_list = cursor.fetchall()
         logging.debug(f"Fetched {len(sales_list)} sales records (Customer filter: {customer_name}).")
     except sqlite3.Error as e:
         logging.exception("Error fetching sales list from DB.")
         messagebox.showerror("Database Error", f"Could not fetch sales list.\nError: {e}")
-    finally:
-        if conn: conn.close()
     return sales_list
 
+def fetch_sales_page(after_key=None, limit=SALES_PAGE_SIZE, filters=None):
+    """
+    Fetches one page of the sales history, newest first, without reading older pages.
+
+    Args:
+        after_key: None for the first page, else the (SaleTimestamp, SaleID, ReceiptNo) of the
+                   last row already shown; the page continues right after it.
+        limit: Maximum number of rows to return.
+        filters: Optional search filter dict (see SALES_FILTER_KEYS). ReceiptNo then numbers
+                 the matching sales only.
+
+    Returns:
+        A list of tuples: [(SaleID, SaleTimestamp, TotalCents, CustomerName, ReceiptNo), ...].
+        Fewer than limit rows means there are no more pages. Empty list on error.
+    """
+    page = []
+    filter_sql, filter_params = _sales_filter_sql(filters)
+    if after_key is not None:
+        last_timestamp, last_sale_id, last_receipt_no = after_key
+        params = [last_receipt_no - 1] + filter_params + [last_timestamp, last_sale_id, limit]
+    else:
+        params = filter_params * 2 + [limit] # The count subquery is filtered too
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_sales_page_sql(after_key is not None, filter_sql), params)
+            page = cursor.fetchall()
+        logging.debug(f"Fetched sales page of {len(page)} rows after {after_key} (Filters: {filters}).")
+    except sqlite3.Error as e:
+        logging.exception("Error fetching sales history page.")
+    return page
+
+def fetch_max_sale_id():
+    """Returns the highest SaleID recorded so far (0 if there are no sales), for use as a refresh watermark."""
+    max_sale_id = 0
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(MAX(SaleID), 0) FROM Sales")
+            max_sale_id = cursor.fetchone()[0]
+    except sqlite3.Error as e:
+        logging.exception("Error fetching the latest SaleID.")
+    return max_sale_id
+
+def fetch_sales_since(sale_id, filters=None):
+    """
+    Fetches the sales recorded after SaleID sale_id (a fetch_max_sale_id() watermark), so a
+    history list can pick up new sales without reloading. SaleIDs only grow, which also
+    catches back-dated sales that sort into the middle of the history.
+    filters is the same search filter dict as for fetch_sales_page().
+
+    Returns:
+        A list of fetch_sales_page() style tuples, newest first: [(SaleID, SaleTimestamp,
+        TotalCents, CustomerName, ReceiptNo), ...]. Empty list on error.
+    """
+    new_sales = []
+    filter_sql, filter_params = _sales_filter_sql(filters)
+    outer_filter_sql, _ = _sales_filter_sql(filters, column_prefix="s.")
+    params = filter_params * 2 + [sale_id] + filter_params
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_sales_since_sql(filter_sql, outer_filter_sql), params)
+            new_sales = cursor.fetchall()
+        logging.debug(f"Fetched {len(new_sales)} sales newer than SaleID {sale_id} (Filters: {filters}).")
+    except sqlite3.Error as e:
+        logging.exception(f"Error fetching sales newer than SaleID {sale_id}.")
+    return new_sales
+
+def search_sales(text, limit=SEARCH_RESULT_LIMIT):
+    """
+    Searches receipts by customer name and the names of the products sold on them; every word
+    of text must start a word of either. Best matches come first (customer name weighing most),
+    then the newest. Falls back to LIKE substring tests, newest first, where FTS5 is unavailable.
+    Returns up to limit (SaleID, SaleTimestamp, TotalCents, CustomerName) tuples.
+    """
+    match_query = _fts_match_query(text)
+    if match_query is None:
+        return []
+    sales = []
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            if _search_index_ready:
+                cursor.execute("""
+                    SELECT s.SaleID, s.SaleTimestamp, s.TotalCents, s.CustomerName
+                    FROM SaleSearch
+                    JOIN Sales s ON s.SaleID = SaleSearch.rowid
+                    WHERE SaleSearch MATCH ?
+                    ORDER BY bm25(SaleSearch, 5.0, 1.0), s.SaleTimestamp DESC
+                    LIMIT ?
+                """, (match_query, limit))
+            else:
+                filter_sql, filter_params = _sale_text_filter_sql(text)
+                cursor.execute(f"""
+                    SELECT SaleID, SaleTimestamp, TotalCents, CustomerName
+                    FROM Sales
+                    WHERE 1 = 1{filter_sql}
+                    ORDER BY SaleTimestamp DESC, SaleID DESC
+                    LIMIT ?
+                """, filter_params + [limit])
+            sales = cursor.fetchall()
+        logging.debug(f"Sales search '{text}' found {len(sales)} sales.")
+    except sqlite3.Error as e:
+        logging.exception(f"Error searching sales for '{text}'.")
+    return sales
+
 def fetch_sale_items_from_db(sale_id):
     """Fetches all items for a specific SaleID."""
-    conn = None
     items_list = []
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT ProductName, Quantity, PriceAtSale, Subtotal
-            FROM SaleItems
-            WHERE SaleID = ?
-            ORDER BY ProductName
-        """, (sale_id,))
-        items_list = cursor.fetchall()
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COALESCE(p.ProductName, si.ProductName) as ProductName,
+                       si.Quantity, si.PriceAtSaleCents, si.SubtotalCents
+                FROM SaleItems si
+                LEFT JOIN Products p ON p.ProductID = si.ProductID
+                WHERE si.SaleID = ?
+                ORDER BY ProductName
+            """, (sale_id,))
+            items_list = cursor.fetchall()
         logging.debug(f"Fetched {len(items_list)} items for SaleID {sale_id}.")
     except sqlite3.Error as e:
         logging.exception(f"Error fetching items for Sale ID {sale_id}.")
-        messagebox.showerror("Database Error", f"Could not fetch items for Sale ID {sale_id}.\nError: {e}")
-    finally:
-        if conn: conn.close()
+        _show_db_error("Database Error", f"Could not fetch items for Sale ID {sale_id}.\nError: {e}")
     return items_list
 
+def fetch_sale_items_for_sales(sale_ids):
+    """
+    Fetches the items of several sales in one query (used to prefetch receipts).
+    Returns a dict: {SaleID: [(ProductName, Quantity, PriceAtSaleCents, SubtotalCents), ...]}
+    with an entry (possibly empty) for every requested SaleID. Empty dict on error.
+    """
+    sale_ids = list(sale_ids)
+    if not sale_ids:
+        return {}
+    items_by_sale = {}
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT si.SaleID, COALESCE(p.ProductName, si.ProductName) as ProductName,
+                       si.Quantity, si.PriceAtSaleCents, si.SubtotalCents
+                FROM SaleItems si
+                LEFT JOIN Products p ON p.ProductID = si.ProductID
+                WHERE si.SaleID IN ({', '.join('?' * len(sale_ids))})
+                ORDER BY si.SaleID, ProductName
+            """, sale_ids)
+            rows = cursor.fetchall()
+        items_by_sale = {sale_id: [] for sale_id in sale_ids}
+        for sale_id, *item in rows:
+            items_by_sale[sale_id].append(tuple(item))
+        logging.debug(f"Fetched {len(rows)} items for {len(sale_ids)} sales.")
+    except sqlite3.Error as e:
+        logging.exception(f"Error fetching items for Sale IDs {sale_ids}.")
+    return items_by_sale
+
+# --- Customer Change Listeners ---
+# Called as listener(action, customer_id, customer) after add/update/delete_customer... commit,
+# with action 'added', 'updated' or 'deleted' and customer the new
+# (CustomerID, CustomerName, ContactNumber, Address) row (None when deleted).
+# customer_directory keeps its in-memory copy current this way.
+_customer_listeners = []
+
+def add_customer_listener(listener):
+    if listener not in _customer_listeners:
+        _customer_listeners.append(listener)
+
+def remove_customer_listener(listener):
+    if listener in _customer_listeners:
+        _customer_listeners.remove(listener)
+
+def _notify_customer_change(action, customer_id, customer=None):
+    for listener in list(_customer_listeners):
+        try:
+            listener(action, customer_id, customer)
+        except Exception:
+            logging.exception(f"Error notifying customer listener {listener!r} of '{action}' ({customer_id}).")
+
 def fetch_distinct_customer_names():
     """Fetches distinct customer names from the Customers table."""
-    conn = None
     names = []
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT DISTINCT CustomerName
-            FROM Customers
-            WHERE CustomerName IS NOT NULL AND CustomerName != '' AND CustomerName != 'N/A'
-            ORDER BY CustomerName COLLATE NOCASE
-        """)
-        names = [row[0] for row in cursor.fetchall()]
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT DISTINCT CustomerName
+                FROM Customers
+                WHERE CustomerName IS NOT NULL AND CustomerName != '' AND CustomerName != 'N/A'
+                ORDER BY CustomerName COLLATE NOCASE
+            """)
+            names = [row[0] for row in cursor.fetchall()]
         logging.debug(f"Fetched {len(names)} distinct customer names from Customers table.")
     except sqlite3.Error as e:
         logging.exception("Error fetching distinct customer names.")
-    finally:
-        if conn: conn.close()
+    return names
+
+CUSTOMER_ACTIVITY_DAYS = 90 # Purchases in this many recent days rank a customer's name higher
+
+def fetch_customer_names_by_activity(recent_days=CUSTOMER_ACTIVITY_DAYS):
+    """
+    Fetches all customer names (without the 'N/A' placeholder), most active first: by number of
+    purchases in the last recent_days, then most recent purchase, then alphabetically.
+    """
+    names = []
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=recent_days)).isoformat()
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT c.CustomerName
+                FROM Customers c
+                LEFT JOIN Sales s ON s.CustomerID = c.CustomerID
+                WHERE c.CustomerName != '' AND c.CustomerName != 'N/A'
+                GROUP BY c.CustomerID
+                ORDER BY COALESCE(SUM(s.SaleTimestamp >= ?), 0) DESC,
+                         MAX(s.SaleTimestamp) DESC,
+                         c.CustomerName COLLATE NOCASE
+            """, (cutoff,))
+            names = [row[0] for row in cursor.fetchall()]
+        logging.debug(f"Fetched {len(names)} customer names by activity.")
+    except sqlite3.Error as e:
+        logging.exception("Error fetching customer names by activity.")
     return names
 
 def fetch_all_customers():
     """Fetches all customer details (ID, name, contact, address), ordered newest first by DateAdded."""
-    conn = None
     customers = []
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT CustomerID, CustomerName, ContactNumber, Address
-            FROM Customers
-            WHERE CustomerName != 'N/A' -- Exclude the placeholder
-            ORDER BY DateAdded DESC
-        """)
-        customers = cursor.fetchall()
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT CustomerID, CustomerName, ContactNumber, Address
+                FROM Customers
+                WHERE CustomerName != 'N/A' -- Exclude the placeholder
+                ORDER BY DateAdded DESC, CustomerID DESC -- Added in the same second: later ID is newer
+            """)
+            customers = cursor.fetchall()
         logging.debug(f"Fetched {len(customers)} customer records.")
     except sqlite3.Error as e:
         logging.exception("Error fetching all customers.")
         messagebox.showerror("Database Error", f"Could not fetch customer list.\nError: {e}")
-    finally:
-        if conn: conn.close()
+    return customers
+
+
+def fetch_customer_by_name(name):
+    """Fetches (CustomerID, CustomerName, ContactNumber, Address) for a name (case-insensitive), or None."""
+    customer = None
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT CustomerID, CustomerName, ContactNumber, Address
+                FROM Customers
+                WHERE CustomerName = ? COLLATE NOCASE
+            """, (name,))
+            customer = cursor.fetchone()
+    except sqlite3.Error as e:
+        logging.exception(f"Error fetching customer '{name}'.")
+    return customer
+
+
+def search_customers(text, limit=SEARCH_RESULT_LIMIT):
+    """
+    Searches customers' names, contact numbers and addresses for every word of text (as word
+    starts), best matches first, name matches weighing most. Uses the CustomerSearch full-text
+    index, or LIKE substring tests (alphabetical) where FTS5 is unavailable.
+    Returns up to limit (CustomerID, CustomerName, ContactNumber, Address) tuples.
+    """
+    match_query = _fts_match_query(text)
+    if match_query is None:
+        return []
+    customers = []
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            if _search_index_ready:
+                cursor.execute("""
+                    SELECT c.CustomerID, c.CustomerName, c.ContactNumber, c.Address
+                    FROM CustomerSearch
+                    JOIN Customers c ON c.CustomerID = CustomerSearch.rowid
+                    WHERE CustomerSearch MATCH ? AND c.CustomerName != 'N/A'
+                    ORDER BY bm25(CustomerSearch, 10.0, 2.0, 1.0)
+                    LIMIT ?
+                """, (match_query, limit))
+            else:
+                word_sql = ("(CustomerName LIKE ? ESCAPE '\\' OR ContactNumber LIKE ? ESCAPE '\\' "
+                            "OR Address LIKE ? ESCAPE '\\')")
+                words = text.split()
+                cursor.execute(f"""
+                    SELECT CustomerID, CustomerName, ContactNumber, Address
+                    FROM Customers
+                    WHERE CustomerName != 'N/A' AND {" AND ".join([word_sql] * len(words))}
+                    ORDER BY CustomerName COLLATE NOCASE
+                    LIMIT ?
+                """, [_like_pattern(word) for word in words for _ in range(3)] + [limit])
+            customers = cursor.fetchall()
+        logging.debug(f"Customer search '{text}' found {len(customers)} customers.")
+    except sqlite3.Error as e:
+        logging.exception(f"Error searching customers for '{text}'.")
     return customers
 
 
@@ -401,209 +1757,377 @@ def add_customer_to_db(name, contact=None, address=None):
     if not name or name == 'N/A':
         logging.warning("Attempted to add empty or 'N/A' customer name.")
         return False
-    conn = None
     success = False
+    new_customer = None
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        # Use INSERT OR IGNORE to handle cases where customer name might already exist due to case differences
-        # The UNIQUE constraint on CustomerName is case-insensitive due to COLLATE NOCASE
-        cursor.execute("INSERT OR IGNORE INTO Customers (CustomerName, ContactNumber, Address) VALUES (?, ?, ?)",
-                       (name, contact, address))
-        conn.commit()
-        # Check if a row was actually inserted or if it was ignored (meaning it already existed)
-        if cursor.lastrowid != 0 or cursor.changes() > 0:
-            logging.info(f"Customer '{name}' added to database.")
-            success = True
-        else:
-            # If no changes, it means the customer (case-insensitively) already exists
-            logging.info(f"Customer '{name}' (or a case-variant) already exists in the database. Not added again.")
-            # We can consider this a "success" in the sense that the customer is in the DB.
-            # To be more precise, we can check if it exists.
-            cursor.execute("SELECT 1 FROM Customers WHERE CustomerName = ? COLLATE NOCASE", (name,))
-            if cursor.fetchone():
-                success = True # It exists
+        with _connections.writer() as conn:
+            cursor = conn.cursor()
+            # Use INSERT OR IGNORE to handle cases where customer name might already exist due to case differences
+            # The UNIQUE constraint on CustomerName is case-insensitive due to COLLATE NOCASE
+            cursor.execute("INSERT OR IGNORE INTO Customers (CustomerName, ContactNumber, Address) VALUES (?, ?, ?)",
+                           (name, contact, address))
+            conn.commit()
+            # Check if a row was actually inserted or if it was ignored (meaning it already existed).
+            # rowcount is used rather than lastrowid, which keeps the previous insert's value on a pooled connection.
+            if cursor.rowcount > 0:
+                logging.info(f"Customer '{name}' added to database.")
+                success = True
+                new_customer = (cursor.lastrowid, name, contact, address)
             else:
-                # This case should be rare if INSERT OR IGNORE is working as expected with COLLATE NOCASE
-                logging.error(f"Failed to ensure customer '{name}' in database (after INSERT OR IGNORE).")
+                # If no changes, it means the customer (case-insensitively) already exists
+                logging.info(f"Customer '{name}' (or a case-variant) already exists in the database. Not added again.")
+                # We can consider this a "success" in the sense that the customer is in the DB.
+                # To be more precise, we can check if it exists.
+                cursor.execute("SELECT 1 FROM Customers WHERE CustomerName = ? COLLATE NOCASE", (name,))
+                if cursor.fetchone():
+                    success = True # It exists
+                else:
+                    # This case should be rare if INSERT OR IGNORE is working as expected with COLLATE NOCASE
+                    logging.error(f"Failed to ensure customer '{name}' in database (after INSERT OR IGNORE).")
 
     except sqlite3.Error as e: # Catch any other SQLite error
-        if conn: conn.rollback()
         logging.exception(f"Error adding customer '{name}'.")
         messagebox.showerror("Database Error", f"Could not add customer '{name}'.\nError: {e}", parent=None) # parent=None if called from non-GUI context
-    finally:
-        if conn: conn.close()
+    if new_customer is not None:
+        _notify_customer_change("added", new_customer[0], new_customer)
     return success
 
 
 def update_customer_in_db(customer_id, name, contact, address):
     """Updates details for an existing customer."""
-    conn = None
     success = False
     if not name:
         logging.warning("Customer update failed: Name cannot be empty.")
         return False
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE Customers
-            SET CustomerName = ?, ContactNumber = ?, Address = ?
-            WHERE CustomerID = ?
-        """, (name, contact, address, customer_id))
-        conn.commit()
+        with _connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE Customers
+                SET CustomerName = ?, ContactNumber = ?, Address = ?
+                WHERE CustomerID = ?
+            """, (name, contact, address, customer_id))
+            conn.commit()
         if cursor.rowcount > 0:
             success = True
             logging.info(f"Updated customer ID {customer_id} to Name: '{name}'")
+            _notify_customer_change("updated", customer_id, (customer_id, name, contact, address))
         else:
             logging.warning(f"Customer ID {customer_id} not found for update.")
     except sqlite3.IntegrityError: # Handles UNIQUE constraint violation for CustomerName
-        if conn: conn.rollback()
         logging.warning(f"Update error for customer ID {customer_id}: Name '{name}' likely already exists.")
         messagebox.showerror("Update Error", f"Could not update customer.\nAnother customer with the name '{name}' might already exist.", parent=None)
     except sqlite3.Error as e:
-        if conn: conn.rollback()
         logging.exception(f"Error updating customer ID {customer_id}.")
         messagebox.showerror("Database Error", f"Could not update customer ID {customer_id}.\nError: {e}", parent=None)
-    finally:
-        if conn: conn.close()
     return success
 
 def delete_customer_from_db(customer_id):
     """Deletes a customer from the Customers table."""
-    conn = None
     success = False
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM Customers WHERE CustomerID = ?", (customer_id,))
-        conn.commit()
+        with _connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM Customers WHERE CustomerID = ?", (customer_id,))
+            conn.commit()
         if cursor.rowcount > 0:
             success = True
             logging.info(f"Deleted customer ID {customer_id} from database.")
+            _notify_customer_change("deleted", customer_id)
         else:
             logging.warning(f"Customer ID {customer_id} not found for deletion.")
     except sqlite3.Error as e:
-        if conn: conn.rollback()
         logging.exception(f"Error deleting customer ID {customer_id}.")
         messagebox.showerror("Database Error", f"Could not delete customer ID {customer_id}.\nError: {e}", parent=None)
-    finally:
-        if conn: conn.close()
     return success
 
 
+def _is_closed_range(end_dt_exclusive_str):
+    """True if a report range ended before today, so its results can only change through the cache triggers."""
+    try:
+        end_dt = datetime.datetime.fromisoformat(end_dt_exclusive_str)
+    except (TypeError, ValueError):
+        return False
+    return end_dt <= datetime.datetime.combine(datetime.date.today(), datetime.time.min)
+
+def _cached_report(query_name, start_dt_str, end_dt_exclusive_str, customer_name, compute, from_json):
+    """
+    Returns compute() for a report range, from ReportCache when the range is closed (see
+    REPORT_CACHE_TABLES). Closed-range results are stored after computing; open ranges are
+    always computed. compute's sqlite3.Error propagates; cache failures only cost a recompute.
+    from_json turns the JSON-decoded lists back into the report's tuples.
+    """
+    if not _is_closed_range(end_dt_exclusive_str):
+        return compute()
+    cache_key = (query_name, start_dt_str, end_dt_exclusive_str,
+                 customer_name if customer_name and customer_name != "All Customers" else "")
+    generation = None
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            # Generation first: a change committed after this read makes the store below a no-op
+            cursor.execute("SELECT Generation FROM ReportCacheState")
+            generation = cursor.fetchone()[0]
+            cursor.execute("SELECT ResultJSON FROM ReportCache "
+                           "WHERE QueryName = ? AND RangeStart = ? AND RangeEnd = ? AND CustomerName = ?", cache_key)
+            cached = cursor.fetchone()
+        if cached:
+            logging.debug(f"Report cache hit for {cache_key}.")
+            return from_json(json.loads(cached[0]))
+    except (sqlite3.Error, TypeError) as e:
+        logging.warning(f"Report cache lookup failed for {cache_key}: {e}")
+        generation = None
+
+    result = compute()
+    if generation is not None:
+        try:
+            with _connections.writer() as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO ReportCache (QueryName, RangeStart, RangeEnd, CustomerName, ResultJSON)
+                    SELECT ?, ?, ?, ?, ? FROM ReportCacheState WHERE Generation = ?
+                """, cache_key + (json.dumps(result), generation))
+                conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Could not store {cache_key} in the report cache: {e}")
+    return result
+
+def fetch_report_generation():
+    """
+    Returns ReportCacheState.Generation, which the cache triggers raise on every change to sales,
+    their items, customer names on sales or product names; None on error. Two equal values mean
+    no report result has changed in between.
+    """
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT Generation FROM ReportCacheState WHERE StateID = 1")
+            row = cursor.fetchone()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        logging.exception("Error fetching the report data generation.")
+        return None
+
+def clear_report_cache():
+    """Empties the report result cache (it refills as reports are run). Returns True on success."""
+    try:
+        with _connections.writer() as conn:
+            conn.execute("DELETE FROM ReportCache")
+            conn.execute("UPDATE ReportCacheState SET Generation = Generation + 1")
+            conn.commit()
+        logging.info("Report cache cleared.")
+        return True
+    except sqlite3.Error as e:
+        logging.exception("Error clearing the report cache.")
+        return False
+
+def _compute_sales_stats(start_dt_str, end_dt_exclusive_str, customer_name=None):
+    """
+    Runs the sales stats queries for fetch_sales_stats. Without a customer filter, whole days
+    come from DailySales and only partial days touch Sales. Raises sqlite3.Error to the caller.
+    """
+    total_revenue = 0
+    total_items = 0
+    num_sales = 0
+    filter_by_customer = bool(customer_name and customer_name != "All Customers")
+    if filter_by_customer: # Rollups are not kept per customer
+        whole_days, raw_ranges = None, [(start_dt_str, end_dt_exclusive_str)]
+    else:
+        whole_days, raw_ranges = _split_whole_days(start_dt_str, end_dt_exclusive_str)
+    query_sales, query_items = _sales_stats_sql(filter_by_customer)
+
+    with _connections.reader() as conn:
+        cursor = conn.cursor()
+        if whole_days:
+            cursor.execute(_ROLLUP_SALES_STATS_SQL, whole_days)
+            total_revenue, total_items, num_sales = cursor.fetchone()
+
+        for range_start, range_end in raw_ranges:
+            params = [range_start, range_end]
+            if filter_by_customer:
+                params.append(customer_name)
+            cursor.execute(query_sales, params)
+            result_sales = cursor.fetchone()
+            if result_sales:
+                total_revenue += result_sales[0] if result_sales[0] is not None else 0
+                num_sales += result_sales[1] if result_sales[1] is not None else 0
+
+            # The items query takes the same params (including the optional customer_name)
+            cursor.execute(query_items, params)
+            result_items = cursor.fetchone()
+            if result_items:
+                total_items += result_items[0] if result_items[0] is not None else 0
+    return (total_revenue, total_items, num_sales)
+
 def fetch_sales_stats(start_dt_str, end_dt_exclusive_str, customer_name=None):
     """
     Fetches total revenue, total items sold, and number of sales within a date range.
     Optionally filters by customer name ('All Customers' means no filter).
     Expects ISO format strings like 'YYYY-MM-DDTHH:MM:SS'.
-    Returns a tuple: (total_revenue, total_items, num_sales) or (0.0, 0, 0) on error.
+    Returns a tuple: (total_revenue_cents, total_items, num_sales) or (0, 0, 0) on error.
+    Ranges that ended before today are served from the report cache after the first call.
     """
-    conn = None
-    total_revenue = 0.0
-    total_items = 0
-    num_sales = 0
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;")
-
-        base_sales_query = "FROM Sales WHERE SaleTimestamp >= ? AND SaleTimestamp < ?"
-        base_items_query = "FROM SaleItems JOIN Sales ON SaleItems.SaleID = Sales.SaleID WHERE Sales.SaleTimestamp >= ? AND Sales.SaleTimestamp < ?"
-        params = [start_dt_str, end_dt_exclusive_str]
+        stats = _cached_report("sales_stats", start_dt_str, end_dt_exclusive_str, customer_name,
+                               lambda: _compute_sales_stats(start_dt_str, end_dt_exclusive_str, customer_name),
+                               tuple)
+        logging.debug(f"Fetched sales stats ({start_dt_str} to {end_dt_exclusive_str}, Customer: {customer_name}): Rev={stats[0]} cents, Items={stats[1]}, Sales={stats[2]}")
+    except sqlite3.Error as e:
+        logging.exception(f"Error fetching sales stats ({start_dt_str} to {end_dt_exclusive_str}, Customer: {customer_name})")
+        return (0, 0, 0) # Return default on error
 
-        customer_filter_sql = ""
-        if customer_name and customer_name != "All Customers":
-            customer_filter_sql = " AND CustomerName = ?"
-            params.append(customer_name)
+    return stats
 
-        query_sales = f"SELECT COALESCE(SUM(TotalAmount), 0), COUNT(SaleID) {base_sales_query} {customer_filter_sql}"
-        cursor.execute(query_sales, params)
-        result_sales = cursor.fetchone()
-        if result_sales:
-            total_revenue = result_sales[0] if result_sales[0] is not None else 0.0
-            num_sales = result_sales[1] if result_sales[1] is not None else 0
 
-        # For total_items, we need to use the params list that might include the customer_name
-        # The original params list is modified if customer_name is present.
-        # So, we use the same params list for the items query.
-        query_items = f"SELECT COALESCE(SUM(Quantity), 0) {base_items_query} {customer_filter_sql}"
-        cursor.execute(query_items, params) # Use the potentially modified params
-        result_items = cursor.fetchone()
-        if result_items:
-            total_items = result_items[0] if result_items[0] is not None else 0
+def fetch_dashboard_stats(periods, summary_period=None):
+    """
+    Fetches the totals of several whole-day periods (today, this week, a custom range...) in a
+    single query over DailySales, so a summary screen costs one round trip however many it shows.
+    With summary_period, the product summary of that period comes along, so a summary screen
+    needs just this one call.
 
-        logging.debug(f"Fetched sales stats ({start_dt_str} to {end_dt_exclusive_str}, Customer: {customer_name}): Rev={total_revenue:.2f}, Items={total_items}, Sales={num_sales}")
+    Args:
+        periods: A dict {name: (start_date, end_date_exclusive)} of datetime.date values.
+        summary_period: Optional name (a key of periods) of the period whose product summary is wanted.
 
+    Returns:
+        (stats, product_summary, generation):
+        stats is a dict {name: (total_revenue_cents, total_items, num_sales)}; every period is
+        (0, 0, 0) if there are no sales or on error.
+        product_summary is the summary_period's rows as from fetch_product_summary_by_date_range()
+        (empty on error), or None without summary_period.
+        generation is the report generation (see fetch_report_generation()) read before both,
+        or None on error.
+    """
+    stats = {name: (0, 0, 0) for name in periods}
+    product_summary = None if summary_period is None else []
+    generation = None
+    if not periods:
+        return stats, product_summary, generation
+    params = []
+    for start_date, end_date_exclusive in periods.values():
+        params.extend([start_date.isoformat(), end_date_exclusive.isoformat()] * 3)
+    params.append(min(start_date for start_date, _ in periods.values()).isoformat())
+    params.append(max(end_date for _, end_date in periods.values()).isoformat())
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            # Generation first: a change committed after this read raises it, so results keyed on it are never stale
+            cursor.execute("SELECT Generation FROM ReportCacheState WHERE StateID = 1")
+            generation_row = cursor.fetchone()
+            cursor.execute(_dashboard_sql(len(periods)), params)
+            row = cursor.fetchone()
+        generation = generation_row[0] if generation_row else None
+        for index, name in enumerate(periods):
+            stats[name] = tuple(row[index * 3:index * 3 + 3])
+        logging.debug(f"Fetched dashboard stats: {stats}")
+        if summary_period is not None:
+            start_dt_str, end_dt_exclusive_str = (datetime.datetime.combine(day, datetime.time.min).isoformat()
+                                                  for day in periods[summary_period])
+            product_summary = _cached_report("product_summary", start_dt_str, end_dt_exclusive_str, None,
+                                             lambda: _fetch_product_summary(start_dt_str, end_dt_exclusive_str),
+                                             lambda rows: [tuple(row) for row in rows])
     except sqlite3.Error as e:
-        logging.exception(f"Error fetching sales stats ({start_dt_str} to {end_dt_exclusive_str}, Customer: {customer_name})")
-        return (0.0, 0, 0) # Return default on error
-    finally:
-        if conn: conn.close()
+        logging.exception(f"Error fetching dashboard stats for {periods}.")
+    return stats, product_summary, generation
 
-    return (total_revenue, total_items, num_sales)
+
+def fetch_sales_buckets(start_date, end_date_exclusive, bucket="day"):
+    """
+    Fetches revenue, items sold and number of sales grouped into day, week (Monday start)
+    or month buckets, in a single query over the DailySales rollup.
+
+    Args:
+        start_date: First day included (datetime.date or 'YYYY-MM-DD').
+        end_date_exclusive: First day not included (datetime.date or 'YYYY-MM-DD').
+        bucket: 'day', 'week' or 'month'.
+
+    Returns:
+        A list of tuples: [(BucketStart 'YYYY-MM-DD', TotalRevenueCents, TotalItems, NumSales), ...],
+        oldest first. Buckets with no sales are omitted. Returns empty list on error.
+    """
+    if bucket not in SALES_BUCKET_KEYS:
+        raise ValueError(f"Unknown bucket '{bucket}'. Expected one of: {', '.join(SALES_BUCKET_KEYS)}")
+    buckets = []
+    try:
+        params = [str(start_date), str(end_date_exclusive)] # date.__str__ is ISO 'YYYY-MM-DD'
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_sales_buckets_sql(bucket), params)
+            buckets = cursor.fetchall()
+        logging.debug(f"Fetched {len(buckets)} {bucket} buckets ({start_date} to {end_date_exclusive}).")
+    except sqlite3.Error as e:
+        logging.exception(f"Error fetching {bucket} sales buckets ({start_date} to {end_date_exclusive})")
+    return buckets
 
 
 def fetch_sales_summary(start_dt_str, end_dt_exclusive_str, customer_name=None):
     """
     DEPRECATED: Use fetch_sales_stats instead.
-    Fetches the sum of TotalAmount for sales within a date range.
+    Fetches the sum of TotalCents for sales within a date range.
     """
     logging.warning("fetch_sales_summary is deprecated. Use fetch_sales_stats.")
     total_revenue, _, _ = fetch_sales_stats(start_dt_str, end_dt_exclusive_str, customer_name)
     return total_revenue
 
 
-def fetch_product_summary_by_date_range(start_dt_str, end_dt_exclusive_str, customer_name=None):
+def _product_summary_query(start_dt_str, end_dt_exclusive_str, customer_name=None):
     """
-    Fetches aggregated product sales (total quantity, total revenue) within a date range.
-    Optionally filters by customer name ('All Customers' means no filter).
+    Returns (sql, params) for the per-product summary of a range. Without a customer filter,
+    whole days come from DailyProductSales and only partial days touch SaleItems.
     """
-    conn = None
-    summary_data = []
-    try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;")
-        query = """
-            SELECT
-                si.ProductName,
-                SUM(si.Quantity) as TotalQuantity,
-                SUM(si.Subtotal) as TotalRevenue
-            FROM SaleItems si
-            JOIN Sales s ON si.SaleID = s.SaleID
-            WHERE s.SaleTimestamp >= ? AND s.SaleTimestamp < ?
-        """
+    filter_by_customer = bool(customer_name and customer_name != "All Customers")
+    whole_days = None
+    if not filter_by_customer: # Rollups are not kept per customer
+        whole_days, raw_ranges = _split_whole_days(start_dt_str, end_dt_exclusive_str)
+    if whole_days:
+        query = _rollup_product_summary_sql(len(raw_ranges))
+        params = list(whole_days)
+        for range_start, range_end in raw_ranges:
+            params.extend([range_start, range_end])
+    else:
+        query = _product_summary_sql(filter_by_customer)
         params = [start_dt_str, end_dt_exclusive_str]
-        if customer_name and customer_name != "All Customers":
-            query += " AND s.CustomerName = ?"
+        if filter_by_customer:
             params.append(customer_name)
+    return query, params
+
 
-        query += """
-            GROUP BY si.ProductName
-            ORDER BY si.ProductName COLLATE NOCASE
-        """
+def _fetch_product_summary(start_dt_str, end_dt_exclusive_str, customer_name=None):
+    """Runs the per-product summary for a range. Raises sqlite3.Error to the caller."""
+    query, params = _product_summary_query(start_dt_str, end_dt_exclusive_str, customer_name)
+    with _connections.reader() as conn:
+        cursor = conn.cursor()
         cursor.execute(query, params)
-        summary_data = cursor.fetchall()
+        return cursor.fetchall()
+
+
+def fetch_product_summary_by_date_range(start_dt_str, end_dt_exclusive_str, customer_name=None):
+    """
+    Fetches aggregated product sales (total quantity, total revenue in cents) within a date range.
+    Optionally filters by customer name ('All Customers' means no filter).
+    Ranges that ended before today are served from the report cache after the first call.
+    """
+    summary_data = []
+    try:
+        summary_data = _cached_report("product_summary", start_dt_str, end_dt_exclusive_str, customer_name,
+                                      lambda: _fetch_product_summary(start_dt_str, end_dt_exclusive_str, customer_name),
+                                      lambda rows: [tuple(row) for row in rows])
         logging.debug(f"Fetched product summary ({start_dt_str} to {end_dt_exclusive_str}, Customer: {customer_name}). Found {len(summary_data)} products.")
     except sqlite3.Error as e:
         logging.exception(f"Error fetching product summary ({start_dt_str} to {end_dt_exclusive_str}, Customer: {customer_name})")
-        messagebox.showerror("Database Error", f"Could not fetch product summary.\nError: {e}") # Keep messagebox for this one as it's a direct summary view
-    finally:
-        if conn: conn.close()
+        _show_db_error("Database Error", f"Could not fetch product summary.\nError: {e}") # Keep messagebox for this one as it's a direct summary view
     return summary_data
 
 
 def delete_sale_from_db(sale_id):
     """Deletes a sale and its associated items from the database."""
-    conn = None
     success = False
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;") # Ensure cascade delete works
-        cursor.execute("DELETE FROM Sales WHERE SaleID = ?", (sale_id,))
-        conn.commit()
+        # Pooled connections are opened with foreign keys ON, so the cascade to SaleItems applies
+        with _connections.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM Sales WHERE SaleID = ?", (sale_id,))
+            conn.commit()
         if cursor.rowcount > 0:
             success = True
             logging.info(f"Deleted Sale ID {sale_id} and its items (via cascade) from database.")
@@ -611,160 +2135,159 @@ def delete_sale_from_db(sale_id):
             logging.warning(f"Sale ID {sale_id} not found in database for deletion.")
             # No messagebox here, let caller handle UI.
     except sqlite3.Error as e:
-        if conn: conn.rollback()
         logging.exception(f"Error deleting Sale ID {sale_id}.")
         # Avoid showing messagebox here; let caller handle UI feedback
-    finally:
-        if conn: conn.close()
     return success
 
 def fetch_sales_summary_by_customer(start_dt_str, end_dt_exclusive_str):
     """
-    Fetches aggregated sales totals grouped by customer name within a date range.
+    Fetches aggregated sales totals grouped by customer within a date range.
+    Customers are grouped by CustomerID, so a renamed customer appears once under the current name.
 
     Args:
         start_dt_str: ISO format start timestamp (inclusive).
         end_dt_exclusive_str: ISO format end timestamp (exclusive).
 
     Returns:
-        A list of tuples: [(CustomerName, TotalSalesAmount), ...],
+        A list of tuples: [(CustomerName, TotalSalesCents), ...],
         sorted by CustomerName (case-insensitive). Returns empty list on error.
     """
-    conn = None
     summary_data = []
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        query = """
-            SELECT
-                CustomerName,
-                SUM(TotalAmount) as TotalSales
-            FROM Sales
-            WHERE SaleTimestamp >= ? AND SaleTimestamp < ?
-            GROUP BY CustomerName COLLATE NOCASE -- Group case-insensitively
-            ORDER BY CustomerName COLLATE NOCASE -- Order case-insensitively
-        """
         params = [start_dt_str, end_dt_exclusive_str]
-        cursor.execute(query, params)
-        summary_data = cursor.fetchall()
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SALES_SUMMARY_BY_CUSTOMER_SQL, params)
+            summary_data = cursor.fetchall()
         logging.info(f"Fetched sales summary by customer for {start_dt_str} to {end_dt_exclusive_str}. Found {len(summary_data)} customers.")
     except sqlite3.Error as e:
         logging.exception(f"Error fetching sales summary by customer ({start_dt_str} to {end_dt_exclusive_str})")
         # No messagebox, return empty list on error
-    finally:
-        if conn:
-            conn.close()
     return summary_data
 
-def fetch_customer_purchase_details_by_date(customer_name, start_dt_str, end_dt_exclusive_str):
+def fetch_customer_purchase_details_by_date(customer_id, start_dt_str, end_dt_exclusive_str):
     """
     Fetches detailed product purchases for a specific customer within a date range.
 
     Args:
-        customer_name: The name of the customer.
+        customer_id: The CustomerID of the customer.
         start_dt_str: ISO format start timestamp (inclusive).
         end_dt_exclusive_str: ISO format end timestamp (exclusive).
 
     Returns:
-        A list of tuples: [(SaleTimestamp, ProductName, Quantity, PriceAtSale, Subtotal), ...],
+        A list of tuples: [(SaleTimestamp, ProductName, Quantity, PriceAtSaleCents, SubtotalCents), ...],
         sorted by SaleTimestamp. Returns empty list on error.
     """
-    conn = None
     purchase_details = []
-    if not customer_name:
-        logging.warning("Attempted to fetch purchase details with no customer name.")
+    if customer_id is None:
+        logging.warning("Attempted to fetch purchase details with no customer ID.")
         return purchase_details
 
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        query = """
-            SELECT
-                s.SaleTimestamp,
-                si.ProductName,
-                si.Quantity,
-                si.PriceAtSale,
-                si.Subtotal
-            FROM SaleItems si
-            JOIN Sales s ON si.SaleID = s.SaleID
-            WHERE s.CustomerName = ? COLLATE NOCASE -- Match customer case-insensitively
-              AND s.SaleTimestamp >= ?
-              AND s.SaleTimestamp < ?
-            ORDER BY s.SaleTimestamp ASC -- Show oldest first for history
-        """
-        params = [customer_name, start_dt_str, end_dt_exclusive_str]
-        cursor.execute(query, params)
-        purchase_details = cursor.fetchall()
-        logging.info(f"Fetched {len(purchase_details)} purchase detail items for customer '{customer_name}' between {start_dt_str} and {end_dt_exclusive_str}.")
+        params = [customer_id, start_dt_str, end_dt_exclusive_str]
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_CUSTOMER_PURCHASES_BY_DATE_SQL, params)
+            purchase_details = cursor.fetchall()
+        logging.info(f"Fetched {len(purchase_details)} purchase detail items for customer ID {customer_id} between {start_dt_str} and {end_dt_exclusive_str}.")
     except sqlite3.Error as e:
-        logging.exception(f"Error fetching purchase details for customer '{customer_name}'")
+        logging.exception(f"Error fetching purchase details for customer ID {customer_id}")
         # No messagebox
-    finally:
-        if conn:
-            conn.close()
     return purchase_details
 
 
-def fetch_all_customer_purchase_details(customer_name):
+def fetch_all_customer_purchase_details(customer_id):
     """
     Fetches all detailed product purchases for a specific customer across all time.
 
     Args:
-        customer_name: The name of the customer.
+        customer_id: The CustomerID of the customer.
 
     Returns:
-        A list of tuples: [(SaleTimestamp, ProductName, Quantity, PriceAtSale, Subtotal), ...],
-        sorted by SaleTimestamp (oldest first). Returns empty list on error or if no customer name.
+        A list of tuples: [(SaleTimestamp, ProductName, Quantity, PriceAtSaleCents, SubtotalCents), ...],
+        sorted by SaleTimestamp (oldest first). Returns empty list on error or if no customer ID.
     """
-    conn = None
     purchase_details = []
-    if not customer_name:
-        logging.warning("Attempted to fetch all purchase details with no customer name.")
+    if customer_id is None:
+        logging.warning("Attempted to fetch all purchase details with no customer ID.")
         return purchase_details
 
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        query = """
-            SELECT
-                s.SaleTimestamp,
-                si.ProductName,
-                si.Quantity,
-                si.PriceAtSale,
-                si.Subtotal
-            FROM SaleItems si
-            JOIN Sales s ON si.SaleID = s.SaleID
-            WHERE s.CustomerName = ? COLLATE NOCASE -- Match customer case-insensitively
-            ORDER BY s.SaleTimestamp ASC -- Show oldest first for history
-        """
-        params = [customer_name]
-        cursor.execute(query, params)
-        purchase_details = cursor.fetchall()
-        logging.info(f"Fetched all ({len(purchase_details)}) purchase detail items for customer '{customer_name}'.")
+        params = [customer_id]
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_ALL_CUSTOMER_PURCHASES_SQL, params)
+            purchase_details = cursor.fetchall()
+        logging.info(f"Fetched all ({len(purchase_details)}) purchase detail items for customer ID {customer_id}.")
     except sqlite3.Error as e:
-        logging.exception(f"Error fetching all purchase details for customer '{customer_name}'")
+        logging.exception(f"Error fetching all purchase details for customer ID {customer_id}")
         # Avoid showing messagebox here, let the calling GUI handle UI feedback
-    finally:
-        if conn:
-            conn.close()
     return purchase_details
 
+def fetch_customer_purchase_page(customer_id, after_key=None, limit=CUSTOMER_HISTORY_PAGE_SIZE):
+    """
+    Fetches one page of a customer's purchased line items, newest first.
+
+    Args:
+        customer_id: The CustomerID of the customer.
+        after_key: None for the first page, else (SaleTimestamp, SaleItemID) of the last row shown.
+        limit: Maximum number of rows to return.
+
+    Returns:
+        A list of tuples: [(SaleTimestamp, ProductName, Quantity, PriceAtSaleCents, SubtotalCents,
+        SaleItemID), ...]. Fewer than limit rows means there are no older purchases.
+        Returns an empty list on error.
+    """
+    rows = []
+    try:
+        if after_key is None:
+            query, params = _customer_purchases_page_sql(), [customer_id, limit]
+        else:
+            last_timestamp, last_item_id = after_key
+            query = _customer_purchases_page_sql(after_key=True)
+            params = [customer_id, last_timestamp, last_timestamp, last_item_id, limit]
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        logging.debug(f"Fetched {len(rows)} purchase history rows for customer ID {customer_id} after {after_key}.")
+    except sqlite3.Error as e:
+        logging.exception(f"Error fetching purchase history page for customer ID {customer_id}.")
+    return rows
+
+def fetch_customer_purchase_summary(customer_id):
+    """
+    Fetches a customer's lifetime purchase summary in one query.
+
+    Returns:
+        A tuple: (total_spent_cents, visit_count, last_visit_timestamp, favourite_product_name).
+        The last two are None for a customer without purchases. (0, 0, None, None) on error.
+    """
+    summary = (0, 0, None, None)
+    try:
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_CUSTOMER_PURCHASE_SUMMARY_SQL, (customer_id, customer_id))
+            summary = cursor.fetchone()
+    except sqlite3.Error as e:
+        logging.exception(f"Error fetching purchase summary for customer ID {customer_id}.")
+    return summary
+
 def fetch_latest_customer_name():
     """Fetches the CustomerName from the most recent sale record (excluding 'N/A')."""
-    conn = None
     customer_name = None
     try:
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        # Order by SaleID DESC assuming higher ID means newer sale
-        cursor.execute("""
-            SELECT CustomerName
-            FROM Sales
-            WHERE CustomerName IS NOT NULL AND CustomerName != 'N/A'
-            ORDER BY SaleID DESC
-            LIMIT 1
-        """)
-        result = cursor.fetchone()
+        with _connections.reader() as conn:
+            cursor = conn.cursor()
+            # Order by SaleID DESC assuming higher ID means newer sale
+            cursor.execute("""
+                SELECT CustomerName
+                FROM Sales
+                WHERE CustomerName IS NOT NULL AND CustomerName != 'N/A'
+                ORDER BY SaleID DESC
+                LIMIT 1
+            """)
+            result = cursor.fetchone()
         if result:
             customer_name = result[0]
             logging.debug(f"Fetched latest used customer name: '{customer_name}'")
@@ -772,9 +2295,6 @@ def fetch_latest_customer_name():
             logging.debug("No previous customer sales found (excluding N/A).")
     except sqlite3.Error as e:
         logging.exception("Error fetching latest customer name.")
-    finally:
-        if conn:
-            conn.close()
     return customer_name
 
 # --- NEW FUNCTION for "View Today's Items" ---
@@ -784,10 +2304,9 @@ def fetch_sales_items_for_date(date_str):
     Args:
         date_str: The date for which to fetch items, in 'YYYY-MM-DD' format.
     Returns:
-        A list of tuples: [(ProductName, TotalQuantity, TotalRevenue), ...],
+        A list of tuples: [(ProductName, TotalQuantity, TotalRevenueCents), ...],
         or an empty list if no items or an error occurs.
     """
-    conn = None
     items_summary = []
     try:
         # Convert 'YYYY-MM-DD' to datetime objects for start and end of the day
@@ -798,22 +2317,8 @@ def fetch_sales_items_for_date(date_str):
         start_dt_iso = start_dt.isoformat()
         end_dt_iso = end_dt.isoformat() # Exclusive end
 
-        conn = sqlite3.connect(DATABASE_FILENAME)
-        cursor = conn.cursor()
-        query = """
-            SELECT
-                si.ProductName,
-                SUM(si.Quantity) as TotalQuantity,
-                SUM(si.Subtotal) as TotalRevenue
-            FROM SaleItems si
-            JOIN Sales s ON si.SaleID = s.SaleID
-            WHERE s.SaleTimestamp >= ? AND s.SaleTimestamp < ?
-            GROUP BY si.ProductName
-            ORDER BY si.ProductName COLLATE NOCASE
-        """
-        params = [start_dt_iso, end_dt_iso]
-        cursor.execute(query, params)
-        items_summary = cursor.fetchall()
+        # A whole day, so this is answered from DailyProductSales
+        items_summary = _fetch_product_summary(start_dt_iso, end_dt_iso)
         logging.info(f"Fetched {len(items_summary)} distinct item summaries for date {date_str}.")
 
     except ValueError:
@@ -823,7 +2328,99 @@ def fetch_sales_items_for_date(date_str):
         # Optionally, show a messagebox if this function is directly tied to a UI action that expects immediate user feedback for DB errors.
         # However, for backend functions, usually logging and returning an empty list/None is preferred.
         # messagebox.showerror("Database Error", f"Could not fetch item summary for {date_str}.\nError: {e}")
-    finally:
-        if conn:
-            conn.close()
     return items_summary
+
+
+# --- Streaming Exports ---
+EXPORT_BATCH_SIZE = 1000 # Rows per fetchmany() while streaming an export to a file
+
+# kind -> header row. Money columns are written as plain decimal amounts (no currency symbol).
+EXPORT_HEADERS = {
+    "sales": ("Sales #", "Receipt No.", "Timestamp", "Customer", "Total"),
+    "line_items": ("Sales #", "Timestamp", "Customer", "Product", "Quantity", "Price", "Subtotal"),
+    "product_summary": ("Product", "Total Qty Sold", "Total Revenue"),
+}
+
+_EXPORT_LINE_ITEMS_SQL = """
+    SELECT s.SaleID, s.SaleTimestamp, s.CustomerName, COALESCE(p.ProductName, si.ProductName),
+           si.Quantity, si.PriceAtSaleCents, si.SubtotalCents
+    FROM Sales s
+    JOIN SaleItems si ON si.SaleID = s.SaleID
+    LEFT JOIN Products p ON p.ProductID = si.ProductID
+    WHERE 1 = 1{filter_sql}
+    ORDER BY s.SaleTimestamp DESC, s.SaleID DESC, si.SaleItemID
+"""
+
+def _cents_text(cents):
+    """Formats integer cents as a plain decimal amount for export files ('1250' -> '12.50')."""
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+def _export_query(kind, filters):
+    """Returns (sql, params, row_formatter) for an export kind. Raises ValueError for bad arguments."""
+    if kind == "sales":
+        filter_sql, filter_params = _sales_filter_sql(filters)
+        def format_row(row):
+            sale_id, timestamp, total_cents, customer_name, receipt_no = row
+            return sale_id, receipt_no, timestamp, customer_name, _cents_text(total_cents)
+        # The history page query without a LIMIT (-1), so receipt numbers match the list
+        return _sales_page_sql(filter_sql=filter_sql), filter_params * 2 + [-1], format_row
+    if kind == "line_items":
+        filter_sql, filter_params = _sales_filter_sql(filters, column_prefix="s.")
+        def format_row(row):
+            return row[:5] + (_cents_text(row[5]), _cents_text(row[6]))
+        return _EXPORT_LINE_ITEMS_SQL.format(filter_sql=filter_sql), filter_params, format_row
+    if kind == "product_summary":
+        filters = filters or {}
+        if set(filters) != {"start_dt", "end_dt_exclusive"}:
+            raise ValueError("A product summary export needs exactly the 'start_dt' and 'end_dt_exclusive' filters.")
+        query, params = _product_summary_query(filters["start_dt"], filters["end_dt_exclusive"])
+        def format_row(row):
+            product_name, total_quantity, total_revenue_cents = row
+            return product_name, total_quantity, _cents_text(total_revenue_cents)
+        return query, params, format_row
+    raise ValueError(f"Unknown export kind '{kind}'; expected one of {tuple(EXPORT_HEADERS)}")
+
+def export_rows_to_file(kind, file_path, filters=None, delimiter=",", progress_callback=None,
+                        batch_size=EXPORT_BATCH_SIZE):
+    """
+    Streams a report straight from a database cursor into a CSV/TSV file, fetchmany() batch by
+    batch, so exporting years of sales never holds more than one batch in memory. Meant to run
+    on a worker thread (see db_executor.QueryExecutor).
+
+    Args:
+        kind: "sales" (newest first, numbered like the history list), "line_items" (one row per
+              item sold) or "product_summary" (totals per product).
+        file_path: Destination file; overwritten.
+        filters: A sales search filter dict (see SALES_FILTER_KEYS). "product_summary" needs
+                 exactly start_dt and end_dt_exclusive.
+        delimiter: "," for CSV, "\t" for TSV.
+        progress_callback: Optional callable, given the number of rows written after each batch.
+
+    Returns:
+        The number of data rows written.
+    Raises:
+        ValueError for an unknown kind or filter; sqlite3.Error or OSError if the export fails
+        (the partial file is left in place).
+    """
+    query, params, format_row = _export_query(kind, filters)
+    rows_written = 0
+    try:
+        with open(file_path, 'w', newline='', encoding='utf-8') as export_file, _connections.reader() as conn:
+            writer = csv.writer(export_file, delimiter=delimiter)
+            writer.writerow(EXPORT_HEADERS[kind])
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                writer.writerows(format_row(row) for row in batch)
+                rows_written += len(batch)
+                if progress_callback is not None:
+                    progress_callback(rows_written)
+        logging.info(f"Exported {rows_written} {kind} rows to {file_path} (Filters: {filters}).")
+    except (sqlite3.Error, OSError):
+        logging.exception(f"Error exporting {kind} to {file_path} after {rows_written} rows.")
+        raise
+    return rows_written
@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import ttk
 import logging
-from dateutil.relativedelta import relativedelta, MO, SU
+from dateutil.relativedelta import relativedelta, MO
 import datetime
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
@@ -98,26 +98,17 @@ class SalesHistoryCharts(tk.Toplevel):
         """Updates the weekly sales bar chart with data from the database."""
         logging.debug("Updating weekly sales chart.")
         today = datetime.date.today()
-        weekly_sales = {}
-        # Fetch for the last 5 weeks including the current week
-        for i in range(5):
-            # MO(-i) means: current Monday if i=0, last Monday if i=1, etc.
-            start_of_week = today + relativedelta(weekday=MO(-i))
-            end_of_week = start_of_week + relativedelta(days=6)  # Sunday of that week
-
-            start_week_str = datetime.datetime.combine(start_of_week, datetime.time.min).isoformat()
-            # Exclusive end: start of the day AFTER end_of_week
-            end_week_exclusive_str = (
-                datetime.datetime.combine(end_of_week + datetime.timedelta(days=1), datetime.time.min)).isoformat()
-
-            weekly_revenue, _, _ = self.db_operations.fetch_sales_stats(
-                start_week_str, end_week_exclusive_str)
-            weekly_sales[start_of_week.strftime(DATE_FORMAT_DISPLAY)] = weekly_revenue
-
-        # Sort by date (keys) to ensure correct order on chart
-        sorted_weekly_sales = dict(sorted(weekly_sales.items()))
-        dates = list(sorted_weekly_sales.keys())
-        sales_values = list(sorted_weekly_sales.values())
+        # Last 5 weeks including the current week, oldest first (MO(-1) is this week's Monday)
+        current_week_start = today + relativedelta(weekday=MO(-1))
+        week_starts = [current_week_start - datetime.timedelta(weeks=i) for i in range(4, -1, -1)]
+        end_exclusive = current_week_start + datetime.timedelta(days=7)
+
+        # One grouped query for all weeks; weeks without sales are missing from the result
+        buckets = self.db_operations.fetch_sales_buckets(week_starts[0], end_exclusive, "week")
+        revenue_by_week = {bucket_start: revenue for bucket_start, revenue, _, _ in buckets}
+        dates = [week_start.strftime(DATE_FORMAT_DISPLAY) for week_start in week_starts]
+        # Revenue is stored in cents; the axis is plotted in pesos
+        sales_values = [revenue_by_week.get(week_start.isoformat(), 0) / 100 for week_start in week_starts]
 
         self.weekly_ax.clear()  # Clear previous plot
         self.weekly_ax.bar(dates, sales_values)
@@ -134,28 +125,17 @@ class SalesHistoryCharts(tk.Toplevel):
         """Updates the monthly sales bar chart with data from the database."""
         logging.debug("Updating monthly sales chart.")
         today = datetime.date.today()
-        monthly_sales = {}
-        # Fetch for the last 6 months including the current month
-        for i in range(6):
-            # First day of the month, i months ago
-            first_day_of_month = (today + relativedelta(months=-i)).replace(day=1)
-            # Last day of that month
-            next_month = (today + relativedelta(months=-i + 1)).replace(day=1)
-            last_day_of_month = next_month - datetime.timedelta(days=1)
-
-            start_month_str = datetime.datetime.combine(first_day_of_month, datetime.time.min).isoformat()
-            # Exclusive end: start of the day AFTER last_day_of_month
-            end_month_exclusive_str = (datetime.datetime.combine(last_day_of_month + datetime.timedelta(days=1),
-                                                                 datetime.time.min)).isoformat()
-
-            monthly_revenue, _, _ = self.db_operations.fetch_sales_stats(
-                start_month_str, end_month_exclusive_str)
-            monthly_sales[first_day_of_month.strftime("%Y-%m")] = monthly_revenue
-
-        # Sort by month (keys)
-        sorted_monthly_sales = dict(sorted(monthly_sales.items()))
-        months = list(sorted_monthly_sales.keys())
-        sales_values = list(sorted_monthly_sales.values())
+        # Last 6 months including the current month, oldest first
+        current_month_start = today.replace(day=1)
+        month_starts = [current_month_start + relativedelta(months=-i) for i in range(5, -1, -1)]
+        end_exclusive = current_month_start + relativedelta(months=1)
+
+        # One grouped query for all months; months without sales are missing from the result
+        buckets = self.db_operations.fetch_sales_buckets(month_starts[0], end_exclusive, "month")
+        revenue_by_month = {bucket_start: revenue for bucket_start, revenue, _, _ in buckets}
+        months = [month_start.strftime("%Y-%m") for month_start in month_starts]
+        # Revenue is stored in cents; the axis is plotted in pesos
+        sales_values = [revenue_by_month.get(month_start.isoformat(), 0) / 100 for month_start in month_starts]
 
         self.monthly_ax.clear()  # Clear previous plot
         self.monthly_ax.bar(months, sales_values)
@@ -6,9 +6,14 @@ import csv
 import datetime
 import logging
 
+import customer_directory
 import db_operations
 import gui_utils
 
+# --- Purchase History Settings ---
+HISTORY_SELECT_DEBOUNCE_MS = 150  # Arrowing through customers only loads the one the selection stops on
+HISTORY_LOAD_MORE_THRESHOLD = 0.9  # Fetch the next page once the history is scrolled past this fraction
+
 
 class CustomerListWindow(tk.Toplevel):
     def __init__(self, parent):
@@ -40,6 +45,11 @@ class CustomerListWindow(tk.Toplevel):
         self._setup_customer_list_tree()  # Keyboard bindings will be added here
         self._setup_purchase_history_tree()
 
+        # Listed from the shared in-memory directory, which follows every customer change
+        self.directory = customer_directory.directory
+        self.populate_customer_list()
+        self.directory.add_listener(self._on_directory_change)
+
     def _setup_form_frame(self):
         form_frame = ttk.LabelFrame(self, text="Customer Form")
         form_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=10)
@@ -79,6 +89,7 @@ class CustomerListWindow(tk.Toplevel):
         self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
         self.search_entry.grid(row=0, column=1, sticky="ew")
         self.search_entry.bind("<Return>", self.filter_customer_list)
+        self.search_entry.bind("<KeyRelease>", self._on_search_key)
 
         search_button = ttk.Button(search_frame, text="Search", command=self.filter_customer_list)
         search_button.grid(row=0, column=2, padx=(5, 0))
@@ -109,6 +120,7 @@ class CustomerListWindow(tk.Toplevel):
         customer_scrollbar.grid(row=0, column=1, sticky="ns")
 
         # --- Keyboard Navigation Bindings for customer_tree ---
+        self.customer_filler = gui_utils.TreeviewFiller(self.customer_tree)
         self.customer_tree.bind("<<TreeviewSelect>>", self.on_customer_select)  # Existing selection binding
         self.customer_tree.bind("<Up>", self._handle_customer_tree_nav)
         self.customer_tree.bind("<Down>", self._handle_customer_tree_nav)
@@ -120,9 +132,14 @@ class CustomerListWindow(tk.Toplevel):
     def _setup_purchase_history_tree(self):
         history_frame = ttk.LabelFrame(self, text="Purchase History", padding="10")
         history_frame.grid(row=3, column=0, padx=10, pady=5, sticky="nsew")
-        history_frame.rowconfigure(0, weight=1)
+        history_frame.rowconfigure(1, weight=1)
         history_frame.columnconfigure(0, weight=1)
 
+        # Lifetime summary of the selected customer, computed in SQL rather than from the rows shown
+        self.purchase_summary_var = tk.StringVar()
+        ttk.Label(history_frame, textvariable=self.purchase_summary_var).grid(row=0, column=0, columnspan=2,
+                                                                            sticky="w", pady=(0, 5))
+
         self.history_columns = ('hist_timestamp', 'hist_product', 'hist_quantity', 'hist_price', 'hist_subtotal')
         # Changed selectmode to "browse" to allow keyboard navigation if desired later, though no actions are bound yet.
         self.purchase_history_tree = ttk.Treeview(history_frame, columns=self.history_columns, show="headings",
@@ -139,11 +156,20 @@ class CustomerListWindow(tk.Toplevel):
         self.purchase_history_tree.column('hist_quantity', anchor=tk.CENTER, width=40, stretch=False)
         self.purchase_history_tree.column('hist_price', anchor=tk.E, width=80, stretch=False)
         self.purchase_history_tree.column('hist_subtotal', anchor=tk.E, width=90, stretch=False)
-        self.purchase_history_tree.grid(row=0, column=0, sticky="nsew")
+        self.purchase_history_tree.grid(row=1, column=0, sticky="nsew")
+        self.purchase_history_filler = gui_utils.TreeviewFiller(self.purchase_history_tree)
 
-        history_scrollbar = ttk.Scrollbar(history_frame, orient="vertical", command=self.purchase_history_tree.yview)
-        self.purchase_history_tree.configure(yscrollcommand=history_scrollbar.set)
-        history_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.history_scrollbar = ttk.Scrollbar(history_frame, orient="vertical",
+                                               command=self.purchase_history_tree.yview)
+        self.purchase_history_tree.configure(yscrollcommand=self._on_history_scroll)
+        self.history_scrollbar.grid(row=1, column=1, sticky="ns")
+
+        # The history is read newest first, one db_operations page at a time as the user scrolls
+        self._history_customer_id = None  # Customer whose history is shown or about to load
+        self._history_after_key = None  # (SaleTimestamp, SaleItemID) of the last row loaded
+        self._history_exhausted = True
+        self._history_load_pending = False
+        self.history_debouncer = gui_utils.Debouncer(self, HISTORY_SELECT_DEBOUNCE_MS, self._load_purchase_history)
 
     def _setup_bottom_buttons(self):
         bottom_button_frame = ttk.Frame(self)
@@ -225,10 +251,25 @@ class CustomerListWindow(tk.Toplevel):
 
     # --- Existing Logic Methods (some might be slightly adjusted if needed) ---
 
+    def _on_directory_change(self):
+        """Relists the customers (same search) after any add, update or delete, from any window."""
+        self.populate_customer_list(self._listed_search_term, ranked=self._listed_ranked)
+
+    def _on_search_key(self, event=None):
+        """
+        Filters as the user types, from the in-memory directory only (no database query), and
+        leaves the form alone. Return (or the Search button) runs the ranked word search.
+        """
+        if event is not None and event.keysym in ("Return", "KP_Enter"):
+            return
+        search_term = self.search_var.get()
+        if search_term != self._listed_search_term:  # Ignore arrows, Shift...
+            self.populate_customer_list(search_term)
+
     def filter_customer_list(self, event=None):
         search_term = self.search_var.get()
         logging.debug(f"Filtering customer list with term: '{search_term}'")
-        self.populate_customer_list(search_term)
+        self.populate_customer_list(search_term, ranked=True)
         self.clear_form()
 
     def clear_form(self):
@@ -242,8 +283,7 @@ class CustomerListWindow(tk.Toplevel):
             self.customer_tree.selection_remove(selection)  # Clear visual selection
             self.customer_tree.focus("")  # Remove focus from any item
 
-        for i in self.purchase_history_tree.get_children():
-            self.purchase_history_tree.delete(i)
+        self._reset_purchase_history()
 
         # Do not set focus here if it's called after an action that moves focus elsewhere
         # self.name_entry.focus_set()
@@ -274,10 +314,10 @@ class CustomerListWindow(tk.Toplevel):
                 self.contact_var.set(values[2] if values[2] else "")
                 self.address_var.set(values[3] if values[3] else "")
 
-                logging.info(
-                    f"Fetching purchase history for customer: '{customer_name}' (ID: {self.selected_customer_id})")
-                history_data = db_operations.fetch_all_customer_purchase_details(customer_name)
-                self._populate_purchase_history(history_data)
+                if self.selected_customer_id != self._history_customer_id:
+                    self._reset_purchase_history()
+                    self._history_customer_id = self.selected_customer_id
+                    self.history_debouncer.trigger(self.selected_customer_id)
 
             except (ValueError, IndexError, TypeError) as e:  # Added TypeError
                 logging.error(f"Error processing customer selection: {e}. IID: {selected_item_iid}, Values: {values}")
@@ -293,28 +333,85 @@ class CustomerListWindow(tk.Toplevel):
             # self.clear_form()
             # self._populate_purchase_history([])
 
+    def _reset_purchase_history(self):
+        """Empties the history and its summary, dropping any page load still waiting."""
+        self.history_debouncer.cancel()
+        self.purchase_history_filler.cancel()
+        self.purchase_history_tree.delete(*self.purchase_history_tree.get_children())
+        self.purchase_summary_var.set("")
+        self._history_customer_id = None
+        self._history_after_key = None
+        self._history_exhausted = True
+
+    def _load_purchase_history(self, customer_id):
+        """Shows the lifetime summary and the newest page of purchases of the selected customer."""
+        if customer_id != self._history_customer_id:
+            return  # The selection has moved on
+        logging.info(f"Fetching purchase history for customer ID {customer_id}.")
+        total_cents, visits, last_visit, favourite_product = db_operations.fetch_customer_purchase_summary(customer_id)
+        if visits:
+            last_visit_display = self._format_history_timestamp(last_visit)
+            self.purchase_summary_var.set(
+                f"Lifetime: {gui_utils.format_money(total_cents)} over {visits} visit{'s' if visits != 1 else ''}"
+                f"  |  Last visit: {last_visit_display}  |  Favourite: {favourite_product}")
+        else:
+            self.purchase_summary_var.set("No purchases yet.")
+        self._history_after_key = None
+        self._history_exhausted = False
+        self._populate_purchase_history(self._next_history_page())
+
+    def _next_history_page(self):
+        """Returns the next (older) page of the current customer's purchases, or [] once all are loaded."""
+        if self._history_exhausted or self._history_customer_id is None:
+            return []
+        rows = db_operations.fetch_customer_purchase_page(self._history_customer_id, self._history_after_key)
+        if len(rows) < db_operations.CUSTOMER_HISTORY_PAGE_SIZE:
+            self._history_exhausted = True
+        if rows:
+            self._history_after_key = (rows[-1][0], rows[-1][5])
+        return rows
+
+    def _load_more_history(self):
+        self._history_load_pending = False
+        rows = self._next_history_page()
+        if rows:
+            logging.debug(f"Loaded {len(rows)} more purchase history rows.")
+            self.purchase_history_filler.fill(((None, self._purchase_history_values(item)) for item in rows),
+                                              focus_first=False, append=True)
+
+    def _on_history_scroll(self, first, last):
+        """yscrollcommand for the history: moves the scrollbar and loads the next page near the bottom."""
+        self.history_scrollbar.set(first, last)
+        if (float(last) >= HISTORY_LOAD_MORE_THRESHOLD and not self._history_exhausted
+                and not self._history_load_pending):
+            self._history_load_pending = True
+            self.after_idle(self._load_more_history)
+
     def _populate_purchase_history(self, history_data):
         logging.debug(f"Populating purchase history tree with {len(history_data)} items.")
-        for i in self.purchase_history_tree.get_children():
-            self.purchase_history_tree.delete(i)
-
         if not history_data:
-            self.purchase_history_tree.insert("", tk.END, values=("No purchase history found", "", "", "", ""))
+            self.purchase_history_filler.fill([(None, ("No purchase history found", "", "", "", ""))],
+                                              focus_first=False)
             return
+        self.purchase_history_filler.fill(((None, self._purchase_history_values(item)) for item in history_data),
+                                          focus_first=False)
 
-        for item in history_data:
-            timestamp_str, product_name, qty, price, subtotal = item
-            try:
-                dt_obj = datetime.datetime.fromisoformat(timestamp_str)
-                display_ts = dt_obj.strftime('%Y-%m-%d %H:%M')
-            except (ValueError, TypeError):
-                display_ts = timestamp_str
+    @staticmethod
+    def _format_history_timestamp(timestamp_str):
+        try:
+            dt_obj = datetime.datetime.fromisoformat(timestamp_str)
+            return dt_obj.strftime('%Y-%m-%d %H:%M')
+        except (ValueError, TypeError):
+            return timestamp_str
+
+    @classmethod
+    def _purchase_history_values(cls, item):
+        timestamp_str, product_name, qty, price, subtotal = item[:5]
+        display_ts = cls._format_history_timestamp(timestamp_str)
 
-            price_display = f"{gui_utils.CURRENCY_SYMBOL}{price:.2f}"
-            subtotal_display = f"{gui_utils.CURRENCY_SYMBOL}{subtotal:.2f}"
-            self.purchase_history_tree.insert("", tk.END,
-                                              values=(display_ts, product_name, qty, price_display, subtotal_display))
-        logging.debug("Purchase history tree populated.")
+        price_display = gui_utils.format_money(price)
+        subtotal_display = gui_utils.format_money(subtotal)
+        return display_ts, product_name, qty, price_display, subtotal_display
 
     def save_or_update_customer(self):
         name = self.name_var.get().strip()
@@ -330,16 +427,10 @@ class CustomerListWindow(tk.Toplevel):
             self.name_entry.focus_set()
             return
 
-        all_customers_data = db_operations.fetch_all_customers()
-        name_lower = name.lower()
-        is_duplicate = False
-        for cust_id, cust_name, _, _ in all_customers_data:
-            if cust_name.lower() == name_lower:
-                if self.selected_customer_id is not None and cust_id == self.selected_customer_id:
-                    continue
-                else:
-                    is_duplicate = True
-                    break
+        existing_name = self.directory.lookup_name(name)
+        selected_customer = self.directory.get(self.selected_customer_id)
+        is_duplicate = existing_name is not None and (
+            selected_customer is None or selected_customer[1].casefold() != existing_name.casefold())
         if is_duplicate:
             logging.warning(f"Save/Update failed: Duplicate customer name '{name}'.")
             messagebox.showwarning("Duplicate Name", f"A customer named '{name}' already exists.", parent=self)
@@ -350,9 +441,9 @@ class CustomerListWindow(tk.Toplevel):
 
         if self.selected_customer_id is not None:
             logging.info(f"Attempting to update customer ID: {self.selected_customer_id} to Name: '{name}'")
+            # The directory notifies _on_directory_change, which relists the customers
             if db_operations.update_customer_in_db(self.selected_customer_id, name, contact, address):
                 messagebox.showinfo("Success", f"Customer '{name}' updated successfully.", parent=self)
-                self.populate_customer_list(current_search_term)
                 self.clear_form()
                 self.search_var.set(current_search_term)  # Restore search term
             # else: db_operations shows error message
@@ -360,7 +451,6 @@ class CustomerListWindow(tk.Toplevel):
             logging.info(f"Attempting to add new customer: '{name}'")
             if db_operations.add_customer_to_db(name, contact, address):
                 messagebox.showinfo("Success", f"Customer '{name}' added successfully.", parent=self)
-                self.populate_customer_list(current_search_term)
                 self.clear_form()
                 self.search_var.set(current_search_term)  # Restore search term
             # else: db_operations shows error message
@@ -392,63 +482,48 @@ class CustomerListWindow(tk.Toplevel):
         logging.warning(f"Attempting deletion of customer ID: {self.selected_customer_id}")
         if db_operations.delete_customer_from_db(self.selected_customer_id):
             messagebox.showinfo("Success", f"Customer '{customer_name_for_msg}' deleted.", parent=self)
-            self.populate_customer_list(current_search_term)
             self.clear_form()
             self.search_var.set(current_search_term)  # Restore search term
         # else: db_operations shows error message
         self.search_entry.focus_set()  # Return focus to search after action
 
-    def populate_customer_list(self, search_term=""):
-        logging.debug(f"Populating customer list (Search: '{search_term}').")
+    def populate_customer_list(self, search_term="", ranked=False):
+        """
+        Lists the customers containing search_term (all of them if blank), newest first, from the
+        shared directory. With ranked, the full-text search is tried first: every word may start
+        any word of the name, contact or address, in any order, and the best matches are listed first.
+        """
+        logging.debug(f"Populating customer list (Search: '{search_term}', ranked: {ranked}).")
+        self._listed_search_term = search_term
+        self._listed_ranked = ranked
 
         # Store current selection/focus to try and restore it
         current_focus_id = self.customer_tree.focus()
 
-        for i in self.customer_tree.get_children():
-            self.customer_tree.delete(i)
-
-        all_customers = db_operations.fetch_all_customers()
-        filtered_customers = []
-
-        if search_term:
-            term_lower = search_term.lower()
-            for cust_id, name, contact, address in all_customers:
-                contact_str = contact if contact else ""
-                address_str = address if address else ""
-                if (term_lower in name.lower() or
-                        term_lower in contact_str.lower() or
-                        term_lower in address_str.lower()):
-                    filtered_customers.append((cust_id, name, contact, address))
+        ranked_customers = db_operations.search_customers(search_term) if ranked and search_term.strip() else []
+        if ranked_customers:
+            filtered_customers = ranked_customers
+        elif search_term:
+            filtered_customers = self.directory.search(search_term)
         else:
-            filtered_customers = all_customers
+            filtered_customers = self.directory.customers()
 
-        seq_counter = 0
-        new_focus_candidate = None
-        for customer_data in filtered_customers:
-            seq_counter += 1
-            cust_id, name, contact, address = customer_data
+        rows = []
+        for seq_counter, (cust_id, name, contact, address) in enumerate(filtered_customers, start=1):
             display_contact = contact if contact is not None else ""
             display_address = address if address is not None else ""
-            self.customer_tree.insert("", tk.END, iid=str(cust_id), values=(seq_counter, name, display_contact,
-                                                                            display_address))  # Ensure iid is string
-            if str(cust_id) == current_focus_id:
-                new_focus_candidate = str(cust_id)
-
-        if new_focus_candidate:
-            self.customer_tree.focus(new_focus_candidate)
-            self.customer_tree.selection_set(new_focus_candidate)
-            self.customer_tree.see(new_focus_candidate)  # Ensure visible
-        elif filtered_customers:  # If no old focus, but list is not empty, select first
-            first_item_id = str(filtered_customers[0][0])
-            self.customer_tree.focus(first_item_id)
-            self.customer_tree.selection_set(first_item_id)
-            self.customer_tree.see(first_item_id)
-        else:  # List is empty
+            rows.append((str(cust_id), (seq_counter, name, display_contact, display_address)))  # Ensure iid is string
+
+        # Keeps the old focus if the customer is still listed, else selects the first one
+        self.customer_filler.fill(rows, focus_iid=current_focus_id or None,
+                                  on_done=self._customer_list_filled)
+        logging.debug(f"Customer list populating with {len(filtered_customers)} items.")
+
+    def _customer_list_filled(self, focused_item_id):
+        if focused_item_id is None and not self.customer_tree.get_children():  # List is empty
             self.clear_form()  # Clear form if list becomes empty
             self._populate_purchase_history([])
 
-        logging.debug(f"Customer list populated with {len(filtered_customers)} items.")
-
     def export_customers_to_csv(self):
         logging.info("Exporting customer list to CSV.")
         if not self.customer_tree.get_children():
@@ -476,3 +551,9 @@ class CustomerListWindow(tk.Toplevel):
         except Exception as e:
             logging.exception(f"Error exporting customer list to CSV: {file_path}")
             messagebox.showerror("Export Failed", f"Could not export customer list.\nError: {e}", parent=self)
+
+    def destroy(self):
+        """Stops following directory changes and drops pending history loads before the window goes away."""
+        self.directory.remove_listener(self._on_directory_change)
+        self.history_debouncer.cancel()
+        super().destroy()
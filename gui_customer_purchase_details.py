@@ -20,7 +20,7 @@ class CustomerPurchaseDetailWindow(tk.Toplevel):
             start_date: The start date of the period (datetime.date object).
             end_date: The end date of the period (datetime.date object).
             purchase_data: A list of tuples containing the purchase details:
-                           [(TimestampStr, ProductName, Qty, Price, Subtotal), ...]
+                           [(TimestampStr, ProductName, Qty, PriceCents, SubtotalCents), ...]
         """
         super().__init__(parent)
         self.title(f"Purchase Details: {customer_name}")
@@ -94,7 +94,7 @@ class CustomerPurchaseDetailWindow(tk.Toplevel):
             except (ValueError, TypeError):
                 display_ts = timestamp_str # Fallback
 
-            price_display = f"{gui_utils.CURRENCY_SYMBOL}{price:.2f}"
-            subtotal_display = f"{gui_utils.CURRENCY_SYMBOL}{subtotal:.2f}"
+            price_display = gui_utils.format_money(price)
+            subtotal_display = gui_utils.format_money(subtotal)
 
             self.purchase_tree.insert("", tk.END, values=(display_ts, product_name, qty, price_display, subtotal_display))
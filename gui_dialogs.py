@@ -3,6 +3,7 @@ from tkinter import ttk
 from tkinter import messagebox
 import logging  # <--- IMPORT ADDED HERE
 
+import customer_directory
 import db_operations
 import gui_utils
 
@@ -66,8 +67,14 @@ class PriceInputDialog(tk.Toplevel):
             return False
 
     def on_ok(self):
-        """Handles the OK button click."""
-        self.result = self.price_var.get()
+        """Handles the OK button click. The result is the price in integer cents."""
+        try:
+            price_cents = gui_utils.parse_money(self.price_var.get())
+            if price_cents < 0: raise ValueError("Price cannot be negative.")
+        except ValueError:
+            messagebox.showerror("Invalid Price", "Please enter a valid positive number for the price.", parent=self)
+            return
+        self.result = price_cents
         self.destroy()
 
     def on_cancel(self):
@@ -103,9 +110,8 @@ class CustomerSelectionDialog(tk.Toplevel):
 
         ttk.Label(self, text="Enter or select customer name:").grid(row=0, column=0, pady=(10, 2), padx=10, sticky='w')
 
-        self.all_customer_names = db_operations.fetch_distinct_customer_names()
-        if 'N/A' in self.all_customer_names:
-            self.all_customer_names.remove('N/A')
+        # Names come from the shared in-memory directory, most active customers first
+        self.directory = customer_directory.directory
 
         self.customer_var = tk.StringVar()
         self.customer_entry = ttk.Entry(self, textvariable=self.customer_var, width=40)
@@ -151,7 +157,6 @@ class CustomerSelectionDialog(tk.Toplevel):
 
     def update_suggestions(self, event=None):
         current_text = self.customer_var.get()
-        typed_lower = current_text.lower()
 
         if event and event.keysym and len(event.keysym) > 1 and event.keysym not in ('BackSpace', 'Delete', 'Shift_L',
                                                                                      'Shift_R', 'Control_L',
@@ -165,10 +170,10 @@ class CustomerSelectionDialog(tk.Toplevel):
             self.list_frame.grid_remove()
             return
 
-        suggestions = [name for name in self.all_customer_names if name.lower().startswith(typed_lower)]
+        suggestions = self.directory.complete(current_text)
 
         if suggestions:
-            for name in suggestions[:10]:
+            for name in suggestions:
                 self.suggestion_listbox.insert(tk.END, name)
             self.list_frame.grid()
         else:
@@ -188,15 +193,9 @@ class CustomerSelectionDialog(tk.Toplevel):
         if not selected_name:
             self.result = "N/A"
         else:
-            self.result = selected_name
-            is_new = True
-            current_db_names = db_operations.fetch_distinct_customer_names()
-            for existing_name in current_db_names:
-                if selected_name.lower() == existing_name.lower():
-                    is_new = False
-                    self.result = existing_name
-                    break
-            if is_new and selected_name != 'N/A':
+            existing_name = self.directory.lookup_name(selected_name)
+            self.result = existing_name or selected_name
+            if existing_name is None and selected_name != 'N/A':
                 # These lines were causing the flake8 error
                 logging.info(f"Adding new customer from dialog: {selected_name}")
                 if not db_operations.add_customer_to_db(selected_name, None, None):
@@ -299,7 +298,7 @@ class CustomPriceDialog(tk.Toplevel):
             return
 
         try:
-            custom_price = float(price_str)
+            custom_price = gui_utils.parse_money(price_str)  # Integer cents
             if custom_price < 0: raise ValueError("Price cannot be negative.")
         except ValueError:
             messagebox.showerror("Invalid Price", "Please enter a valid positive number for the price.", parent=self)
@@ -2,10 +2,10 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
 from tkinter import filedialog
+import bisect
 import datetime
 import os
 import sqlite3
-import csv
 import logging
 
 # --- External Libraries ---
@@ -17,7 +17,9 @@ except ImportError:
     DateEntry = None
 
 # --- Import Project Modules ---
+import customer_directory
 import db_operations
+import db_executor
 import gui_utils
 
 try:
@@ -26,6 +28,69 @@ except ImportError:
     SalesHistoryCharts = None
     logging.warning("gui_charts.py not found. Sales Graph feature will be disabled.")
 
+# --- Sales List Paging ---
+LOAD_MORE_THRESHOLD = 0.9  # Fetch the next page once the sales list is scrolled past this fraction
+HEADING_SCAN_LIMIT_PX = 80  # How far below the top of the sales list to look for its first row (past the headings)
+HEADING_SCAN_STEP_PX = 4
+
+# --- Receipt Cache ---
+RECEIPT_CACHE_SIZE = 200  # Rendered receipts kept per history window (LRU)
+RECEIPT_PREFETCH_COUNT = 5  # Receipts rendered ahead of the selection, in the direction the user is moving
+
+LOADING_TEXT = "Loading..."
+
+# --- Summary Refresh ---
+SUMMARY_DEBOUNCE_MS = 250  # A custom range summary runs once date picks / clicks pause this long
+
+
+def _day_start_iso(day):
+    """ISO timestamp of midnight at the start of a date, as used by the range queries."""
+    return datetime.datetime.combine(day, datetime.time.min).isoformat()
+
+
+class SalesPageSource:
+    """
+    Serves the sales history newest first, one keyset page at a time, so the window never
+    reads (or holds in the Treeview) more sales than the user has scrolled to.
+    Rows are db_operations.fetch_sales_page() tuples: (SaleID, SaleTimestamp, TotalCents, CustomerName, ReceiptNo).
+    filters is an optional db_operations search filter dict (see db_operations.SALES_FILTER_KEYS).
+    """
+
+    def __init__(self, page_size=db_operations.SALES_PAGE_SIZE, filters=None):
+        self.page_size = page_size
+        self.filters = filters or {}
+        self.reset()
+
+    def reset(self):
+        """Starts over from the newest sale."""
+        self._after_key = None
+        self.exhausted = False
+
+    def next_page_args(self):
+        """
+        Arguments of the db_operations.fetch_sales_page() call that reads the next (older) page,
+        so the read can run on a worker thread; pass its rows to accept_page(). None once every
+        sale has been returned.
+        """
+        if self.exhausted:
+            return None
+        return self._after_key, self.page_size, self.filters
+
+    def accept_page(self, rows):
+        """Moves the cursor past a page read with next_page_args() and returns its rows."""
+        if len(rows) < self.page_size:
+            self.exhausted = True
+        if rows:
+            last_sale_id, last_timestamp, _, _, last_receipt_no = rows[-1]
+            self._after_key = (last_timestamp, last_sale_id, last_receipt_no)
+        return rows
+
+    def shift_cursor_receipt(self, delta):
+        """Adjusts the receipt number carried by the keyset cursor after a sale older than it was added/removed."""
+        if self._after_key is not None:
+            last_timestamp, last_sale_id, last_receipt_no = self._after_key
+            self._after_key = (last_timestamp, last_sale_id, last_receipt_no + delta)
+
 
 # --- Sales History Window Class ---
 class SalesHistoryWindow(tk.Toplevel):
@@ -36,10 +101,31 @@ class SalesHistoryWindow(tk.Toplevel):
         gui_utils.set_window_icon(self)
 
         self.chart_window = None
+        self.sales_source = SalesPageSource()
+        self._refresh_wanted = False  # refresh_sales_list() was called while a page was loading
+        self._sales_keys = {}  # Loaded sales list iid -> (SaleTimestamp, SaleID), the list's sort key
+        self._sales_order = []  # The loaded sales' sort keys, oldest first (the list shows them reversed)
+        # Receipt number of the newest loaded sale; the row n places below it shows this minus n.
+        # A sale added or deleted below the top changes the numbers of the rows above it, which
+        # are then rewritten only as they are shown (see _renumber_visible_rows)
+        self._newest_receipt_no = 0
+        self._receipt_numbers_stale = False
+        self._max_sale_id = 0  # Watermark: every sale up to this SaleID is either loaded or on a later page
+        # SaleID -> rendered receipt text; receipts show current product and customer names, so it is
+        # cleared on every customer change and whenever the window is refreshed after other changes
+        self.receipt_cache = gui_utils.LRUCache(RECEIPT_CACHE_SIZE)
+        customer_directory.directory.add_listener(self.receipt_cache.clear)
+        self._nav_direction = 1  # 1 = moving down the list (older sales), -1 = up
+        # Sales list, receipt and summary queries run off the Tk thread; keys name what each one fills
+        self.query_executor = db_executor.QueryExecutor(self)
         self.todays_items_window = None
         self.todays_items_tree = None
         self.todays_receipt_count = 0
         self.custom_range_receipt_count = 0  # NEW: Instance variable for custom range receipt count
+        # (date range, report generation) of the custom summary on screen, so repeats reuse it;
+        # the generation is None while the range is still loading
+        self._custom_summary_key = None
+        self.custom_summary_debouncer = gui_utils.Debouncer(self, SUMMARY_DEBOUNCE_MS, self.update_custom_summary)
 
         win_width = 850
         win_height = 680
@@ -69,8 +155,42 @@ class SalesHistoryWindow(tk.Toplevel):
 
         list_frame = ttk.Frame(self)
         list_frame.grid(row=1, column=0, sticky="nsew", padx=(10, 5), pady=5)
-        list_frame.rowconfigure(0, weight=1)
+        list_frame.rowconfigure(1, weight=1)
         list_frame.columnconfigure(0, weight=1)
+
+        # --- Search Bar ---
+        # Every field is optional; the search runs in SQL and fills the same paged list
+        search_frame = ttk.Frame(list_frame)
+        search_frame.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        self.search_text_var = tk.StringVar()
+        self.search_customer_var = tk.StringVar()
+        self.search_from_var = tk.StringVar()
+        self.search_to_var = tk.StringVar()
+        self.search_min_var = tk.StringVar()
+        self.search_max_var = tk.StringVar()
+        self.search_sale_id_var = tk.StringVar()
+        search_fields = (
+            ("Find:", self.search_text_var, 14, "Words starting a customer name or a product name on the receipt."),
+            ("Customer:", self.search_customer_var, 12, "Customer name starts with (any case)."),
+            ("From:", self.search_from_var, 10, "First sale date (YYYY-MM-DD)."),
+            ("To:", self.search_to_var, 10, "Last sale date (YYYY-MM-DD), inclusive."),
+            ("Min:", self.search_min_var, 7, "Smallest sale total."),
+            ("Max:", self.search_max_var, 7, "Largest sale total."),
+            ("Sale #:", self.search_sale_id_var, 6, "A single Sales # (SaleID)."),
+        )
+        for column, (label_text, variable, width, tooltip_text) in enumerate(search_fields):
+            ttk.Label(search_frame, text=label_text).grid(row=0, column=column * 2, padx=(0 if column == 0 else 5, 2))
+            entry = ttk.Entry(search_frame, textvariable=variable, width=width)
+            entry.grid(row=0, column=column * 2 + 1)
+            entry.bind("<Return>", lambda event: self.search_sales())
+            gui_utils.Tooltip(entry, tooltip_text)
+        search_button = ttk.Button(search_frame, text="Search", command=self.search_sales, width=7)
+        search_button.grid(row=0, column=len(search_fields) * 2, padx=(8, 2))
+        clear_search_button = ttk.Button(search_frame, text="Clear", command=self.clear_sales_search, width=6)
+        clear_search_button.grid(row=0, column=len(search_fields) * 2 + 1)
+        gui_utils.Tooltip(search_button, "Show only the sales matching the filled-in fields.")
+        gui_utils.Tooltip(clear_search_button, "Clear the search and show all sales.")
+
         self.sales_columns_display = ("sale_num", "receipt_no", "timestamp", "customer", "total")
         self.sales_tree = ttk.Treeview(list_frame, columns=self.sales_columns_display, show="headings",
                                        selectmode="browse")
@@ -84,11 +204,12 @@ class SalesHistoryWindow(tk.Toplevel):
         self.sales_tree.column("timestamp", anchor=tk.W, width=160, stretch=False)
         self.sales_tree.column("customer", anchor=tk.W, width=100, stretch=True)
         self.sales_tree.column("total", anchor=tk.E, width=70, stretch=False)
-        self.sales_tree.grid(row=0, column=0, sticky="nsew")
-        sales_list_scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.sales_tree.yview)
-        self.sales_tree.configure(yscrollcommand=sales_list_scrollbar.set)
-        sales_list_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.sales_tree.grid(row=1, column=0, sticky="nsew")
+        self.sales_list_scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.sales_tree.yview)
+        self.sales_tree.configure(yscrollcommand=self._on_sales_tree_scroll)
+        self.sales_list_scrollbar.grid(row=1, column=1, sticky="ns")
 
+        self.sales_filler = gui_utils.TreeviewFiller(self.sales_tree)
         self.sales_tree.bind("<<TreeviewSelect>>", self.on_sale_select)
         self.sales_tree.bind("<Up>", self._handle_sales_tree_nav)
         self.sales_tree.bind("<Down>", self._handle_sales_tree_nav)
@@ -109,7 +230,7 @@ class SalesHistoryWindow(tk.Toplevel):
         today_frame.grid(row=2, column=0, columnspan=2, sticky="ew", padx=10, pady=(10, 5))
         today_frame.columnconfigure(0, weight=0)
         today_frame.columnconfigure(1, weight=1)
-        self.today_total_label = ttk.Label(today_frame, text=f"Total: {gui_utils.CURRENCY_SYMBOL}0.00",
+        self.today_total_label = ttk.Label(today_frame, text=f"Total: {gui_utils.format_money(0)}",
                                            font=("Arial", 10, "bold"))
         self.today_total_label.grid(row=0, column=0, sticky="w", padx=5, pady=2)
         self.view_todays_items_button = ttk.Button(today_frame, text="View Today's Item Sales",
@@ -122,9 +243,14 @@ class SalesHistoryWindow(tk.Toplevel):
         summary_frame.columnconfigure(1, weight=1)
         self.week_label_var = tk.StringVar(value="This Week (Mon-Sun):")
         ttk.Label(summary_frame, textvariable=self.week_label_var).grid(row=0, column=0, sticky="w", padx=5, pady=1)
-        self.week_total_label = ttk.Label(summary_frame, text=f"Total: {gui_utils.CURRENCY_SYMBOL}0.00",
+        self.week_total_label = ttk.Label(summary_frame, text=f"Total: {gui_utils.format_money(0)}",
                                           font=("Arial", 10))
         self.week_total_label.grid(row=0, column=1, sticky="e", padx=5, pady=1)
+        self.month_label_var = tk.StringVar(value="This Month:")
+        ttk.Label(summary_frame, textvariable=self.month_label_var).grid(row=1, column=0, sticky="w", padx=5, pady=1)
+        self.month_total_label = ttk.Label(summary_frame, text=f"Total: {gui_utils.format_money(0)}",
+                                           font=("Arial", 10))
+        self.month_total_label.grid(row=1, column=1, sticky="e", padx=5, pady=1)
 
         custom_entry_frame = ttk.LabelFrame(self, text="Custom Date Range", padding="10")
         custom_entry_frame.grid(row=4, column=0, columnspan=2, sticky="ew", padx=10, pady=(5, 0))
@@ -142,6 +268,9 @@ class SalesHistoryWindow(tk.Toplevel):
                                             borderwidth=2, date_pattern='yyyy-mm-dd')
             self.end_date_entry.grid(row=0, column=3, padx=(0, 10), pady=5)
             self.end_date_entry.set_date(datetime.date.today())
+            for date_entry in (self.start_date_entry, self.end_date_entry):
+                date_entry.bind("<<DateEntrySelected>>",
+                                lambda event: self.custom_summary_debouncer.trigger(quiet=True))
         else:
             ttk.Label(custom_entry_frame, text="Start (YYYY-MM-DD):").grid(row=0, column=0, padx=(0, 5), pady=5,
                                                                            sticky='w')
@@ -153,10 +282,12 @@ class SalesHistoryWindow(tk.Toplevel):
             self.end_date_str_var = tk.StringVar(value=datetime.date.today().strftime('%Y-%m-%d'))
             self.end_date_entry = ttk.Entry(custom_entry_frame, textvariable=self.end_date_str_var, width=12)
             self.end_date_entry.grid(row=0, column=3, padx=(0, 10), pady=5)
+            for date_entry in (self.start_date_entry, self.end_date_entry):
+                date_entry.bind("<Return>", lambda event: self.custom_summary_debouncer.trigger())
             logging.warning("tkcalendar not found. Using basic Entry widgets for date input.")
 
         view_range_button = ttk.Button(custom_entry_frame, text="View Detailed Summary",
-                                       command=self.update_custom_summary)
+                                       command=self.custom_summary_debouncer.trigger)
         view_range_button.grid(row=0, column=4, padx=(10, 5), pady=5, sticky='e')
 
         # Custom Date Range Details Treeview (Row 5)
@@ -181,6 +312,7 @@ class SalesHistoryWindow(tk.Toplevel):
         self.custom_summary_tree.configure(yscrollcommand=summary_scrollbar.set)
         summary_scrollbar.grid(row=0, column=1, sticky='ns')
 
+        self.custom_summary_filler = gui_utils.TreeviewFiller(self.custom_summary_tree)
         self.custom_summary_tree.bind("<Double-Button-1>", self.on_summary_item_select)
         self.custom_summary_tree.bind("<Up>", self._handle_summary_tree_nav)
         self.custom_summary_tree.bind("<Down>", self._handle_summary_tree_nav)
@@ -196,13 +328,20 @@ class SalesHistoryWindow(tk.Toplevel):
         self.custom_range_items_label.grid(row=0, column=0, sticky="w", padx=5, pady=(0, 2))
 
         self.custom_range_grand_total_label = ttk.Label(custom_total_frame,
-                                                        text=f"Total: {gui_utils.CURRENCY_SYMBOL}0.00",
+                                                        text=f"Total: {gui_utils.format_money(0)}",
                                                         font=("Arial", 10, "bold"))
         self.custom_range_grand_total_label.grid(row=0, column=1, sticky="e", padx=(10, 0))
 
-        export_summary_button = ttk.Button(custom_total_frame, text="Export Summary",
+        custom_export_frame = ttk.Frame(custom_total_frame)
+        custom_export_frame.grid(row=1, column=1, sticky="e", padx=(10, 0), pady=(2, 0))
+        export_items_button = ttk.Button(custom_export_frame, text="Export Line Items",
+                                         command=self.export_line_items_to_csv)
+        export_items_button.pack(side=tk.LEFT, padx=(0, 5))
+        export_summary_button = ttk.Button(custom_export_frame, text="Export Summary",
                                            command=self.export_summary_to_csv)
-        export_summary_button.grid(row=1, column=1, sticky="e", padx=(10, 0), pady=(2, 0))
+        export_summary_button.pack(side=tk.LEFT)
+        gui_utils.Tooltip(export_items_button, "Export every item sold in the date range to a CSV/TSV file.")
+        gui_utils.Tooltip(export_summary_button, "Export the product summary for the date range to a CSV/TSV file.")
 
         action_button_frame = ttk.Frame(self)
         action_button_frame.grid(row=7, column=0, columnspan=2, pady=10)
@@ -215,11 +354,11 @@ class SalesHistoryWindow(tk.Toplevel):
         delete_button.pack(side=tk.LEFT, padx=10)
         close_button = ttk.Button(action_button_frame, text="Close", command=self.destroy)
         close_button.pack(side=tk.LEFT, padx=10)
+        self.export_status_var = tk.StringVar()  # Progress of a running export
+        ttk.Label(action_button_frame, textvariable=self.export_status_var).pack(side=tk.LEFT, padx=10)
 
         self.populate_sales_list()
-        self.update_default_summaries()
-        self.update_todays_summary()
-        self.update_custom_summary()
+        self.update_dashboard()
 
         self.bind('<Escape>', lambda event=None: self.destroy())
 
@@ -233,12 +372,16 @@ class SalesHistoryWindow(tk.Toplevel):
                 tree.selection_set(children[0])
         else:
             if event.keysym == "Up":
+                self._nav_direction = -1
                 prev_item = tree.prev(focused_item)
                 if prev_item:
                     tree.focus(prev_item)
                     tree.selection_set(prev_item)
             elif event.keysym == "Down":
+                self._nav_direction = 1
                 next_item = tree.next(focused_item)
+                if not next_item:
+                    self._load_more_sales()  # Down again moves on once it is in
                 if next_item:
                     tree.focus(next_item)
                     tree.selection_set(next_item)
@@ -287,70 +430,321 @@ class SalesHistoryWindow(tk.Toplevel):
         return "break"
 
     def populate_sales_list(self):
+        """
+        Reloads the sales list from the newest sale in the background, showing a loading row
+        meanwhile; older pages load as the user scrolls.
+        """
         current_focus_id = self.sales_tree.focus()
-        for i in self.sales_tree.get_children():
-            self.sales_tree.delete(i)
-        sales_data = db_operations.fetch_sales_list_from_db()
-        new_focus_candidate = None
-        if sales_data:
-            receipt_counter = 0
-            for i, sale in enumerate(sales_data):
-                receipt_counter += 1
-                sale_id, timestamp_str, total_amount, customer_name_db = sale
-                try:
-                    timestamp_obj = datetime.datetime.fromisoformat(timestamp_str)
-                    display_ts = timestamp_obj.strftime('%a %Y-%m-%d %H:%M:%S')
-                except (TypeError, ValueError):
-                    display_ts = timestamp_str
-                total_display = f"{gui_utils.CURRENCY_SYMBOL}{total_amount:.2f}"
-                current_iid = str(sale_id)
-                self.sales_tree.insert("", 0,
-                                       values=(sale_id, receipt_counter, display_ts, customer_name_db, total_display),
-                                       iid=current_iid)
-                if current_iid == current_focus_id:
-                    new_focus_candidate = current_iid
-        if new_focus_candidate:
-            self.sales_tree.focus(new_focus_candidate)
-            self.sales_tree.selection_set(new_focus_candidate)
-            self.sales_tree.see(new_focus_candidate)
-        elif sales_data:
-            first_item_id = str(sales_data[0][0])
-            self.sales_tree.focus(first_item_id)
-            self.sales_tree.selection_set(first_item_id)
-            self.sales_tree.see(first_item_id)
+        self.query_executor.cancel("sales_refresh")  # The new first page includes its sales
+        self._sales_keys.clear()
+        self._sales_order = []
+        self._newest_receipt_no = 0
+        self._receipt_numbers_stale = False
+        self.sales_source.reset()
+        self.sales_filler.fill([("loading", ("", "", LOADING_TEXT, "", ""))], focus_first=False)
+        self.query_executor.submit("sales_page", self._fetch_first_sales_page, self.sales_source.next_page_args(),
+                                   on_done=lambda result: self._show_first_sales_page(result, current_focus_id))
+
+    @staticmethod
+    def _fetch_first_sales_page(page_args):
+        """Runs on a worker thread: the watermark SaleID and the first page of sales."""
+        # Read the watermark first: a sale committed in between is then picked up (once) by refresh_sales_list
+        max_sale_id = db_operations.fetch_max_sale_id()
+        return max_sale_id, db_operations.fetch_sales_page(*page_args)
+
+    def _show_first_sales_page(self, result, focus_id):
+        self._max_sale_id, rows = result
+        first_page = self.sales_source.accept_page(rows)
+        for sale in first_page:
+            self._sales_keys[str(sale[0])] = (sale[1], sale[0])
+        self._sales_order = [(sale[1], sale[0]) for sale in reversed(first_page)]
+        self._newest_receipt_no = first_page[0][4] if first_page else 0
+        # Keeps the previous focus if that sale is on the first page, else focuses the newest sale
+        self.sales_filler.fill(((str(sale[0]), self._sales_row_values(sale)) for sale in first_page),
+                               focus_iid=focus_id or None, on_done=self._sales_list_filled)
+        self._run_wanted_refresh()
+
+    def _sales_list_filled(self, focused_item_id):
+        if focused_item_id:
             self.on_sale_select()
         else:
             self.update_receipt_display("")
+        self._sales_rows_filled()
 
-    def update_todays_summary(self):
-        today = datetime.date.today()
-        start_today_dt_str = datetime.datetime.combine(today, datetime.time.min).isoformat()
-        end_today_dt_str = (
-            datetime.datetime.combine(today + datetime.timedelta(days=1), datetime.time.min)).isoformat()
-        today_revenue, _, num_sales_today = db_operations.fetch_sales_stats(start_today_dt_str, end_today_dt_str)
-        self.today_total_label.config(text=f"Total: {gui_utils.CURRENCY_SYMBOL}{today_revenue:.2f}")
-        self.todays_receipt_count = num_sales_today
+    @staticmethod
+    def _sales_row_values(sale):
+        """Formats a fetch_sales_page() row as the sales list columns."""
+        sale_id, timestamp_str, total_amount, customer_name_db, receipt_no = sale
+        try:
+            timestamp_obj = datetime.datetime.fromisoformat(timestamp_str)
+            display_ts = timestamp_obj.strftime('%a %Y-%m-%d %H:%M:%S')
+        except (TypeError, ValueError):
+            display_ts = timestamp_str
+        return sale_id, receipt_no, display_ts, customer_name_db, gui_utils.format_money(total_amount)
+
+    def _append_sales_rows(self, sales_rows):
+        """Queues a page of older sales to be added to the bottom of the list, after any rows still being filled."""
+        new_rows = []
+        for sale in sales_rows:
+            item_id = str(sale[0])
+            if item_id in self._sales_keys:  # Already added by refresh_sales_list
+                continue
+            new_rows.append((item_id, self._sales_row_values(sale)))
+            self._sales_keys[item_id] = (sale[1], sale[0])
+        # Every row of an older page sorts before the loaded ones
+        self._sales_order[:0] = [self._sales_keys[item_id] for item_id, _ in reversed(new_rows)]
+        self.sales_filler.fill(new_rows, focus_first=False, on_done=self._sales_rows_filled, append=True)
+
+    def _sales_rows_filled(self, focused_item_id=None):
+        """Loads the next page if the rows just filled still leave the list scrolled near the bottom."""
+        if float(self.sales_tree.yview()[1]) >= LOAD_MORE_THRESHOLD:
+            self._load_more_sales()
+
+    def refresh_sales_list(self):
+        """
+        Adds the sales recorded since the list was loaded (SaleID above the watermark) in their
+        sorted place, leaving the rows already shown untouched apart from their receipt numbers.
+        The new sales are read in the background. Also drops the cached receipts, which may show
+        product or customer names renamed since.
+        """
+        self.receipt_cache.clear()
+        if self.query_executor.is_pending("sales_page"):
+            # The new sales are placed against the loaded rows, so wait for the page on its way
+            self._refresh_wanted = True
+            return
+        self.query_executor.submit("sales_refresh", db_operations.fetch_sales_since, self._max_sale_id,
+                                   self.sales_source.filters, on_done=self._insert_new_sales)
+
+    def _run_wanted_refresh(self):
+        if self._refresh_wanted:
+            self._refresh_wanted = False
+            self.refresh_sales_list()
+
+    def _insert_new_sales(self, new_sales):
+        if not new_sales:
+            return
+        self._max_sale_id = max(self._max_sale_id, max(sale[0] for sale in new_sales))
+        # Oldest first: the newest receipt number then counts each sale as it is placed
+        for sale in reversed(new_sales):
+            item_id = str(sale[0])
+            if item_id in self._sales_keys:
+                continue
+            sale_key = (sale[1], sale[0])
+            index = bisect.bisect_left(self._sales_order, sale_key)
+            position = len(self._sales_order) - index  # Rows above it, newest first
+            self._newest_receipt_no += 1
+            if index == 0 and self._sales_order and not self.sales_source.exhausted:
+                # Older than every loaded row; the page source will reach it, one receipt number later
+                self.sales_source.shift_cursor_receipt(1)
+                continue
+            if position > 0:
+                self._receipt_numbers_stale = True  # The rows above it now number one higher
+                if self.sales_filler.running and not self.sales_tree.exists(str(self._sales_order[index][1])):
+                    self.sales_filler.finish()  # Its place is among the rows still queued
+            values = list(self._sales_row_values(sale))
+            values[1] = self._newest_receipt_no - position
+            self.sales_tree.insert("", position, values=values, iid=item_id)
+            self._sales_order.insert(index, sale_key)
+            self._sales_keys[item_id] = sale_key
+        logging.debug(f"Sales list refreshed with {len(new_sales)} new sales (watermark SaleID {self._max_sale_id}).")
+        self._renumber_visible_rows()
+
+    def _remove_sale_row(self, item_id):
+        """Removes a deleted sale from the list in place; the newer receipts above it number one lower."""
+        sale_key = self._sales_keys.pop(item_id, None)
+        if sale_key is None or not self.sales_tree.exists(item_id):
+            return
+        index = bisect.bisect_left(self._sales_order, sale_key)
+        del self._sales_order[index]
+        self._newest_receipt_no -= 1
+        if index < len(self._sales_order):
+            self._receipt_numbers_stale = True
+        next_focus = self.sales_tree.next(item_id) or self.sales_tree.prev(item_id)
+        self.sales_tree.delete(item_id)
+        self._sales_keys.pop(item_id, None)
+        if next_focus:
+            self.sales_tree.focus(next_focus)
+            self.sales_tree.selection_set(next_focus)
+            self.sales_tree.see(next_focus)
+            self.on_sale_select()
+        else:
+            self.update_receipt_display("")
 
-    def update_default_summaries(self):
+    def _renumber_visible_rows(self):
+        """
+        Rewrites the receipt numbers of the rows on screen from their offset below the newest
+        loaded sale, after sales were added or deleted below the top of the list.
+        """
+        if not self._receipt_numbers_stale:
+            return
+        item_id = self._first_visible_sale()
+        if not item_id:
+            return
+        index = bisect.bisect_left(self._sales_order, self._sales_keys[item_id])
+        receipt_no = self._newest_receipt_no - (len(self._sales_order) - 1 - index)
+        while item_id and self.sales_tree.bbox(item_id):
+            if self.sales_tree.set(item_id, "receipt_no") != str(receipt_no):
+                self.sales_tree.set(item_id, "receipt_no", receipt_no)
+            item_id = self.sales_tree.next(item_id)
+            receipt_no -= 1
+
+    def _first_visible_sale(self):
+        """The iid of the topmost sales list row on screen, or "" if there is none."""
+        for y in range(0, HEADING_SCAN_LIMIT_PX, HEADING_SCAN_STEP_PX):
+            item_id = self.sales_tree.identify_row(y)
+            if item_id:
+                return item_id if item_id in self._sales_keys else ""
+        return ""
+
+    def _load_more_sales(self):
+        """Reads the next page of older sales in the background and adds it to the bottom of the list."""
+        page_args = self.sales_source.next_page_args()
+        # While the previous page is still being filled the list has not reached its real length yet
+        # (after the first chunk it even reads as scrolled to the bottom); its on_done checks again
+        if page_args is None or self.query_executor.is_pending("sales_page") or self.sales_filler.running:
+            return
+        self.query_executor.submit("sales_page", db_operations.fetch_sales_page, *page_args,
+                                   on_done=self._show_more_sales)
+
+    def _show_more_sales(self, rows):
+        rows = self.sales_source.accept_page(rows)
+        if rows:
+            logging.debug(f"Loaded {len(rows)} more sales into the history list.")
+            self._append_sales_rows(rows)
+        self._run_wanted_refresh()
+
+    def _on_sales_tree_scroll(self, first, last):
+        """yscrollcommand for the sales list: moves the scrollbar and loads the next page near the bottom."""
+        self.sales_list_scrollbar.set(first, last)
+        self._renumber_visible_rows()
+        if float(last) >= LOAD_MORE_THRESHOLD:
+            self._load_more_sales()
+
+    def _read_search_filters(self):
+        """
+        Builds a db_operations sales search filter dict from the search bar.
+        Returns None (after telling the user) if a field is invalid.
+        """
+        filters = {}
+        text = self.search_text_var.get().strip()
+        if text:
+            filters["text"] = text
+        customer_prefix = self.search_customer_var.get().strip()
+        if customer_prefix:
+            filters["customer_prefix"] = customer_prefix
+        try:
+            from_str = self.search_from_var.get().strip()
+            if from_str:
+                from_date = datetime.datetime.strptime(from_str, '%Y-%m-%d')
+                filters["start_dt"] = from_date.isoformat()
+            to_str = self.search_to_var.get().strip()
+            if to_str:
+                to_date = datetime.datetime.strptime(to_str, '%Y-%m-%d')
+                filters["end_dt_exclusive"] = (to_date + datetime.timedelta(days=1)).isoformat()
+        except ValueError:
+            messagebox.showerror("Invalid Date", "Please enter dates as YYYY-MM-DD.", parent=self)
+            return None
+        try:
+            min_str = self.search_min_var.get().strip()
+            if min_str:
+                filters["min_total_cents"] = gui_utils.parse_money(min_str)
+            max_str = self.search_max_var.get().strip()
+            if max_str:
+                filters["max_total_cents"] = gui_utils.parse_money(max_str)
+        except ValueError:
+            messagebox.showerror("Invalid Amount", "Please enter valid numbers for the total range.", parent=self)
+            return None
+        sale_id_str = self.search_sale_id_var.get().strip()
+        if sale_id_str:
+            if not sale_id_str.isdigit():
+                messagebox.showerror("Invalid Sale #", "Please enter a whole number for the Sales #.", parent=self)
+                return None
+            filters["sale_id"] = int(sale_id_str)
+        return filters
+
+    def search_sales(self):
+        """Reloads the sales list with only the sales matching the search bar."""
+        filters = self._read_search_filters()
+        if filters is None:
+            return
+        logging.info(f"Searching sales history with filters: {filters}")
+        self.sales_source.filters = filters
+        self.populate_sales_list()
+
+    def clear_sales_search(self):
+        for variable in (self.search_text_var, self.search_customer_var, self.search_from_var, self.search_to_var,
+                         self.search_min_var, self.search_max_var, self.search_sale_id_var):
+            variable.set("")
+        if self.sales_source.filters:
+            self.sales_source.filters = {}
+            self.populate_sales_list()
+
+    def update_dashboard(self):
+        """
+        Loads today's, this week's and this month's totals and the custom range summary in the
+        background, with one fetch_dashboard_stats call for every total, the range's product list
+        and the report generation they were read at.
+        """
         today = datetime.date.today()
         start_of_week = today + relativedelta(weekday=MO(-1))
         end_of_week = start_of_week + relativedelta(days=6)
-        start_week_dt_str = datetime.datetime.combine(start_of_week, datetime.time.min).isoformat()
-        end_week_dt_str = (
-            datetime.datetime.combine(end_of_week + datetime.timedelta(days=1), datetime.time.min)).isoformat()
-        week_revenue, _, week_sales_count = db_operations.fetch_sales_stats(start_week_dt_str, end_week_dt_str)
+        start_of_month = today.replace(day=1)
+        periods = {
+            "today": (today, today + datetime.timedelta(days=1)),
+            "week": (start_of_week, end_of_week + datetime.timedelta(days=1)),
+            "month": (start_of_month, start_of_month + relativedelta(months=1)),
+        }
         start_date_fmt = start_of_week.strftime("%b %d")
         end_date_fmt = end_of_week.strftime("%b %d")
         week_label_text = f"This Week (Mon-Sun) {start_date_fmt} - {end_date_fmt}:"
         self.week_label_var.set(week_label_text)
-        self.week_total_label.config(text=f"Total: {gui_utils.CURRENCY_SYMBOL}{week_revenue:.2f}")
-
-    def update_custom_summary(self):
-        """Calculates and displays detailed product summary for the selected date range, including receipt count in LabelFrame."""
-        current_focus_id = self.custom_summary_tree.focus()
-        # Default title if dates are invalid or no data
-        default_labelframe_text = "Custom Date Range Details"
+        self.month_label_var.set(f"This Month ({today.strftime('%B %Y')}):")
+        for total_label in (self.today_total_label, self.week_total_label, self.month_total_label):
+            total_label.config(text=f"Total: {LOADING_TEXT}")
+
+        self.custom_summary_debouncer.cancel()
+        self.query_executor.cancel("custom_summary")  # Included below
+        custom_range = self._read_custom_range()
+        if custom_range is not None:
+            periods["custom"] = custom_range
+            self._custom_summary_key = (custom_range, None)
+            self.custom_summary_labelframe.config(text=f"Custom Date Range Details ({LOADING_TEXT})")
+        else:
+            self._reset_custom_summary()
+        self.query_executor.submit("dashboard", db_operations.fetch_dashboard_stats, periods,
+                                   summary_period="custom" if custom_range is not None else None,
+                                   on_done=lambda result: self._show_dashboard(result, custom_range))
+
+    def _show_dashboard(self, result, custom_range):
+        stats, summary_data, generation = result
+        self._show_todays_summary(stats["today"])
+        week_revenue, _, _ = stats["week"]
+        self.week_total_label.config(text=f"Total: {gui_utils.format_money(week_revenue)}")
+        month_revenue, _, _ = stats["month"]
+        self.month_total_label.config(text=f"Total: {gui_utils.format_money(month_revenue)}")
+        # The user may have picked another range (and loaded its summary) while this was running
+        if summary_data is not None and self._custom_summary_key == (custom_range, None):
+            self._custom_summary_key = (custom_range, generation)
+            self._show_custom_summary((summary_data, stats["custom"]))
+
+    def _show_todays_summary(self, stats):
+        today_revenue, _, num_sales_today = stats
+        self.today_total_label.config(text=f"Total: {gui_utils.format_money(today_revenue)}")
+        self.todays_receipt_count = num_sales_today
 
+    def _reset_custom_summary(self):
+        self._custom_summary_key = None
+        self.custom_summary_filler.cancel()
+        for i in self.custom_summary_tree.get_children(): self.custom_summary_tree.delete(i)
+        self.custom_range_grand_total_label.config(text=f"Total: {gui_utils.format_money(0)}")
+        self.custom_range_items_label.config(text="Items: 0")
+        self.custom_summary_labelframe.config(text="Custom Date Range Details")  # Reset title
+
+    def _read_custom_range(self, show_errors=True):
+        """
+        Returns the custom date range as (start_date, end_date_exclusive) dates, or None
+        (after telling the user, with show_errors) if the dates are missing or invalid.
+        """
         try:
             if DateEntry:
                 start_date = self.start_date_entry.get_date()
@@ -359,101 +753,180 @@ class SalesHistoryWindow(tk.Toplevel):
                 start_date_str = self.start_date_str_var.get()
                 end_date_str = self.end_date_str_var.get()
                 if not start_date_str or not end_date_str:
-                    for i in self.custom_summary_tree.get_children(): self.custom_summary_tree.delete(i)
-                    self.custom_range_grand_total_label.config(text=f"Total: {gui_utils.CURRENCY_SYMBOL}0.00")
-                    self.custom_range_items_label.config(text="Items: 0")
-                    self.custom_summary_labelframe.config(text=default_labelframe_text)  # Reset title
-                    messagebox.showwarning("Missing Date", "Please enter both start and end dates.", parent=self)
-                    return
+                    if show_errors:
+                        messagebox.showwarning("Missing Date", "Please enter both start and end dates.", parent=self)
+                    return None
                 start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
                 end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        except ValueError as ve:
+            if show_errors:
+                messagebox.showerror("Invalid Date Format", f"Please enter dates in YYYY-MM-DD format.\nError: {ve}",
+                                     parent=self)
+            return None
 
-            if start_date > end_date:
-                for i in self.custom_summary_tree.get_children(): self.custom_summary_tree.delete(i)
-                self.custom_range_grand_total_label.config(text=f"Total: {gui_utils.CURRENCY_SYMBOL}0.00")
-                self.custom_range_items_label.config(text="Items: 0")
-                self.custom_summary_labelframe.config(text=default_labelframe_text)  # Reset title
+        if start_date > end_date:
+            if show_errors:
                 messagebox.showwarning("Invalid Range", "Start date cannot be after end date.", parent=self)
-                return
-
-            start_date_dt_str = datetime.datetime.combine(start_date, datetime.time.min).isoformat()
-            end_date_dt_str = (
-                datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)).isoformat()
-            summary_data = db_operations.fetch_product_summary_by_date_range(start_date_dt_str, end_date_dt_str)
-
-            for i in self.custom_summary_tree.get_children():
-                self.custom_summary_tree.delete(i)
-
-            new_focus_candidate = None
-            if summary_data:
-                for i, item_summary in enumerate(summary_data):
-                    name, total_qty, total_revenue = item_summary
-                    revenue_display = f"{gui_utils.CURRENCY_SYMBOL}{total_revenue:.2f}"
-                    current_iid = name
-                    self.custom_summary_tree.insert("", tk.END, iid=current_iid,
-                                                    values=(name, total_qty, revenue_display))
-                    if current_iid == current_focus_id:
-                        new_focus_candidate = current_iid
-            else:
-                self.custom_summary_tree.insert("", tk.END, iid="placeholder",
-                                                values=("No sales in this period", "", ""))
-
-            if new_focus_candidate:
-                self.custom_summary_tree.focus(new_focus_candidate)
-                self.custom_summary_tree.selection_set(new_focus_candidate)
-                self.custom_summary_tree.see(new_focus_candidate)
-            elif summary_data:
-                first_item_id = summary_data[0][0]
-                self.custom_summary_tree.focus(first_item_id)
-                self.custom_summary_tree.selection_set(first_item_id)
-                self.custom_summary_tree.see(first_item_id)
-
-            custom_revenue, custom_items, custom_sales_count = db_operations.fetch_sales_stats(start_date_dt_str,
-                                                                                               end_date_dt_str)
-            self.custom_range_receipt_count = custom_sales_count  # Store receipt count
-
-            # Update LabelFrame text
+            return None
+
+        return start_date, end_date + datetime.timedelta(days=1)
+
+    def update_custom_summary(self, quiet=False):
+        """
+        Validates the selected date range and loads its product summary and totals in the background.
+        The list keeps its previous contents (with a loading title) until the new results arrive.
+        Runs through custom_summary_debouncer; quiet (used while picking dates) skips invalid
+        ranges without error messages and leaves the shown summary alone.
+        """
+        date_range = self._read_custom_range(show_errors=not quiet)
+        if date_range is None:
+            if not quiet:
+                self.query_executor.cancel("custom_summary")
+                self._reset_custom_summary()
+            return
+        if self._custom_summary_key == (date_range, None) and (self.query_executor.is_pending("custom_summary")
+                                                                or self.query_executor.is_pending("dashboard")):
+            logging.debug(f"Custom summary for {date_range} already loading.")
+            return
+        shown_key = self._custom_summary_key
+        self._custom_summary_key = (date_range, None)
+        self.custom_summary_labelframe.config(text=f"Custom Date Range Details ({LOADING_TEXT})")
+        self.query_executor.submit("custom_summary", self._fetch_custom_summary, date_range, shown_key,
+                                   on_done=self._show_custom_summary_result, on_error=self._custom_summary_failed)
+
+    @staticmethod
+    def _fetch_custom_summary(date_range, shown_key):
+        """
+        Runs on a worker thread: (date range, report generation) and the product summary and
+        (revenue, items, sales) stats for the range, or None for those if shown_key says the
+        summary on screen is still current.
+        """
+        # Every change to sales, items or product/customer names raises the report generation,
+        # so an unchanged key means the shown results are current
+        generation = db_operations.fetch_report_generation()
+        if generation is not None and (date_range, generation) == shown_key:
+            logging.debug(f"Custom summary for {date_range} already shown; reused.")
+            return shown_key, None
+        stats, summary_data, generation = db_operations.fetch_dashboard_stats({"custom": date_range},
+                                                                              summary_period="custom")
+        return (date_range, generation), (summary_data, stats["custom"])
+
+    def _show_custom_summary_result(self, result):
+        self._custom_summary_key, summary = result
+        if summary is None:
             self.custom_summary_labelframe.config(
                 text=f"Custom Date Range Details ({self.custom_range_receipt_count} Receipts)")
+        else:
+            self._show_custom_summary(summary)
+
+    def _show_custom_summary(self, result):
+        """Fills the custom range list and totals, including the receipt count in the LabelFrame."""
+        summary_data, (custom_revenue, custom_items, custom_sales_count) = result
+        # Rows get generated iids (a product name could clash with another row's); focus follows the name
+        current_focus_id = self.custom_summary_tree.focus()
+        focused_name = self.custom_summary_tree.item(current_focus_id, 'values')[0] if current_focus_id else None
+        if summary_data:
+            rows = [(f"product{index}", (name, total_qty, gui_utils.format_money(total_revenue)))
+                    for index, (name, total_qty, total_revenue) in enumerate(summary_data)]
+            focus_iid = next((iid for iid, values in rows if values[0] == focused_name), None)
+            self.custom_summary_filler.fill(rows, focus_iid=focus_iid)
+        else:
+            self.custom_summary_filler.fill([("placeholder", ("No sales in this period", "", ""))],
+                                            focus_first=False)
 
-            self.custom_range_grand_total_label.config(text=f"Total: {gui_utils.CURRENCY_SYMBOL}{custom_revenue:.2f}")
-            self.custom_range_items_label.config(text=f"Items: {custom_items}")
+        self.custom_range_receipt_count = custom_sales_count  # Store receipt count
 
-        except ValueError as ve:
-            for i in self.custom_summary_tree.get_children(): self.custom_summary_tree.delete(i)
-            self.custom_range_grand_total_label.config(text=f"Total: {gui_utils.CURRENCY_SYMBOL}0.00")
-            self.custom_range_items_label.config(text="Items: 0")
-            self.custom_summary_labelframe.config(text=default_labelframe_text)  # Reset title
-            messagebox.showerror("Invalid Date Format", f"Please enter dates in YYYY-MM-DD format.\nError: {ve}",
-                                 parent=self)
-        except Exception as e:
-            for i in self.custom_summary_tree.get_children(): self.custom_summary_tree.delete(i)
-            self.custom_range_grand_total_label.config(text=f"Total: {gui_utils.CURRENCY_SYMBOL}0.00")
-            self.custom_range_items_label.config(text="Items: 0")
-            self.custom_summary_labelframe.config(text=default_labelframe_text)  # Reset title
-            messagebox.showerror("Error", f"Could not calculate custom summary: {e}", parent=self)
+        # Update LabelFrame text
+        self.custom_summary_labelframe.config(
+            text=f"Custom Date Range Details ({self.custom_range_receipt_count} Receipts)")
+
+        self.custom_range_grand_total_label.config(text=f"Total: {gui_utils.format_money(custom_revenue)}")
+        self.custom_range_items_label.config(text=f"Items: {custom_items}")
+
+    def _custom_summary_failed(self, error):
+        self._reset_custom_summary()
+        messagebox.showerror("Error", f"Could not calculate custom summary: {error}", parent=self)
 
     def on_sale_select(self, event=None):
         selected_item_id = self.sales_tree.focus()
         if not selected_item_id:
             self.update_receipt_display("Select a sale from the list to view details.")
             return
+        if selected_item_id not in self._sales_keys:
+            return  # The loading row
         try:
             sale_id = int(selected_item_id)
-            item_data = self.sales_tree.item(selected_item_id, 'values')
-            if not item_data or len(item_data) < 5:
-                raise ValueError("Could not retrieve sale details from list.")
-            timestamp_str_from_tree = item_data[2]
-            customer_name_from_tree = item_data[3]
-            total_display_from_tree = item_data[4]
-            items = db_operations.fetch_sale_items_from_db(sale_id)
-            receipt = self.generate_detailed_receipt(sale_id, timestamp_str_from_tree, customer_name_from_tree,
-                                                     total_display_from_tree, items)
-            self.update_receipt_display(receipt)
+            receipt = self.receipt_cache.get(sale_id)
+            if receipt is None:
+                self.update_receipt_display(LOADING_TEXT)
+                self.query_executor.submit("receipt", db_operations.fetch_sale_items_from_db, sale_id,
+                                           on_done=lambda items: self._show_fetched_receipt(selected_item_id, items))
+            else:
+                self.query_executor.cancel("receipt")
+                self.update_receipt_display(receipt)
+            self._schedule_receipt_prefetch(selected_item_id)
         except (IndexError, ValueError, TypeError) as e:
             logging.error(f"Error processing sale selection: {e}")
             self.update_receipt_display("Error retrieving sale details.")
 
+    def _show_fetched_receipt(self, item_id, items):
+        """Caches the receipt read by on_sale_select() and shows it if its sale is still selected."""
+        if not self.sales_tree.exists(item_id):
+            return  # Deleted or reloaded away meanwhile
+        try:
+            receipt = self._render_receipt(item_id, items)
+        except (IndexError, ValueError, TypeError) as e:
+            logging.error(f"Error processing sale selection: {e}")
+            receipt = None
+        if receipt is not None:
+            self.receipt_cache.put(int(item_id), receipt)
+        if self.sales_tree.focus() == item_id:
+            self.update_receipt_display(receipt if receipt is not None else "Error retrieving sale details.")
+
+    def _render_receipt(self, item_id, items):
+        """Builds the receipt text for a sales list row from its displayed values and its items."""
+        item_data = self.sales_tree.item(item_id, 'values')
+        if not item_data or len(item_data) < 5:
+            raise ValueError("Could not retrieve sale details from list.")
+        timestamp_str_from_tree = item_data[2]
+        customer_name_from_tree = item_data[3]
+        total_display_from_tree = item_data[4]
+        return self.generate_detailed_receipt(int(item_id), timestamp_str_from_tree, customer_name_from_tree,
+                                              total_display_from_tree, items)
+
+    def _schedule_receipt_prefetch(self, item_id):
+        """
+        Fetches the items of up to RECEIPT_PREFETCH_COUNT uncached receipts beyond item_id (in the
+        direction the user is moving) with one background query; a newer selection supersedes it.
+        """
+        step = self.sales_tree.next if self._nav_direction > 0 else self.sales_tree.prev
+        neighbour_ids = []
+        neighbour = item_id
+        for _ in range(RECEIPT_PREFETCH_COUNT):
+            neighbour = step(neighbour)
+            if not neighbour:
+                break
+            if int(neighbour) not in self.receipt_cache:
+                neighbour_ids.append(neighbour)
+        if not neighbour_ids:
+            self.query_executor.cancel("receipt_prefetch")
+            return
+        self.query_executor.submit("receipt_prefetch", db_operations.fetch_sale_items_for_sales,
+                                   [int(i) for i in neighbour_ids],
+                                   on_done=lambda items_by_sale: self._cache_prefetched_receipts(
+                                       item_id, neighbour_ids, items_by_sale))
+
+    def _cache_prefetched_receipts(self, item_id, neighbour_ids, items_by_sale):
+        """Renders prefetched receipts into the cache (on the Tk thread, since it reads the sales list)."""
+        for neighbour in neighbour_ids:
+            sale_id = int(neighbour)
+            if sale_id in items_by_sale and self.sales_tree.exists(neighbour):
+                try:
+                    self.receipt_cache.put(sale_id, self._render_receipt(neighbour, items_by_sale[sale_id]))
+                except (IndexError, ValueError, TypeError) as e:
+                    logging.debug(f"Skipped prefetching receipt for Sale ID {sale_id}: {e}")
+        logging.debug(f"Prefetched {len(neighbour_ids)} receipts after Sale ID {item_id}.")
+
     def delete_selected_sale(self):
         selected_item_id = self.sales_tree.focus()
         if not selected_item_id:
@@ -471,10 +944,9 @@ class SalesHistoryWindow(tk.Toplevel):
             if confirmed:
                 if db_operations.delete_sale_from_db(sale_id_to_delete):
                     messagebox.showinfo("Success", f"Sales # {sale_id_to_delete} deleted successfully.", parent=self)
-                    self.populate_sales_list()
-                    self.update_default_summaries()
-                    self.update_todays_summary()
-                    self.update_custom_summary()
+                    self.receipt_cache.discard(sale_id_to_delete)
+                    self._remove_sale_row(selected_item_id)
+                    self.update_dashboard()
                 else:
                     messagebox.showerror("Error", f"Failed to delete Sales # {sale_id_to_delete}. Check logs.",
                                          parent=self)
@@ -498,8 +970,8 @@ class SalesHistoryWindow(tk.Toplevel):
         if items:
             for item_details in items:
                 name, qty, price, subtotal = item_details
-                price_str = f"{gui_utils.CURRENCY_SYMBOL}{price:.2f}"
-                subtotal_str = f"{gui_utils.CURRENCY_SYMBOL}{subtotal:.2f}"
+                price_str = gui_utils.format_money(price)
+                subtotal_str = gui_utils.format_money(subtotal)
                 receipt += "{:<18} {:>3d} {:>7} {:>8}\n".format(name[:18], qty, price_str, subtotal_str)
         else:
             receipt += " (No item details found)\n"
@@ -510,57 +982,60 @@ class SalesHistoryWindow(tk.Toplevel):
         return receipt
 
     def export_sales_to_csv(self):
+        """Exports every sale matching the current search (not just the pages loaded so far), newest first."""
         if not self.sales_tree.get_children():
             messagebox.showwarning("No Data", "There is no sales data to export.", parent=self)
             return
-        file_path = filedialog.asksaveasfilename(
-            parent=self, title="Save Sales History As", defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
-        )
-        if not file_path: return
-        try:
-            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                headers = [self.sales_tree.heading(col)['text'] for col in self.sales_columns_display]
-                writer.writerow(headers)
-                for item_id in self.sales_tree.get_children():
-                    row_values = self.sales_tree.item(item_id)['values']
-                    writer.writerow(row_values)
-            messagebox.showinfo("Export Successful", f"Sales history exported successfully to:\n{file_path}",
-                                parent=self)
-            logging.info(f"Sales history exported to {file_path}")
-        except Exception as e:
-            messagebox.showerror("Export Failed", f"Could not export sales history.\nError: {e}", parent=self)
-            logging.exception(f"Error exporting sales history: {e}")
+        self._start_export("sales", self.sales_source.filters, "Save Sales History As", "sales history")
+
+    def export_line_items_to_csv(self):
+        """Exports every item sold in the custom date range, one row per sale item."""
+        date_range = self._read_custom_range()
+        if date_range is None:
+            return
+        start_date, end_date_exclusive = date_range
+        range_filters = {"start_dt": _day_start_iso(start_date), "end_dt_exclusive": _day_start_iso(end_date_exclusive)}
+        self._start_export("line_items", range_filters, "Save Sale Items As", "sale items")
 
     def export_summary_to_csv(self):
-        if not self.custom_summary_tree.get_children():
-            messagebox.showwarning("No Data", "There is no summary data to export.", parent=self)
+        """Exports the product summary of the custom date range."""
+        date_range = self._read_custom_range()
+        if date_range is None:
             return
-        first_item_id = self.custom_summary_tree.get_children()[0]
-        first_item_values = self.custom_summary_tree.item(first_item_id)['values']
-        if first_item_values and first_item_values[0] == "No sales in this period":
-            messagebox.showwarning("No Data", "There is no summary data to export.", parent=self)
+        start_date, end_date_exclusive = date_range
+        range_filters = {"start_dt": _day_start_iso(start_date), "end_dt_exclusive": _day_start_iso(end_date_exclusive)}
+        self._start_export("product_summary", range_filters, "Save Product Summary As", "product summary")
+
+    def _start_export(self, kind, filters, dialog_title, description):
+        """
+        Asks for a file (.tsv means tab separated, anything else CSV) and streams the export into
+        it from the database on a worker thread, showing the row count as it goes.
+        """
+        if self.query_executor.is_pending("export"):
+            messagebox.showwarning("Export Running", "Please wait for the current export to finish.", parent=self)
             return
         file_path = filedialog.asksaveasfilename(
-            parent=self, title="Save Product Summary As", defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            parent=self, title=dialog_title, defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("TSV files", "*.tsv"), ("All files", "*.*")]
         )
         if not file_path: return
-        try:
-            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                headers = [self.custom_summary_tree.heading(col)['text'] for col in self.summary_columns]
-                writer.writerow(headers)
-                for item_id in self.custom_summary_tree.get_children():
-                    row_values = self.custom_summary_tree.item(item_id)['values']
-                    writer.writerow(row_values)
-            messagebox.showinfo("Export Successful", f"Product summary exported successfully to:\n{file_path}",
-                                parent=self)
-            logging.info(f"Product summary exported to {file_path}")
-        except Exception as e:
-            messagebox.showerror("Export Failed", f"Could not export product summary.\nError: {e}", parent=self)
-            logging.exception(f"Error exporting product summary: {e}")
+        delimiter = "\t" if file_path.lower().endswith(".tsv") else ","
+        self.export_status_var.set(f"Exporting {description}...")
+        self.query_executor.submit(
+            "export", db_operations.export_rows_to_file, kind, file_path, filters, delimiter=delimiter,
+            on_progress=lambda rows_written: self.export_status_var.set(
+                f"Exporting {description}... {rows_written:,} rows"),
+            on_done=lambda rows_written: self._export_finished(description, file_path, rows_written),
+            on_error=lambda error: self._export_failed(description, error))
+
+    def _export_finished(self, description, file_path, rows_written):
+        self.export_status_var.set("")
+        messagebox.showinfo("Export Successful",
+                            f"Exported {rows_written:,} rows of {description} to:\n{file_path}", parent=self)
+
+    def _export_failed(self, description, error):
+        self.export_status_var.set("")
+        messagebox.showerror("Export Failed", f"Could not export {description}.\nError: {error}", parent=self)
 
     def on_summary_item_select(self, event=None):
         selected_item_id = self.custom_summary_tree.focus()
@@ -600,7 +1075,6 @@ class SalesHistoryWindow(tk.Toplevel):
     def view_todays_items(self):
         logging.info("Showing today's individual item sales summary.")
         today_str = datetime.date.today().strftime('%Y-%m-%d')
-        items_data = db_operations.fetch_sales_items_for_date(today_str)
         receipt_count_str = f"({self.todays_receipt_count} Receipts)"
         window_title = f"Items Sold Today ({today_str}) - {receipt_count_str}"
 
@@ -640,21 +1114,37 @@ class SalesHistoryWindow(tk.Toplevel):
             self.todays_items_window.focus_set()
 
         if self.todays_items_tree:
+            for i in self.todays_items_tree.get_children():
+                self.todays_items_tree.delete(i)
+            self.todays_items_tree.insert('', tk.END, values=(LOADING_TEXT, "", ""))
+            self.query_executor.submit("todays_items", db_operations.fetch_sales_items_for_date, today_str,
+                                       on_done=self._show_todays_items)
+
+        self.todays_items_window.grab_set()
+
+    def _show_todays_items(self, items_data):
+        if self.todays_items_tree:  # The window may have been closed while loading
             for i in self.todays_items_tree.get_children():
                 self.todays_items_tree.delete(i)
             if items_data:
                 for item in items_data:
                     name, qty, revenue = item
-                    revenue_str = f"{gui_utils.CURRENCY_SYMBOL}{revenue:.2f}"
+                    revenue_str = gui_utils.format_money(revenue)
                     self.todays_items_tree.insert('', tk.END, values=(name, qty, revenue_str))
             else:
                 self.todays_items_tree.insert('', tk.END, values=("No items sold today.", "", ""))
 
-        self.todays_items_window.grab_set()
-
     def _close_todays_items_window(self):
+        self.query_executor.cancel("todays_items")
         if self.todays_items_window:
             self.todays_items_window.grab_release()
             self.todays_items_window.destroy()
             self.todays_items_window = None
             self.todays_items_tree = None
+
+    def destroy(self):
+        """Discards pending background queries before the window goes away."""
+        self.custom_summary_debouncer.cancel()
+        self.query_executor.shutdown()
+        customer_directory.directory.remove_listener(self.receipt_cache.clear)
+        super().destroy()
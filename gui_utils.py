@@ -1,6 +1,10 @@
 import tkinter as tk
 import os
+import time
 import logging
+import itertools
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from tkinter import ttk
 
 # --- Constants Defined Here ---
@@ -120,6 +124,206 @@ def set_window_icon(window):
     else:
          logging.warning(f"Icon file '{ICON_FILENAME}' not found for window '{window.title()}'.")
 
+# --- Money Helpers ---
+# Amounts are integer cents everywhere in the app; these are the only places they become text.
+def format_amount(cents):
+    """Formats integer cents as a plain amount, e.g. 12345 -> '123.45' (for entry fields)."""
+    sign = "-" if cents < 0 else ""
+    whole, fraction = divmod(abs(int(cents)), 100)
+    return f"{sign}{whole}.{fraction:02d}"
+
+def format_money(cents):
+    """Formats integer cents for display with the currency symbol, e.g. 12345 -> '₱123.45'."""
+    amount = format_amount(cents)
+    if amount.startswith("-"):
+        return f"-{CURRENCY_SYMBOL}{amount[1:]}"
+    return f"{CURRENCY_SYMBOL}{amount}"
+
+def parse_money(text):
+    """
+    Parses user-entered text such as '12', '12.5' or '₱12.50' into integer cents,
+    rounding half up to the nearest cent. Raises ValueError if the text is not a number.
+    """
+    cleaned = str(text).strip().replace(CURRENCY_SYMBOL, "").replace(",", "")
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: '{text}'")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: '{text}'")
+    return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+# --- Caching Helpers ---
+class LRUCache:
+    """A small least-recently-used cache: holds at most max_size entries, evicting the stalest."""
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Returns the cached value (marking it recently used), or default on a miss."""
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+# --- Treeview Filling ---
+FILL_CHUNK_BUDGET_MS = 15 # Insert rows for at most this long before letting Tk handle events
+FILL_CHUNK_DELAY_MS = 1 # Pause between chunks
+
+class TreeviewFiller:
+    """
+    Fills a Treeview in time-budgeted chunks scheduled with after(), so a long list appears
+    progressively and the window stays responsive. Starting a new fill cancels the one in progress.
+
+    Rows are (iid, values) pairs; an iid of None lets the Treeview pick one.
+    """
+    def __init__(self, tree, budget_ms=FILL_CHUNK_BUDGET_MS):
+        self.tree = tree
+        self.budget_ms = budget_ms
+        self._job = None
+        self._rows = None
+
+    @property
+    def running(self):
+        return self._rows is not None
+
+    def fill(self, rows, focus_iid=None, focus_first=True, on_done=None, append=False):
+        """
+        Replaces the tree's rows with rows (or adds them at the end, with append=True; a fill
+        still in progress then goes on to insert them after its own rows, in the same chunks,
+        keeping its focus_iid, focus_first and on_done and ignoring these).
+
+        focus_iid is focused and selected as soon as it is inserted, typically the row that had
+        focus before the reload. Otherwise, with focus_first, the first new row is focused once
+        the fill completes. on_done(focused_iid) is called after the last row, with the iid this
+        fill focused (or None).
+        """
+        if append:
+            if self._rows is not None:
+                self._rows = itertools.chain(self._rows, rows)
+                return
+        else:
+            self.cancel()
+            self.tree.delete(*self.tree.get_children())
+        self._rows = iter(rows)
+        self._focus_iid = focus_iid
+        self._focus_first = focus_first
+        self._on_done = on_done
+        self._first_iid = None
+        self._focused_iid = None
+        self._fill_chunk() # The first chunk goes in right away, so the list does not flash empty
+
+    def finish(self):
+        """Inserts all remaining rows of the fill in progress immediately."""
+        if self._rows is not None:
+            self._cancel_job()
+            self._fill_chunk(all_rows=True)
+
+    def cancel(self):
+        """Stops the fill in progress; rows already inserted stay and on_done is not called."""
+        self._cancel_job()
+        self._rows = None
+
+    def _cancel_job(self):
+        if self._job is not None:
+            try:
+                self.tree.after_cancel(self._job)
+            except tk.TclError:
+                pass # Widget already destroyed
+            self._job = None
+
+    def _select(self, iid):
+        self.tree.focus(iid)
+        self.tree.selection_set(iid)
+        self.tree.see(iid)
+        self._focused_iid = iid
+
+    def _fill_chunk(self, all_rows=False):
+        self._job = None
+        deadline = None if all_rows else time.perf_counter() + self.budget_ms / 1000
+        try:
+            for iid, values in self._rows:
+                new_iid = self.tree.insert("", tk.END, iid=iid, values=values)
+                if self._first_iid is None:
+                    self._first_iid = new_iid
+                if self._focus_iid is not None and new_iid == self._focus_iid:
+                    self._select(new_iid)
+                if deadline is not None and time.perf_counter() >= deadline:
+                    self._job = self.tree.after(FILL_CHUNK_DELAY_MS, self._fill_chunk)
+                    return
+            if (self._focused_iid is None and self._focus_first and self._first_iid is not None
+                    and not self.tree.focus()):
+                self._select(self._first_iid)
+        except tk.TclError:
+            self._rows = None
+            if self._tree_exists():
+                raise  # A real error (e.g. a duplicate iid), not the window closing mid-fill
+            logging.debug("Treeview fill stopped; the widget was destroyed.")
+            return
+        self._rows = None
+        if self._on_done is not None:
+            self._on_done(self._focused_iid)
+
+    def _tree_exists(self):
+        try:
+            return bool(self.tree.winfo_exists())
+        except tk.TclError:
+            return False  # The whole Tk application is gone
+
+# --- Debouncing ---
+class Debouncer:
+    """
+    Collapses bursts of calls into one: every trigger() restarts a delay_ms timer, and func runs
+    once, with the last trigger's arguments, after the triggers have stopped for that long.
+    """
+    def __init__(self, widget, delay_ms, func):
+        self.widget = widget
+        self.delay_ms = delay_ms
+        self.func = func
+        self._job = None
+        self._args = ()
+        self._kwargs = {}
+
+    @property
+    def pending(self):
+        return self._job is not None
+
+    def trigger(self, *args, **kwargs):
+        self.cancel()
+        self._args, self._kwargs = args, kwargs
+        self._job = self.widget.after(self.delay_ms, self._fire)
+
+    def cancel(self):
+        if self._job is not None:
+            try:
+                self.widget.after_cancel(self._job)
+            except tk.TclError:
+                pass # Widget already destroyed
+            self._job = None
+
+    def _fire(self):
+        self._job = None
+        self.func(*self._args, **self._kwargs)
+
 class Tooltip:
     """Create a tooltip for a given widget."""
     def __init__(self, widget, text):
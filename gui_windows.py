@@ -6,7 +6,6 @@ from tkinter import filedialog
 import datetime
 import os
 import sqlite3
-import shutil
 import logging # Added logging module
 
 # --- External Libraries ---
@@ -17,6 +16,7 @@ except ImportError:
     DateEntry = None
 
 # --- Import Project Modules ---
+import customer_directory
 import db_operations
 import gui_utils
 from gui_dialogs import PriceInputDialog, CustomerSelectionDialog, CustomPriceDialog
@@ -144,9 +144,10 @@ class POSApp:
         logging.info("Initializing database...")
         db_operations.initialize_db() # Ensure DB is ready
         logging.info("Database initialized.")
+        customer_directory.directory.load() # Customer dialogs and lists then never wait on the database
         self.products = self.load_products()
         self.current_sale = {}
-        self.total_amount = 0.0
+        self.total_amount = 0
         self.history_window = None
         self.customer_list_window = None
         self.first_product_button = None
@@ -313,7 +314,7 @@ class POSApp:
             finalize_total_frame.columnconfigure(2, weight=0)
             self.finalize_button = ttk.Button(finalize_total_frame, text="Finalize Sale (Ctrl+F)", command=self.finalize_sale, style=self.STYLE_FINALIZE_BUTTON)
             gui_utils.Tooltip(self.finalize_button, "Finalize and record the current sale. Shortcut: Ctrl+F")
-            self.total_label = ttk.Label(finalize_total_frame, text=f"{gui_utils.CURRENCY_SYMBOL}0.00", font=("Arial", 14, "bold"), style=self.STYLE_TOTAL_LABEL)
+            self.total_label = ttk.Label(finalize_total_frame, text=gui_utils.format_money(0), font=("Arial", 14, "bold"), style=self.STYLE_TOTAL_LABEL)
             self.finalize_button.grid(row=0, column=1, padx=(5, 10), sticky="e")
             self.total_label.grid(row=0, column=2, padx=(0, 5), sticky="e")
 
@@ -426,7 +427,7 @@ class POSApp:
             self.show_status("Backup cancelled.", 3000)
             return
         try:
-            shutil.copy2(source_db, backup_path)
+            db_operations.backup_database_to(backup_path)
             logging.info(f"Database successfully backed up to '{backup_path}'.")
             self.show_status(f"Backup successful: {os.path.basename(backup_path)}", 5000)
         except Exception as e:
@@ -470,7 +471,7 @@ class POSApp:
                 self.customer_list_window.destroy()
             self.root.update_idletasks(); self.root.after(100) # Brief pause
 
-            shutil.copy2(backup_path, target_db)
+            db_operations.restore_database_from(backup_path) # Closes pooled connections and clears WAL files first
             logging.info(f"Database successfully restored from '{backup_path}'. Application will close.")
             messagebox.showinfo("Restore Successful", f"Restored from:\n{os.path.basename(backup_path)}\n\nApplication will close. Please restart.", parent=self.root)
             self.root.destroy()
@@ -549,7 +550,7 @@ class POSApp:
 
         row_num, col_num = 0, 0
         for idx, (name, price) in enumerate(ordered_products_for_buttons):
-            btn_text = f"{name}\n({gui_utils.CURRENCY_SYMBOL}{price:.2f})"
+            btn_text = f"{name}\n({gui_utils.format_money(price)})"
             # Determine command based on product name
             button_command = self.prompt_custom_item if name == custom_sale_name else lambda n=name: self.add_item(n)
 
@@ -577,7 +578,7 @@ class POSApp:
         logging.debug("Populating product management list...")
         self.product_listbox.delete(0, tk.END)
         for name, price in sorted(self.products.items()):
-            self.product_listbox.insert(tk.END, f"{name} ({gui_utils.CURRENCY_SYMBOL}{price:.2f})")
+            self.product_listbox.insert(tk.END, f"{name} ({gui_utils.format_money(price)})")
         logging.debug("Product management list populated.")
 
     def _get_selected_product_details(self):
@@ -589,10 +590,10 @@ class POSApp:
             return None, None
         selected_text = self.product_listbox.get(indices[0])
         try:
-            parts = selected_text.split(f' ({gui_utils.CURRENCY_SYMBOL}')
+            parts = selected_text.rsplit(' (', 1)
             if len(parts) == 2:
                 name = parts[0].strip()
-                price = float(parts[1].rstrip(')').strip())
+                price = gui_utils.parse_money(parts[1].rstrip(')').strip())
                 logging.debug(f"Selected product details: Name='{name}', Price={price}")
                 return name, price
             raise ValueError(f"Format error: {selected_text}")
@@ -635,7 +636,7 @@ class POSApp:
             logging.info("Product name edit cancelled or empty.")
             return
         new_name = new_name.strip()
-        price_dialog = PriceInputDialog(self.root, "Edit Price", f"New price for {new_name}:", initialvalue=f"{original_price:.2f}")
+        price_dialog = PriceInputDialog(self.root, "Edit Price", f"New price for {new_name}:", initialvalue=gui_utils.format_amount(original_price))
         new_price = price_dialog.result
         if new_price is not None:
             logging.info(f"Attempting to update product '{original_name}' to Name='{new_name}', Price={new_price}")
@@ -678,13 +679,13 @@ class POSApp:
              logging.error(f"Attempted to add non-existent product '{name}'.")
              messagebox.showerror("Error", f"Product '{name}' not found.", parent=self.root)
              return
-        item_key = f"{name}__{current_price:.2f}"
+        item_key = f"{name}__{current_price}"
         if item_key in self.current_sale:
              self.current_sale[item_key]['quantity'] += quantity_to_add
-             logging.info(f"Incremented quantity for '{name}' (Price: {current_price:.2f}) by {quantity_to_add}. New quantity: {self.current_sale[item_key]['quantity']}.")
+             logging.info(f"Incremented quantity for '{name}' (Price: {current_price} cents) by {quantity_to_add}. New quantity: {self.current_sale[item_key]['quantity']}.")
         else:
             self.current_sale[item_key] = {'name': name, 'price': current_price, 'quantity': quantity_to_add}
-            logging.info(f"Added new item '{name}' (Price: {current_price:.2f}, Quantity: {quantity_to_add}) to sale.")
+            logging.info(f"Added new item '{name}' (Price: {current_price} cents, Quantity: {quantity_to_add}) to sale.")
         self.show_status(f"Added {quantity_to_add} x {name}", 2000)
         self.update_sale_display()
 
@@ -759,22 +760,22 @@ class POSApp:
         except tk.TclError: pass # Ignore if style not ready
 
         for i in self.sale_tree.get_children(): self.sale_tree.delete(i)
-        self.total_amount = 0.0
+        self.total_amount = 0
         new_selection_id = None
         for i, (key, details) in enumerate(sorted(self.current_sale.items(), key=lambda item: item[1]['name'])):
             tag = 'evenrow' if i % 2 == 0 else 'oddrow'
             subtotal = details['price'] * details['quantity']
-            item_id = self.sale_tree.insert("", tk.END, iid=key, values=(details['name'], details['quantity'], f"{gui_utils.CURRENCY_SYMBOL}{details['price']:.2f}", f"{gui_utils.CURRENCY_SYMBOL}{subtotal:.2f}"), tags=(tag,))
+            item_id = self.sale_tree.insert("", tk.END, iid=key, values=(details['name'], details['quantity'], gui_utils.format_money(details['price']), gui_utils.format_money(subtotal)), tags=(tag,))
             if preserve_selection == key: new_selection_id = item_id
             self.total_amount += subtotal
-        self.total_label.config(text=f"Total: {gui_utils.CURRENCY_SYMBOL}{self.total_amount:.2f}")
+        self.total_label.config(text=f"Total: {gui_utils.format_money(self.total_amount)}")
         if new_selection_id:
             logging.debug(f"Reselecting item in sale tree: {new_selection_id}")
             self.sale_tree.focus(new_selection_id)
             self.sale_tree.selection_set(new_selection_id)
         else:
              self.sale_tree.focus(''); self.sale_tree.selection_set('')
-        logging.debug(f"Sale display updated. Total: {self.total_amount:.2f}")
+        logging.debug(f"Sale display updated. Total: {self.total_amount} cents")
 
     def clear_sale(self):
         """Clears the current sale."""
@@ -823,11 +824,11 @@ class POSApp:
             subtotal = details['quantity'] * details['price']
             receipt += "{:<18} {:>3d} {:>7} {:>8}\n".format(
                 details['name'][:18], details['quantity'],
-                f"{gui_utils.CURRENCY_SYMBOL}{details['price']:.2f}",
-                f"{gui_utils.CURRENCY_SYMBOL}{subtotal:.2f}"
+                gui_utils.format_money(details['price']),
+                gui_utils.format_money(subtotal)
             )
         receipt += "======================================\n"
-        receipt += "{:<29} {:>8}\n".format("TOTAL:", f"{gui_utils.CURRENCY_SYMBOL}{self.total_amount:.2f}")
+        receipt += "{:<29} {:>8}\n".format("TOTAL:", gui_utils.format_money(self.total_amount))
         receipt += "--------------------------------------\n"
         receipt += "        Thank you!\n"
         return receipt
@@ -844,10 +845,10 @@ class POSApp:
             messagebox.showwarning("No Customer", "Select customer first.", parent=self.root)
             return
         ts = datetime.datetime.now()
-        items_for_db = {d['name']: {'price': d['price'], 'quantity': d['quantity']} for d in self.current_sale.values()}
+        items_for_db = [{'name': d['name'], 'price': d['price'], 'quantity': d['quantity']} for d in self.current_sale.values()]
         logging.info(f"Finalizing sale for customer '{self.current_customer_name}' with {len(items_for_db)} distinct item types.")
-        sale_id = db_operations.save_sale_record(ts, self.total_amount, self.current_customer_name)
-        if sale_id and db_operations.save_sale_items_records(sale_id, items_for_db):
+        sale_id = db_operations.commit_sale(ts, self.current_customer_name, items_for_db)
+        if sale_id:
             receipt = self.generate_receipt_text(sale_id, ts, self.current_customer_name)
             logging.info(f"Sale {sale_id} successfully saved to database.")
             logging.debug(f"--- Receipt {sale_id} ---\n{receipt}\n---------------") # Log receipt details at debug level
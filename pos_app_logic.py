@@ -5,7 +5,6 @@ from tkinter import simpledialog
 from tkinter import filedialog
 import datetime
 import os
-import shutil
 import logging
 
 from dateutil.relativedelta import relativedelta, MO, SU
@@ -15,6 +14,7 @@ try:
 except ImportError:
     DateEntry = None
 
+import customer_directory
 import db_operations
 import gui_utils
 from gui_dialogs import PriceInputDialog, CustomerSelectionDialog, CustomPriceDialog
@@ -62,9 +62,10 @@ class POSAppLogic:
         logging.info("Initializing database...")
         db_operations.initialize_db()
         logging.info("Database initialized.")
+        customer_directory.directory.load() # Customer dialogs and lists then never wait on the database
         self.products = self.load_products()
         self.current_sale = {}
-        self.total_amount = 0.0
+        self.total_amount = 0  # Integer cents, like every amount in the app
         self.history_window = None
         self.customer_list_window = None
         self.status_bar_job = None
@@ -333,7 +334,7 @@ class POSAppLogic:
             self.show_status("Backup cancelled.", 3000, status_type="info")
             return
         try:
-            shutil.copy2(source_db, backup_path)
+            db_operations.backup_database_to(backup_path)
             logging.info(f"Database successfully backed up to '{backup_path}'.")
             self.show_status(f"Backup successful: {os.path.basename(backup_path)}", 5000, status_type="success")
         except Exception as e:
@@ -384,7 +385,8 @@ class POSAppLogic:
             self.root.update_idletasks()
             self.root.after(100)
 
-            shutil.copy2(backup_path, target_db)
+            # Closes pooled connections and clears WAL files before the copy
+            db_operations.restore_database_from(backup_path)
             logging.info(f"Database successfully restored from '{backup_path}'. Application will close.")
             self.show_status("Restore successful! Restarting...", duration=None, status_type="success")
             self.root.update_idletasks()
@@ -474,7 +476,7 @@ class POSAppLogic:
 
         row_num, col_num = 0, 0
         for idx, (name, price) in enumerate(ordered_products_for_buttons):
-            btn_text = f"{name}\n({gui_utils.CURRENCY_SYMBOL}{price:.2f})"
+            btn_text = f"{name}\n({gui_utils.format_money(price)})"
             current_button_style = 'Product.TButton'
             if name == custom_sale_name:
                 current_button_style = 'CustomSale.Product.TButton'
@@ -501,7 +503,7 @@ class POSAppLogic:
         if hasattr(self.ui, 'product_listbox') and self.ui.product_listbox:
             self.ui.product_listbox.delete(0, tk.END)
             for name, price in sorted(self.products.items()):
-                self.ui.product_listbox.insert(tk.END, f"{name} ({gui_utils.CURRENCY_SYMBOL}{price:.2f})")
+                self.ui.product_listbox.insert(tk.END, f"{name} ({gui_utils.format_money(price)})")
         logging.debug("Product management list populated.")
 
     def _get_selected_product_details(self):
@@ -514,11 +516,11 @@ class POSAppLogic:
             return None, None
         selected_text = self.ui.product_listbox.get(indices[0])
         try:
-            parts = selected_text.split(f' ({gui_utils.CURRENCY_SYMBOL}')
+            parts = selected_text.rsplit(' (', 1)
             if len(parts) == 2:
                 name = parts[0].strip()
                 price_str = parts[1].rstrip(')').strip()
-                price = float(price_str)
+                price = gui_utils.parse_money(price_str)
                 logging.debug(f"Selected product: Name='{name}', Price={price}")
                 return name, price
             raise ValueError(f"Format error: {selected_text}")
@@ -543,7 +545,7 @@ class POSAppLogic:
         price_dialog = PriceInputDialog(self.root, "New Product Price", f"Enter Price for {name}:")
         price = price_dialog.result
         if price is not None:
-            logging.info(f"Attempting add: Name='{name}', Price={price}")
+            logging.info(f"Attempting add: Name='{name}', Price={price} cents")
             if db_operations.insert_product_to_db(name, price):
                 self.products[name] = price
                 self.populate_product_buttons()
@@ -566,10 +568,10 @@ class POSAppLogic:
             return
         new_name = new_name.strip()
         price_dialog = PriceInputDialog(self.root, "Edit Price", f"New price for {new_name}:",
-                                        initialvalue=f"{original_price:.2f}")
+                                        initialvalue=gui_utils.format_amount(original_price))
         new_price = price_dialog.result
         if new_price is not None:
-            logging.info(f"Attempting update '{original_name}' to Name='{new_name}', Price={new_price}")
+            logging.info(f"Attempting update '{original_name}' to Name='{new_name}', Price={new_price} cents")
             if new_name != original_name and new_name in self.products:
                 logging.warning(f"Edit failed: Name '{new_name}' exists.")
                 messagebox.showerror("Exists", f"'{new_name}' already exists.", parent=self.root)
@@ -580,11 +582,17 @@ class POSAppLogic:
                 self.products[new_name] = new_price
                 self.populate_product_buttons()
                 self.populate_product_management_list()
+                self._refresh_open_history_window()
                 logging.info(f"Product '{original_name}' updated to '{new_name}'.")
                 self.show_status(f"'{original_name}' updated.", status_type="success")
         else:
             self.show_status("Edit product cancelled (no price).", status_type="info")
 
+    def _refresh_open_history_window(self):
+        """Refreshes an open sales history window after a product change, so its receipts show the new names."""
+        if self.history_window is not None and tk.Toplevel.winfo_exists(self.history_window):
+            self.history_window.refresh_sales_list()
+
     def remove_selected_product_permanently(self):
         logging.info("Initiating remove product.")
         product_name, _ = self._get_selected_product_details()
@@ -597,6 +605,7 @@ class POSAppLogic:
                 if product_name in self.products: del self.products[product_name]
                 self.populate_product_buttons()
                 self.populate_product_management_list()
+                self._refresh_open_history_window()
                 logging.info(f"Product '{product_name}' deleted.")
                 self.show_status(f"'{product_name}' deleted.", status_type="success")
         else:
@@ -610,14 +619,14 @@ class POSAppLogic:
             messagebox.showerror("Error", f"Product '{name}' not found.", parent=self.root)
             self.show_status(f"Error: '{name}' not found.", status_type="error")
             return
-        item_key = f"{name}__{current_price:.2f}"
+        item_key = f"{name}__{current_price}"
         if item_key in self.current_sale:
             self.current_sale[item_key]['quantity'] += quantity_to_add
             logging.info(
                 f"Incremented '{name}' qty by {quantity_to_add}. New: {self.current_sale[item_key]['quantity']}.")
         else:
             self.current_sale[item_key] = {'name': name, 'price': current_price, 'quantity': quantity_to_add}
-            logging.info(f"Added '{name}' (Price: {current_price:.2f}, Qty: {quantity_to_add}) to sale.")
+            logging.info(f"Added '{name}' (Price: {current_price} cents, Qty: {quantity_to_add}) to sale.")
         self.show_status(f"Added {quantity_to_add} x {name}", status_type="success")
         self.update_sale_display()
 
@@ -633,7 +642,7 @@ class POSAppLogic:
         result = dialog.result
         if result:
             name, price, qty = result
-            logging.info(f"Custom item received: Name='{name}', Price={price}, Qty={qty}.")
+            logging.info(f"Custom item received: Name='{name}', Price={price} cents, Qty={qty}.")
             self.add_item(name, override_price=price, quantity_to_add=qty)
         else:
             logging.info("Custom price/qty dialog cancelled.")
@@ -696,21 +705,21 @@ class POSAppLogic:
             pass
 
         for i in sale_tree.get_children(): sale_tree.delete(i)
-        self.total_amount = 0.0
+        self.total_amount = 0
         new_selection_id = None
         sorted_sale_items = sorted(self.current_sale.items(), key=lambda item: item[1]['name'])
         for i, (key, details) in enumerate(sorted_sale_items):
             tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-            subtotal = details['price'] * details['quantity']
+            subtotal = details['price'] * details['quantity']  # Integer cents, so the total never drifts
             item_id_in_tree = sale_tree.insert("", tk.END, iid=key, values=(
                 details['name'], details['quantity'],
-                f"{gui_utils.CURRENCY_SYMBOL}{details['price']:.2f}",
-                f"{gui_utils.CURRENCY_SYMBOL}{subtotal:.2f}"
+                gui_utils.format_money(details['price']),
+                gui_utils.format_money(subtotal)
             ), tags=(tag,))
             if preserve_selection == key:
                 new_selection_id = item_id_in_tree
             self.total_amount += subtotal
-        total_label.config(text=f"Total: {gui_utils.CURRENCY_SYMBOL}{self.total_amount:.2f}")
+        total_label.config(text=f"Total: {gui_utils.format_money(self.total_amount)}")
         if new_selection_id:
             logging.debug(f"Reselecting sale tree item: {new_selection_id}")
             sale_tree.focus(new_selection_id)
@@ -718,7 +727,7 @@ class POSAppLogic:
         else:
             sale_tree.focus('');
             sale_tree.selection_set('')
-        logging.debug(f"Sale display updated. Total: {self.total_amount:.2f}")
+        logging.debug(f"Sale display updated. Total: {self.total_amount} cents")
 
     def clear_sale(self):
         if not self.current_sale:
@@ -765,11 +774,11 @@ class POSAppLogic:
             subtotal = details['quantity'] * details['price']
             receipt += "{:<18} {:>3d} {:>7} {:>8}\n".format(
                 details['name'][:18], details['quantity'],
-                f"{gui_utils.CURRENCY_SYMBOL}{details['price']:.2f}",
-                f"{gui_utils.CURRENCY_SYMBOL}{subtotal:.2f}"
+                gui_utils.format_money(details['price']),
+                gui_utils.format_money(subtotal)
             )
         receipt += "======================================\n"
-        receipt += "{:<29} {:>8}\n".format("TOTAL:", f"{gui_utils.CURRENCY_SYMBOL}{self.total_amount:.2f}")
+        receipt += "{:<29} {:>8}\n".format("TOTAL:", gui_utils.format_money(self.total_amount))
         receipt += "--------------------------------------\n"
         receipt += "        Thank you, Come Again!\n"
         return receipt
@@ -794,8 +803,8 @@ class POSAppLogic:
                 'name': details['name'], 'price': details['price'], 'quantity': details['quantity']
             })
         logging.info(f"Finalizing sale for '{self.current_customer_name}' with {len(items_for_db)} item types.")
-        sale_id = db_operations.save_sale_record(ts, self.total_amount, self.current_customer_name)
-        if sale_id and db_operations.save_sale_items_records(sale_id, items_for_db):
+        sale_id = db_operations.commit_sale(ts, self.current_customer_name, items_for_db)
+        if sale_id:
             receipt = self.generate_receipt_text(sale_id, ts, self.current_customer_name)
             logging.info(f"Sale {sale_id} saved.")
             logging.debug(f"--- Receipt {sale_id} ---\n{receipt}\n---------------")
@@ -892,8 +901,8 @@ class POSAppLogic:
         if isinstance(selected_date, datetime.date):
             selected_date = datetime.datetime.combine(selected_date, datetime.time.min)
             
-        sale_id = db_operations.save_sale_record(selected_date, self.total_amount, self.current_customer_name)
-        if sale_id and db_operations.save_sale_items_records(sale_id, items_for_db):
+        sale_id = db_operations.commit_sale(selected_date, self.current_customer_name, items_for_db)
+        if sale_id:
             receipt = self.generate_receipt_text(sale_id, selected_date, self.current_customer_name)
             logging.info(f"Sale {sale_id} saved with custom date.")
             logging.debug(f"--- Receipt {sale_id} ---\n{receipt}\n---------------")
@@ -925,6 +934,7 @@ class POSAppLogic:
             self.history_window.grab_set()
         else:
             logging.debug("Focusing existing SalesHistoryWindow.")
+            self.history_window.refresh_sales_list()
             self.history_window.deiconify();
             self.history_window.lift();
             self.history_window.focus_set();
@@ -147,7 +147,7 @@ class POSAppUI:
         finalize_total_frame.columnconfigure(3, weight=0)
         self.finalize_button = ttk.Button(finalize_total_frame, text="Finalize Sale (Ctrl+F)", style='Finalize.TButton')
         self.finalize_with_date_button = ttk.Button(finalize_total_frame, text="Finalize with Date", style='Finalize.TButton')
-        self.total_label = ttk.Label(finalize_total_frame, text=f"{gui_utils.CURRENCY_SYMBOL}0.00", font=("Arial", 14, "bold"), style='Total.TLabel')
+        self.total_label = ttk.Label(finalize_total_frame, text=gui_utils.format_money(0), font=("Arial", 14, "bold"), style='Total.TLabel')
         self.finalize_button.grid(row=0, column=1, padx=(5, 5), sticky="e")
         self.finalize_with_date_button.grid(row=0, column=2, padx=(5, 10), sticky="e")
         self.total_label.grid(row=0, column=3, padx=(0, 5), sticky="e")
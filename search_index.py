@@ -0,0 +1,174 @@
+import bisect
+import heapq
+from collections import defaultdict
+
+# --- Index Settings ---
+NGRAM_SIZE = 3
+FIELD_SEPARATOR = "\x00"  # Joins a key's fields; never typed, so matches cannot span two fields
+PREFIX_UPPER_BOUND = "\U0010ffff"  # Sorts after every character that can follow a prefix
+COMPLETION_LIMIT = 10
+RANKED_PREFIX_LENGTH = 2  # Prefixes up to this long keep their names in rank order, ready to complete
+
+
+class TrigramIndex:
+    """
+    Case-insensitive substring search over a few short text fields per key, held in memory.
+
+    Each key's fields are casefolded and joined, and every 3-character slice of the result maps
+    to the keys containing it. A query intersects the key sets of its own trigrams, rarest first,
+    and confirms the few remaining candidates with a plain substring test. Queries shorter than
+    a trigram fall back to scanning the stored texts, which is still memory-only.
+    """
+
+    def __init__(self):
+        self._texts = {}  # key -> casefolded, joined fields
+        self._postings = defaultdict(set)  # trigram -> keys whose text contains it
+
+    def add(self, key, *fields):
+        """Indexes key under fields (None is treated as empty), replacing any previous entry for key."""
+        self.remove(key)
+        text = FIELD_SEPARATOR.join((field or "").casefold() for field in fields)
+        self._texts[key] = text
+        for trigram in self._trigrams(text):
+            self._postings[trigram].add(key)
+
+    def remove(self, key):
+        text = self._texts.pop(key, None)
+        if text is None:
+            return
+        for trigram in self._trigrams(text):
+            keys = self._postings.get(trigram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[trigram]
+
+    def search(self, query):
+        """Returns the set of keys with query (case-insensitive) inside any one of their fields."""
+        query = query.casefold()
+        if not query:
+            return set(self._texts)
+        if len(query) < NGRAM_SIZE:
+            return {key for key, text in self._texts.items() if query in text}
+        postings = []
+        for trigram in self._trigrams(query):
+            keys = self._postings.get(trigram)
+            if not keys:
+                return set()
+            postings.append(keys)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for keys in postings[1:]:
+            candidates &= keys
+            if not candidates:
+                return candidates
+        # Every trigram present does not guarantee they are adjacent; confirm the real substring
+        return {key for key in candidates if query in self._texts[key]}
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __contains__(self, key):
+        return key in self._texts
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class PrefixIndex:
+    """
+    Case-insensitive exact and prefix lookup over a set of names, held in memory.
+
+    Names are kept as a sorted list of casefolded keys, so an exact lookup or the block of keys
+    sharing a prefix is found by binary search. Each name carries a rank (lower is better, e.g.
+    its position in a most-active-first list); completions return the best-ranked names of the
+    block, alphabetical among equal ranks. Short prefixes, whose blocks are the largest, also keep
+    their keys in that order, so completing one reads just the first few; longer prefixes pick
+    from their (small) block and are remembered until the index changes.
+    """
+
+    def __init__(self, ranked_names=()):
+        """ranked_names: iterable of names, best first; each name's rank is its position."""
+        self._entries = {}  # casefolded name -> (rank, name)
+        self._next_rank = 0  # Rank given to names added without one
+        for rank, name in enumerate(ranked_names):
+            self._entries.setdefault(name.casefold(), (rank, name))
+            self._next_rank = rank + 1  # Skipped case variants still use up a rank
+        self._keys = sorted(self._entries)
+        # Casefolded prefix of up to RANKED_PREFIX_LENGTH characters -> sorted (rank, key) of its block
+        self._ranked = defaultdict(list)
+        for key, (rank, _) in self._entries.items():
+            for prefix in self._ranked_prefixes(key):
+                self._ranked[prefix].append((rank, key))
+        for ranked_keys in self._ranked.values():
+            ranked_keys.sort()
+        self._completions = {}  # (casefolded prefix, limit) -> names, cleared on every change
+
+    @staticmethod
+    def _ranked_prefixes(key):
+        return [key[:length] for length in range(min(len(key), RANKED_PREFIX_LENGTH) + 1)]
+
+    def add(self, name, rank=None):
+        """Adds name (or replaces its case variant). Without a rank it goes after every other name."""
+        key = name.casefold()
+        if rank is None:
+            rank = self._next_rank
+        self._next_rank = max(self._next_rank, rank + 1)
+        if key in self._entries:
+            self._unrank(key)
+        else:
+            bisect.insort(self._keys, key)
+        self._entries[key] = (rank, name)
+        for prefix in self._ranked_prefixes(key):
+            bisect.insort(self._ranked[prefix], (rank, key))
+        self._completions.clear()
+
+    def remove(self, name):
+        key = name.casefold()
+        if key not in self._entries:
+            return
+        self._unrank(key)
+        del self._entries[key]
+        del self._keys[bisect.bisect_left(self._keys, key)]
+        self._completions.clear()
+
+    def _unrank(self, key):
+        """Drops key's current rank from the ranked short prefix lists."""
+        entry = (self._entries[key][0], key)
+        for prefix in self._ranked_prefixes(key):
+            ranked_keys = self._ranked[prefix]
+            del ranked_keys[bisect.bisect_left(ranked_keys, entry)]
+            if not ranked_keys:
+                del self._ranked[prefix]
+
+    def rank(self, name):
+        """Returns the rank of name (any case), or None if it is not indexed."""
+        entry = self._entries.get(name.casefold())
+        return entry[0] if entry is not None else None
+
+    def lookup(self, name):
+        """Returns the stored spelling of name (any case), or None if it is not indexed."""
+        entry = self._entries.get(name.casefold())
+        return entry[1] if entry is not None else None
+
+    def complete(self, prefix, limit=COMPLETION_LIMIT):
+        """Returns up to limit names starting with prefix (any case), best-ranked first."""
+        prefix = prefix.casefold()
+        if len(prefix) <= RANKED_PREFIX_LENGTH:
+            return [self._entries[key][1] for _, key in self._ranked.get(prefix, [])[:max(limit, 0)]]
+        cached = self._completions.get((prefix, limit))
+        if cached is not None:
+            return list(cached)  # The caller may change its copy
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + PREFIX_UPPER_BOUND, lo)
+        best = heapq.nsmallest(limit, self._keys[lo:hi], key=lambda key: (self._entries[key][0], key))
+        names = [self._entries[key][1] for key in best]
+        self._completions[(prefix, limit)] = names
+        return list(names)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, name):
+        return name.casefold() in self._entries
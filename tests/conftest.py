@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# The app modules live in the repository root (flat layout)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_connection
+import db_operations
+
+
+@pytest.fixture
+def dialog_errors(monkeypatch):
+    """Records the titles of error dialogs db_operations would show, instead of showing them."""
+    errors = []
+    monkeypatch.setattr(db_operations.messagebox, "showerror", lambda title, message, **kw: errors.append(title))
+    return errors
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch, dialog_errors):
+    """Points db_operations at a fresh, empty database file under tmp_path (not yet initialized)."""
+    path = tmp_path / "pos_system.db"
+    connections = db_connection.ConnectionManager(str(path), settings=db_operations._durability_settings)
+    monkeypatch.setattr(db_operations, "DATABASE_FILENAME", str(path))
+    monkeypatch.setattr(db_operations, "_connections", connections)
+    monkeypatch.setattr(db_operations, "_search_index_ready", db_operations._search_index_ready)
+    yield path
+    connections.close_all()
+
+
+@pytest.fixture
+def db(db_path):
+    """A temporary database migrated to SCHEMA_VERSION; yields the db_operations module."""
+    db_operations.initialize_db()
+    return db_operations
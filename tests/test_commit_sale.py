@@ -0,0 +1,40 @@
+import datetime
+
+import pytest
+
+WHEN = datetime.datetime(2025, 4, 1, 9, 30)
+
+
+def _counts(db):
+    with db._connections.reader() as conn:
+        return (conn.execute("SELECT COUNT(*) FROM Sales").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM SaleItems").fetchone()[0])
+
+
+def test_commit_sale_saves_header_and_items(db):
+    db.insert_product_to_db("Water", 2500)
+    sale_id = db.commit_sale(WHEN, "Ana", [{"name": "Water", "price": 2500, "quantity": 2},
+                                           {"name": "Loose Item", "price": 150, "quantity": 1}])
+
+    assert db.fetch_sales_page()[0][:4] == (sale_id, WHEN.isoformat(), 5150, "Ana")
+    assert _counts(db) == (1, 2)
+
+
+@pytest.mark.parametrize("bad_item", [
+    {"name": "Ice", "quantity": 1},  # Missing price
+    {"price": 1200, "quantity": 1},  # Missing name
+    {"name": "Ice", "price": 12.0, "quantity": 1},  # Price not in integer cents
+    {"name": "Ice", "price": 1200, "quantity": "2"},
+])
+def test_commit_sale_rejects_the_whole_sale_for_one_invalid_item(db, dialog_errors, bad_item):
+    items = [{"name": "Water", "price": 2500, "quantity": 2}, bad_item]
+
+    assert db.commit_sale(WHEN, "Ana", items) is None
+    assert _counts(db) == (0, 0)
+    assert dialog_errors == ["Invalid Sale"]
+
+
+def test_commit_sale_without_items_saves_nothing(db, dialog_errors):
+    assert db.commit_sale(WHEN, "Ana", []) is None
+    assert _counts(db) == (0, 0)
+    assert dialog_errors == []
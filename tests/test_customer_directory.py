@@ -0,0 +1,45 @@
+import pytest
+
+import customer_directory
+
+
+@pytest.fixture
+def directory(db, monkeypatch):
+    monkeypatch.setattr(db, "_customer_listeners", [])
+    for name, contact, address in [("Ana Cruz", "0917", "Rizal St"), ("Ben", None, "Cruz Ave"),
+                                   ("Carla", "0918", None), ("Dan Cruzado", "", "")]:
+        db.add_customer_to_db(name, contact, address)
+    directory = customer_directory.CustomerDirectory()
+    directory.load()
+    return directory
+
+
+def _expected_search(db, text):
+    """Brute force over the database list, which is newest first."""
+    text = text.casefold()
+    return [customer for customer in db.fetch_all_customers()
+            if any(text in (field or "").casefold() for field in customer[1:])]
+
+
+@pytest.mark.parametrize("text", ["", "cruz", "CRUZ", "09", "a", "zzz"])
+def test_search_lists_matches_newest_first(db, directory, text):
+    assert directory.customers() == db.fetch_all_customers()
+    assert directory.search(text) == _expected_search(db, text)
+
+
+def test_directory_follows_customer_changes(db, directory):
+    notified = []
+    directory.add_listener(lambda: notified.append(True))
+
+    db.add_customer_to_db("Eve Cruz", "0919", None)
+    ana_id = db.fetch_customer_by_name("Ana Cruz")[0]
+    db.update_customer_in_db(ana_id, "Ana Santos", "0917", "Rizal St")
+    db.delete_customer_from_db(db.fetch_customer_by_name("Ben")[0])
+
+    assert len(notified) == 3
+    assert directory.customers() == db.fetch_all_customers()
+    assert [customer[1] for customer in directory.search("cruz")] == ["Eve Cruz", "Dan Cruzado"]
+    assert directory.search("santos") == [(ana_id, "Ana Santos", "0917", "Rizal St")]
+    assert directory.search("ben") == []
+    assert directory.lookup_name("ana santos") == "Ana Santos"
+    assert directory.lookup_name("Ana Cruz") is None
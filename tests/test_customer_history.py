@@ -0,0 +1,82 @@
+import datetime
+
+import pytest
+
+PRICES = {"Water": 2500, "Ice": 1200, "Cup": 5}
+
+# (timestamp, customer, [(product, quantity)]); Ana has two sales at the same time and a back-dated one
+SALES = [
+    ("2025-03-01T09:00:00", "Ana", [("Water", 1), ("Ice", 2)]),
+    ("2025-03-01T09:00:00", "Ben", [("Water", 9)]),
+    ("2025-03-01T09:00:00", "Ana", [("Cup", 3)]),
+    ("2025-03-02T10:00:00", "Ana", [("Ice", 1), ("Water", 2), ("Cup", 1)]),
+    ("2025-02-27T08:00:00", "Ana", [("Water", 1)]),
+    ("2025-03-03T11:00:00", "ana", [("Ice", 1)]),  # Linked to Ana regardless of case
+]
+
+
+@pytest.fixture
+def customers(db):
+    for name, price in PRICES.items():
+        db.insert_product_to_db(name, price)
+    db.add_customer_to_db("Ana", None, None)
+    db.add_customer_to_db("Ben", None, None)
+    db.add_customer_to_db("Carla", None, None)
+    for timestamp, customer, items in SALES:
+        db.commit_sale(datetime.datetime.fromisoformat(timestamp), customer,
+                       [{"name": name, "price": PRICES[name], "quantity": quantity} for name, quantity in items])
+    return {name: db.fetch_customer_by_name(name)[0] for name in ("Ana", "Ben", "Carla")}
+
+
+def _expected_items(customer):
+    """Newest first; items of one timestamp in reverse insertion (SaleItemID) order."""
+    items = [(timestamp, order, name, quantity)
+             for order, (timestamp, sale_customer, name, quantity) in enumerate(
+                 (timestamp, sale_customer, name, quantity)
+                 for timestamp, sale_customer, items in SALES for name, quantity in items)
+             if sale_customer.casefold() == customer.casefold()]
+    return [(timestamp, name, quantity, PRICES[name], PRICES[name] * quantity)
+            for timestamp, _, name, quantity in sorted(items, reverse=True)]
+
+
+def _all_pages(db, customer_id, limit):
+    pages, after_key = [], None
+    while True:
+        page = db.fetch_customer_purchase_page(customer_id, after_key, limit)
+        assert len(page) <= limit
+        pages.append(page)
+        if len(page) < limit:
+            return pages
+        after_key = (page[-1][0], page[-1][5])
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 8, 9])
+def test_purchase_pages_cover_every_item_once_in_order(db, customers, limit):
+    pages = _all_pages(db, customers["Ana"], limit)
+
+    rows = [row for page in pages for row in page]
+    assert [row[:5] for row in rows] == _expected_items("Ana")
+    assert len(pages) == len(rows) // limit + 1
+    assert [row[5] for row in rows if row[0] == "2025-03-01T09:00:00"] == \
+           sorted((row[5] for row in rows if row[0] == "2025-03-01T09:00:00"), reverse=True)
+
+
+def test_purchase_pages_show_current_product_names(db, customers):
+    db.update_product_in_db("Ice", "Tube Ice", 1200)
+    db.delete_product_from_db("Cup")  # Kept as a name snapshot
+
+    names = [row[1] for row in db.fetch_customer_purchase_page(customers["Ana"], limit=100)]
+    assert names == [{"Ice": "Tube Ice"}.get(name, name) for _, name, _, _, _ in _expected_items("Ana")]
+
+
+def test_purchase_summary(db, customers):
+    ana_total = sum(subtotal for *_, subtotal in _expected_items("Ana"))
+    # Water and Ice are both bought 4 times; Ice was bought most recently
+    assert db.fetch_customer_purchase_summary(customers["Ana"]) == (ana_total, 5, "2025-03-03T11:00:00", "Ice")
+    assert db.fetch_customer_purchase_summary(customers["Ben"]) == (22500, 1, "2025-03-01T09:00:00", "Water")
+    assert db.fetch_customer_purchase_summary(customers["Carla"]) == (0, 0, None, None)
+    assert db.fetch_customer_purchase_page(customers["Carla"]) == []
+
+    # An older sale still counts towards the favourite, but not the last visit
+    db.commit_sale(datetime.datetime(2025, 1, 5, 12), "Ana", [{"name": "Water", "price": 2500, "quantity": 1}])
+    assert db.fetch_customer_purchase_summary(customers["Ana"]) == (ana_total + 2500, 6, "2025-03-03T11:00:00", "Water")
@@ -0,0 +1,160 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db_connection
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = db_connection.ConnectionManager(str(tmp_path / "pool.db"), max_readers=2)
+    with manager.writer() as conn:
+        conn.execute("CREATE TABLE Items (Name TEXT)")
+        conn.commit()
+    yield manager
+    manager.close_all()
+
+
+def _in_thread(func):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def _borrow_reader(manager):
+    with manager.reader() as conn:
+        conn.execute("SELECT 1")
+    return conn
+
+
+def _is_open(conn):
+    try:
+        conn.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return False
+    return True
+
+
+def test_connections_are_reused(manager):
+    with manager.writer() as first:
+        pass
+    with manager.writer() as second:
+        assert second is first
+    with manager.reader() as first_reader, manager.reader() as second_reader:
+        assert first_reader is second_reader  # One reader per thread
+        assert first_reader is not first
+
+
+def test_readers_see_committed_writes_and_cannot_write(manager):
+    with manager.writer() as conn:
+        conn.execute("INSERT INTO Items VALUES ('Water')")
+        conn.commit()
+    with manager.reader() as conn:
+        assert conn.execute("SELECT Name FROM Items").fetchall() == [("Water",)]
+        assert conn.execute("PRAGMA foreign_keys").fetchone() == (1,)
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO Items VALUES ('Ice')")
+
+
+def test_each_thread_gets_its_own_reader_until_the_pool_is_full(manager):
+    with manager.reader() as main_reader:
+        pass
+
+    other_reader = _in_thread(lambda: _borrow_reader(manager))
+    assert other_reader is not main_reader
+
+    # The other thread has exited, so its slot is freed (and its connection closed) for the next one
+    pooled = _in_thread(lambda: _borrow_reader(manager))
+    assert not _is_open(other_reader)
+    assert _is_open(pooled)
+
+    blocker, release = threading.Event(), threading.Event()
+
+    def hold_reader():
+        with manager.reader():
+            blocker.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold_reader)
+    holder.start()
+    blocker.wait()
+
+    transient = _in_thread(lambda: _borrow_reader(manager))  # Main thread and holder fill the pool of two
+    release.set()
+    holder.join()
+    assert not _is_open(transient)  # Closed once the block ends
+    assert _is_open(main_reader)
+
+
+def test_writer_rolls_back_on_error_and_on_an_uncommitted_block(manager):
+    with pytest.raises(RuntimeError):
+        with manager.writer() as conn:
+            conn.execute("INSERT INTO Items VALUES ('Water')")
+            raise RuntimeError("failed mid-transaction")
+    with manager.writer() as conn:
+        assert not conn.in_transaction
+        conn.execute("INSERT INTO Items VALUES ('Ice')")  # Forgot to commit
+    with manager.writer() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM Items").fetchone() == (0,)
+
+
+def test_close_all_reopens_lazily(manager):
+    with manager.writer() as writer, manager.reader() as reader:
+        pass
+    manager.close_all()
+    assert not _is_open(writer)
+    assert not _is_open(reader)
+    with manager.writer() as new_writer, manager.reader() as new_reader:
+        assert new_writer is not writer and new_reader is not reader
+        assert new_reader.execute("SELECT COUNT(*) FROM Items").fetchone() == (0,)
+
+
+def _write_config(tmp_path, text):
+    config_path = tmp_path / "pos_config.ini"
+    config_path.write_text(text, encoding="utf-8")
+    return str(config_path)
+
+
+def test_missing_config_uses_the_default_profile(tmp_path):
+    profile, settings = db_connection.load_durability_settings(str(tmp_path / "missing.ini"))
+    assert profile == db_connection.DEFAULT_PROFILE
+    assert settings == db_connection.DURABILITY_PROFILES[db_connection.DEFAULT_PROFILE]
+
+
+def test_config_picks_a_profile_and_overrides_settings(tmp_path):
+    config_path = _write_config(tmp_path, "[database]\nprofile = SAFE\ncache_size = -16000 ; KiB\n"
+                                          "temp_store = memory\nmmap_size = lots\n")
+    profile, settings = db_connection.load_durability_settings(config_path)
+
+    assert profile == "safe"
+    assert settings == dict(db_connection.DURABILITY_PROFILES["safe"], cache_size=-16000, temp_store="MEMORY")
+    assert db_connection.DURABILITY_PROFILES["safe"]["cache_size"] == -8000  # The profile itself is untouched
+
+
+@pytest.mark.parametrize("text", ["[database]\nprofile = turbo\n", "[other]\nprofile = fast\n", "not an ini file\n"])
+def test_unknown_profile_or_unreadable_config_falls_back_to_the_default(tmp_path, text):
+    profile, settings = db_connection.load_durability_settings(_write_config(tmp_path, text))
+    assert profile == db_connection.DEFAULT_PROFILE
+    assert settings == db_connection.DURABILITY_PROFILES[db_connection.DEFAULT_PROFILE]
+
+
+@pytest.mark.parametrize("profile", list(db_connection.DURABILITY_PROFILES))
+def test_profile_pragmas_are_applied_to_every_connection(tmp_path, profile):
+    settings = db_connection.DURABILITY_PROFILES[profile]
+    manager = db_connection.ConnectionManager(str(tmp_path / "pool.db"), settings=settings)
+    synchronous = {"OFF": 0, "NORMAL": 1, "FULL": 2}[settings["synchronous"]]
+    temp_store = {"DEFAULT": 0, "FILE": 1, "MEMORY": 2}[settings["temp_store"]]
+    try:
+        with manager.writer() as writer, manager.reader() as reader:
+            assert writer.execute("PRAGMA journal_mode").fetchone()[0].upper() == settings["journal_mode"]
+            for conn in (writer, reader):
+                assert conn.execute("PRAGMA synchronous").fetchone() == (synchronous,)
+                assert conn.execute("PRAGMA cache_size").fetchone() == (settings["cache_size"],)
+                assert conn.execute("PRAGMA temp_store").fetchone() == (temp_store,)
+                assert conn.execute("PRAGMA busy_timeout").fetchone() == (settings["busy_timeout"],)
+    finally:
+        manager.close_all()
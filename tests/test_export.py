@@ -0,0 +1,112 @@
+import csv
+import datetime
+
+import pytest
+
+import db_operations
+
+PRICES = {"Water": 2500, "Ice": 1250, "Cup": 5}
+
+# (timestamp, customer, [(product, quantity)])
+SALES = [
+    ("2025-03-01T09:00:00", "Ana", [("Water", 1), ("Ice", 2)]),
+    ("2025-03-01T09:00:00", "Ben", [("Cup", 3)]),
+    ("2025-03-02T10:00:00", "Ana", [("Water", 2), ("Cup", 1), ("Ice", 1)]),
+    ("2025-02-27T08:00:00", "Carla", [("Ice", 4)]),
+    ("2025-03-03T11:00:00", "Ben", [("Water", 1)]),
+    ("2025-03-03T11:00:00", "Ana", [("Cup", 20), ("Water", 3)]),
+    ("2025-03-04T12:00:00", "Carla", [("Ice", 1), ("Water", 1)]),
+]
+LINE_ITEM_COUNT = sum(len(items) for _, _, items in SALES)
+WHOLE_RANGE = {"start_dt": "2025-02-01T00:00:00", "end_dt_exclusive": "2025-04-01T00:00:00"}
+
+
+@pytest.fixture
+def sale_ids(db):
+    for name, price in PRICES.items():
+        db.insert_product_to_db(name, price)
+    return [db.commit_sale(datetime.datetime.fromisoformat(timestamp), customer,
+                           [{"name": name, "price": PRICES[name], "quantity": quantity} for name, quantity in items])
+            for timestamp, customer, items in SALES]
+
+
+def _export(tmp_path, kind, filters=None, delimiter=",", batch_size=db_operations.EXPORT_BATCH_SIZE):
+    """Exports to a file; returns (rows written, progress reports, rows read back without the header)."""
+    file_path = tmp_path / f"{kind}-{batch_size}.csv"
+    progress = []
+    written = db_operations.export_rows_to_file(kind, file_path, filters, delimiter=delimiter,
+                                                progress_callback=progress.append, batch_size=batch_size)
+    with open(file_path, newline="", encoding="utf-8") as export_file:
+        rows = list(csv.reader(export_file, delimiter=delimiter))
+    assert rows[0] == list(db_operations.EXPORT_HEADERS[kind])
+    return written, progress, rows[1:]
+
+
+def _expected_sales(sale_ids):
+    """Sales export rows newest first, numbered oldest first like the history list."""
+    ordered = sorted((SALES[index][0], sale_id, index) for index, sale_id in enumerate(sale_ids))
+    rows = [[str(sale_id), str(receipt_no), timestamp, SALES[index][1],
+             db_operations._cents_text(sum(PRICES[name] * quantity for name, quantity in SALES[index][2]))]
+            for receipt_no, (timestamp, sale_id, index) in enumerate(ordered, 1)]
+    return rows[::-1]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3, len(SALES), len(SALES) + 1])
+def test_sales_export_writes_every_row_across_batches(tmp_path, sale_ids, batch_size):
+    written, progress, rows = _export(tmp_path, "sales", batch_size=batch_size)
+
+    assert rows == _expected_sales(sale_ids)
+    assert written == len(SALES)
+    # One report per non-empty batch, counting every row written so far
+    assert progress == [min(count, len(SALES)) for count in range(batch_size, len(SALES) + batch_size, batch_size)]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 5, LINE_ITEM_COUNT])
+def test_line_item_export_writes_every_item_across_batches(tmp_path, sale_ids, batch_size):
+    written, progress, rows = _export(tmp_path, "line_items", delimiter="\t", batch_size=batch_size)
+
+    assert written == len(rows) == LINE_ITEM_COUNT
+    assert progress[-1] == LINE_ITEM_COUNT
+    assert len(progress) == -(-LINE_ITEM_COUNT // batch_size)
+    assert rows == _export(tmp_path, "line_items", delimiter="\t")[2]  # Same rows as a single batch
+    expected = sorted((str(sale_ids[index]), name, str(quantity), db_operations._cents_text(PRICES[name]),
+                       db_operations._cents_text(PRICES[name] * quantity))
+                      for index, (_, _, items) in enumerate(SALES) for name, quantity in items)
+    assert sorted((row[0], row[3], row[4], row[5], row[6]) for row in rows) == expected
+
+
+@pytest.mark.parametrize("batch_size", [1, 2])
+def test_product_summary_export_across_batches(tmp_path, sale_ids, batch_size):
+    written, progress, rows = _export(tmp_path, "product_summary", WHOLE_RANGE, batch_size=batch_size)
+
+    totals = {}
+    for _, _, items in SALES:
+        for name, quantity in items:
+            totals[name] = totals.get(name, 0) + quantity
+    assert written == len(rows) == len(PRICES)
+    assert progress == list(range(batch_size, len(PRICES), batch_size)) + [len(PRICES)]
+    assert sorted(rows) == sorted([name, str(quantity), db_operations._cents_text(PRICES[name] * quantity)]
+                                  for name, quantity in totals.items())
+
+
+def test_filtered_export_keeps_history_receipt_numbers(tmp_path, db, sale_ids):
+    written, _, rows = _export(tmp_path, "sales", {"customer_prefix": "ana"}, batch_size=2)
+
+    page = db.fetch_sales_page(limit=len(SALES), filters={"customer_prefix": "ana"})
+    assert written == len(page) == 3
+    assert [(int(row[0]), int(row[1])) for row in rows] == [(row[0], row[4]) for row in page]
+
+
+def test_empty_export_writes_only_the_header(tmp_path, db):
+    assert _export(tmp_path, "sales", batch_size=2) == (0, [], [])
+
+
+@pytest.mark.parametrize("kind, filters", [
+    ("receipts", None),
+    ("product_summary", None),
+    ("product_summary", {"start_dt": "2025-03-01T00:00:00"}),
+    ("sales", {"customer": "Ana"}),
+])
+def test_export_rejects_bad_arguments(tmp_path, db, kind, filters):
+    with pytest.raises(ValueError):
+        db_operations.export_rows_to_file(kind, tmp_path / "export.csv", filters)
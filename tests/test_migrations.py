@@ -0,0 +1,214 @@
+import sqlite3
+
+import pytest
+
+import db_operations
+
+# Tables as created by the app before versioned migrations (user_version 0)
+BASELINE_SCHEMA = """
+    CREATE TABLE Products (
+        ProductID INTEGER PRIMARY KEY AUTOINCREMENT,
+        ProductName TEXT NOT NULL UNIQUE,
+        Price REAL NOT NULL CHECK (Price >= 0)
+    );
+    CREATE TABLE Sales (
+        SaleID INTEGER PRIMARY KEY AUTOINCREMENT,
+        SaleTimestamp TEXT NOT NULL,
+        TotalAmount REAL NOT NULL CHECK (TotalAmount >= 0),
+        CustomerName TEXT DEFAULT 'N/A'
+    );
+    CREATE TABLE SaleItems (
+        SaleItemID INTEGER PRIMARY KEY AUTOINCREMENT,
+        SaleID INTEGER NOT NULL,
+        ProductName TEXT NOT NULL,
+        Quantity INTEGER NOT NULL CHECK (Quantity > 0),
+        PriceAtSale REAL NOT NULL,
+        Subtotal REAL NOT NULL,
+        FOREIGN KEY (SaleID) REFERENCES Sales (SaleID) ON DELETE CASCADE
+    );
+    CREATE TABLE Customers (
+        CustomerID INTEGER PRIMARY KEY AUTOINCREMENT,
+        CustomerName TEXT NOT NULL UNIQUE COLLATE NOCASE,
+        ContactNumber TEXT,
+        Address TEXT,
+        DateAdded TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+BASELINE_ROWS = """
+    INSERT INTO Products VALUES (1, 'Water', 20.0), (2, 'Ice', 12.5);
+    INSERT INTO Customers (CustomerID, CustomerName) VALUES (1, 'Old Cust');
+    INSERT INTO Sales VALUES (1, '2024-05-01T10:00:00', 52.5, 'old cust'),
+                             (2, '2024-05-02T09:30:00', 0.1, 'N/A');
+    INSERT INTO SaleItems VALUES (1, 1, 'Water', 2, 20.0, 40.0),
+                                 (2, 1, 'Ice', 1, 12.5, 12.5),
+                                 (3, 2, 'Discontinued', 1, 0.1, 0.1);
+"""
+
+
+def _create_database(path, script):
+    conn = sqlite3.connect(path)
+    conn.executescript(script)
+    conn.commit()
+    conn.close()
+
+
+def _query(sql, params=()):
+    with db_operations._connections.reader() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def test_new_database_is_created_at_current_version(db_path):
+    db_operations.initialize_db()
+
+    assert _query("PRAGMA user_version") == [(db_operations.SCHEMA_VERSION,)]
+    assert db_operations.fetch_products_from_db() == db_operations.DEFAULT_PRODUCTS
+    assert all(ok for ok, plan in db_operations.check_report_query_plans().values())
+
+
+def test_baseline_database_migrates_to_current_version(db_path):
+    _create_database(db_path, BASELINE_SCHEMA + BASELINE_ROWS)
+
+    db_operations.initialize_db()
+
+    assert _query("PRAGMA user_version") == [(db_operations.SCHEMA_VERSION,)]
+    assert db_operations.fetch_products_from_db() == {"Water": 2000, "Ice": 1250}
+    assert _query("SELECT SaleID, TotalCents, CustomerID FROM Sales ORDER BY SaleID") == [(1, 5250, 1), (2, 10, None)]
+    assert _query("SELECT SaleItemID, ProductID, ProductName, PriceAtSaleCents, SubtotalCents "
+                  "FROM SaleItems ORDER BY SaleItemID") == [
+        (1, 1, None, 2000, 4000),
+        (2, 2, None, 1250, 1250),
+        (3, None, "Discontinued", 10, 10),  # No such product: the name is kept as a snapshot
+    ]
+    assert _query("SELECT SaleDate, RevenueCents, SaleCount, ItemCount FROM DailySales ORDER BY SaleDate") == [
+        ("2024-05-01", 5250, 1, 3),
+        ("2024-05-02", 10, 1, 1),
+    ]
+    assert _query("PRAGMA foreign_key_check") == []
+
+
+def test_database_missing_legacy_columns_is_migrated(db_path):
+    _create_database(db_path, """
+        CREATE TABLE Products (ProductID INTEGER PRIMARY KEY AUTOINCREMENT, ProductName TEXT NOT NULL UNIQUE,
+                               Price REAL NOT NULL);
+        CREATE TABLE Sales (SaleID INTEGER PRIMARY KEY AUTOINCREMENT, SaleTimestamp TEXT NOT NULL,
+                            TotalAmount REAL NOT NULL);
+        CREATE TABLE SaleItems (SaleItemID INTEGER PRIMARY KEY AUTOINCREMENT, SaleID INTEGER NOT NULL,
+                                ProductName TEXT NOT NULL, Quantity INTEGER NOT NULL, PriceAtSale REAL NOT NULL,
+                                Subtotal REAL NOT NULL,
+                                FOREIGN KEY (SaleID) REFERENCES Sales (SaleID) ON DELETE CASCADE);
+        CREATE TABLE Customers (CustomerID INTEGER PRIMARY KEY AUTOINCREMENT,
+                                CustomerName TEXT NOT NULL UNIQUE COLLATE NOCASE);
+        INSERT INTO Products VALUES (1, 'Water', 20.0);
+        INSERT INTO Sales VALUES (1, '2024-05-01T10:00:00', 40.0);
+        INSERT INTO SaleItems VALUES (1, 1, 'Water', 2, 20.0, 40.0);
+        INSERT INTO Customers VALUES (1, 'Old Cust');
+    """)
+
+    db_operations.initialize_db()
+
+    assert _query("PRAGMA user_version") == [(db_operations.SCHEMA_VERSION,)]
+    assert _query("SELECT SaleID, TotalCents, CustomerName FROM Sales") == [(1, 4000, "N/A")]
+    assert db_operations.fetch_all_customers() == [(1, "Old Cust", None, None)]
+
+
+def test_current_database_is_not_migrated_again(db_path):
+    _create_database(db_path, BASELINE_SCHEMA + BASELINE_ROWS)
+    db_operations.initialize_db()
+
+    with db_operations._connections.writer() as conn:
+        assert db_operations.migrate_schema(conn) == []
+
+
+def test_interrupted_migration_resumes_at_failed_step(db_path, monkeypatch):
+    _create_database(db_path, BASELINE_SCHEMA + BASELINE_ROWS)
+    migrations = db_operations.SCHEMA_MIGRATIONS
+    failing_version = migrations[3][0]
+
+    def fail(cursor):
+        raise sqlite3.OperationalError("simulated crash")
+
+    monkeypatch.setattr(db_operations, "SCHEMA_MIGRATIONS",
+                        [(version, description, fail if version == failing_version else step)
+                         for version, description, step in migrations])
+    with pytest.raises(sqlite3.OperationalError):
+        db_operations.initialize_db()
+    with db_operations._connections.writer() as conn:  # The pooled writer is reused by the app
+        assert conn.execute("PRAGMA foreign_keys").fetchone() == (1,)
+        assert not conn.in_transaction
+    db_operations.close_connections()  # As if the app had exited
+    assert _query("PRAGMA user_version") == [(failing_version - 1,)]
+
+    monkeypatch.setattr(db_operations, "SCHEMA_MIGRATIONS", migrations)
+    db_operations.initialize_db()
+    assert _query("PRAGMA user_version") == [(db_operations.SCHEMA_VERSION,)]
+    assert _query("SELECT TotalCents FROM Sales ORDER BY SaleID") == [(5250,), (10,)]
+
+
+def _migrated_baseline(db_path):
+    _create_database(db_path, BASELINE_SCHEMA + BASELINE_ROWS)
+    db_operations.initialize_db()
+
+
+def test_sale_items_are_rebuilt_to_reference_products(db_path):
+    _migrated_baseline(db_path)
+
+    columns = [row[1] for row in _query("PRAGMA table_info(SaleItems)")]
+    assert columns == ["SaleItemID", "SaleID", "ProductID", "ProductName", "Quantity", "PriceAtSaleCents",
+                       "SubtotalCents"]
+    foreign_keys = {(row[2], row[3], row[6]) for row in _query("PRAGMA foreign_key_list(SaleItems)")}
+    assert foreign_keys == {("Sales", "SaleID", "CASCADE"), ("Products", "ProductID", "SET NULL")}
+    with pytest.raises(sqlite3.IntegrityError):  # Exactly one of ProductID and the name snapshot is set
+        with db_operations._connections.writer() as conn:
+            conn.execute("INSERT INTO SaleItems (SaleID, ProductID, ProductName, Quantity, PriceAtSaleCents, "
+                         "SubtotalCents) VALUES (1, 1, 'Water', 1, 2000, 2000)")
+
+
+def test_product_renames_and_deletes_after_migration(db_path):
+    _migrated_baseline(db_path)
+
+    assert db_operations.update_product_in_db("Water", "Spring Water", 2200)
+    assert sorted(db_operations.fetch_sale_items_from_db(1)) == [("Ice", 1, 1250, 1250),
+                                                                  ("Spring Water", 2, 2000, 4000)]
+
+    assert db_operations.delete_product_from_db("Ice")
+    assert _query("SELECT SaleItemID, ProductID, ProductName FROM SaleItems ORDER BY SaleItemID") == [
+        (1, 1, None),
+        (2, None, "Ice"),  # Deleted: the name is kept as a snapshot
+        (3, None, "Discontinued"),
+    ]
+    # A new product reusing a snapshot name does not claim the old items
+    assert db_operations.insert_product_to_db("Ice", 1500)
+    assert sorted(db_operations.fetch_sale_items_from_db(1)) == [("Ice", 1, 1250, 1250),
+                                                                  ("Spring Water", 2, 2000, 4000)]
+    assert _query("SELECT ProductID FROM SaleItems WHERE SaleItemID = 2") == [(None,)]
+
+
+def test_sales_are_linked_to_customers_by_id(db_path):
+    _create_database(db_path, BASELINE_SCHEMA + BASELINE_ROWS + """
+        INSERT INTO Customers (CustomerID, CustomerName) VALUES (2, 'Bea');
+        INSERT INTO Sales VALUES (3, '2024-05-03T08:00:00', 20.0, 'BEA'),
+                                 (4, '2024-05-03T09:00:00', 20.0, 'Never Registered');
+    """)
+    db_operations.initialize_db()
+
+    assert _query("SELECT SaleID, CustomerID, CustomerName FROM Sales ORDER BY SaleID") == [
+        (1, 1, "old cust"), (2, None, "N/A"), (3, 2, "BEA"), (4, None, "Never Registered")]
+    assert ("Customers", "CustomerID", "SET NULL") in {
+        (row[2], row[3], row[6]) for row in _query("PRAGMA foreign_key_list(Sales)")}
+    assert _query("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'Sales' "
+                  "AND name = 'idx_sales_customer_id'") == [("idx_sales_customer_id",)]
+
+
+def test_customer_renames_and_deletes_after_migration(db_path):
+    _migrated_baseline(db_path)
+
+    assert db_operations.update_customer_in_db(1, "Renamed Cust", None, None)
+    assert _query("SELECT SaleID, CustomerID, CustomerName FROM Sales ORDER BY SaleID") == [
+        (1, 1, "Renamed Cust"), (2, None, "N/A")]
+
+    assert db_operations.delete_customer_from_db(1)
+    # The sale loses its link but keeps the name it was last made under
+    assert _query("SELECT SaleID, CustomerID, CustomerName FROM Sales ORDER BY SaleID") == [
+        (1, None, "Renamed Cust"), (2, None, "N/A")]
+    assert db_operations.fetch_sales_page()[-1][3] == "Renamed Cust"
@@ -0,0 +1,63 @@
+import pytest
+
+from gui_utils import CURRENCY_SYMBOL, format_amount, format_money, parse_money
+
+
+@pytest.mark.parametrize("text, cents", [
+    ("12", 1200),
+    ("12.5", 1250),
+    ("12.50", 1250),
+    ("0.01", 1),
+    (" 7 ", 700),
+    (f"{CURRENCY_SYMBOL}12.50", 1250),
+    (f" {CURRENCY_SYMBOL} 1,234.50 ", 123450),  # Currency symbol and thousands separators are ignored
+    ("1,000,000", 100000000),
+    (".5", 50),
+    ("0", 0),
+    ("-0", 0),
+    (12.5, 1250),  # Non-text input is parsed from its str()
+    (3, 300),
+])
+def test_parse_money(text, cents):
+    assert parse_money(text) == cents
+
+
+@pytest.mark.parametrize("text, cents", [
+    ("12.344", 1234),
+    ("12.345", 1235),  # Half rounds up...
+    ("0.005", 1),
+    ("0.00499", 0),
+    ("-12.345", -1235),  # ...and away from zero for negative amounts
+    ("-12.344", -1234),
+    ("-0.005", -1),
+    ("2.675", 268),  # Exact decimal arithmetic, unlike round(2.675 * 100)
+    ("1.005", 101),
+])
+def test_parse_money_rounds_half_up_to_the_cent(text, cents):
+    assert parse_money(text) == cents
+
+
+@pytest.mark.parametrize("text", ["", "   ", "abc", "12.5.1", "1 2", "12-", "--1", CURRENCY_SYMBOL,
+                                  "nan", "NaN", "inf", "-Infinity", "12..5", "$12"])
+def test_parse_money_rejects_invalid_input(text):
+    with pytest.raises(ValueError):
+        parse_money(text)
+
+
+@pytest.mark.parametrize("cents, amount, money", [
+    (0, "0.00", f"{CURRENCY_SYMBOL}0.00"),
+    (5, "0.05", f"{CURRENCY_SYMBOL}0.05"),
+    (1250, "12.50", f"{CURRENCY_SYMBOL}12.50"),
+    (123456789, "1234567.89", f"{CURRENCY_SYMBOL}1234567.89"),  # No thousands separators
+    (-5, "-0.05", f"-{CURRENCY_SYMBOL}0.05"),  # Sign goes before the currency symbol
+    (-123450, "-1234.50", f"-{CURRENCY_SYMBOL}1234.50"),
+])
+def test_format_amount_and_money(cents, amount, money):
+    assert format_amount(cents) == amount
+    assert format_money(cents) == money
+
+
+@pytest.mark.parametrize("cents", [0, 1, 99, 100, 101, 1999, 123456789, -1, -99, -100, -123456789])
+def test_formatted_money_parses_back_to_the_same_cents(cents):
+    assert parse_money(format_money(cents)) == cents
+    assert parse_money(format_amount(cents)) == cents
@@ -0,0 +1,43 @@
+import pytest
+
+import db_operations
+
+
+def _drop_index(db, index_name):
+    with db._connections.writer() as conn:
+        conn.execute(f"DROP INDEX {index_name}")
+        conn.commit()
+
+
+def test_report_queries_use_their_indexes(db):
+    results = db.check_report_query_plans()
+
+    assert set(results) == {label for label, _, _ in db_operations.REPORT_QUERY_PLAN_CHECKS}
+    assert {label: plan for label, (ok, plan) in results.items() if not ok} == {}
+
+
+@pytest.mark.parametrize("index_name", ["idx_sales_timestamp", "idx_sales_customer_timestamp",
+                                        "idx_saleitems_sale_product"])
+def test_missing_index_fails_the_queries_expecting_it(db, index_name):
+    db.check_report_query_plans()  # Plans cached by the pooled reader must not hide the change
+    _drop_index(db, index_name)
+
+    results = db.check_report_query_plans()
+
+    expecting = {label for label, _, indexes in db_operations.REPORT_QUERY_PLAN_CHECKS if index_name in indexes}
+    assert expecting
+    assert {label for label, (ok, _) in results.items() if not ok} == expecting
+    assert not any(index_name in line for label in expecting for line in results[label][1])
+
+
+@pytest.mark.parametrize("index_name, label, full_scan", [
+    ("idx_sales_timestamp", "fetch_sales_stats (totals)", "SCAN Sales"),
+    ("idx_saleitems_sale_product", "fetch_sales_stats (items)", "SCAN SaleItems"),
+])
+def test_missing_index_shows_a_full_scan(db, index_name, label, full_scan):
+    _drop_index(db, index_name)
+
+    ok, plan = db.check_report_query_plans()[label]
+
+    assert not ok
+    assert any(line.startswith(full_scan) for line in plan)
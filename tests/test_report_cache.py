@@ -0,0 +1,120 @@
+import datetime
+
+import pytest
+
+# Ranges that ended before today are cached; these are far enough in the past
+JANUARY = ("2025-01-01T00:00:00", "2025-02-01T00:00:00")
+FEBRUARY = ("2025-02-01T00:00:00", "2025-03-01T00:00:00")
+
+
+def _sell(db, when, name="Water", quantity=1, customer="Ana"):
+    sale_id = db.commit_sale(datetime.datetime.fromisoformat(when), customer,
+                             [{"name": name, "price": 2500, "quantity": quantity}])
+    assert sale_id is not None
+    return sale_id
+
+
+def _cached(db):
+    """The (QueryName, RangeStart, RangeEnd, CustomerName) keys currently in ReportCache."""
+    with db._connections.reader() as conn:
+        return set(conn.execute("SELECT QueryName, RangeStart, RangeEnd, CustomerName FROM ReportCache"))
+
+
+@pytest.fixture
+def cached_reports(db):
+    """Sales in January and February, with both months' stats and product summaries cached."""
+    db.insert_product_to_db("Water", 2500)
+    db.add_customer_to_db("Ana")
+    sales = [_sell(db, "2025-01-10T09:00:00", quantity=2), _sell(db, "2025-02-10T09:00:00")]
+    for month in (JANUARY, FEBRUARY):
+        db.fetch_sales_stats(*month)
+        db.fetch_product_summary_by_date_range(*month)
+    db.fetch_sales_stats(*JANUARY, "Ana")
+    assert _cached(db) == {
+        ("sales_stats", *JANUARY, ""), ("product_summary", *JANUARY, ""), ("sales_stats", *JANUARY, "Ana"),
+        ("sales_stats", *FEBRUARY, ""), ("product_summary", *FEBRUARY, ""),
+    }
+    return sales
+
+
+def test_closed_ranges_are_served_from_the_cache(db, cached_reports, monkeypatch):
+    def fail(*args):
+        raise AssertionError("recomputed a cached range")
+
+    monkeypatch.setattr(db, "_compute_sales_stats", fail)
+    monkeypatch.setattr(db, "_fetch_product_summary", fail)
+    assert db.fetch_sales_stats(*JANUARY) == (5000, 2, 1)
+    assert db.fetch_product_summary_by_date_range(*FEBRUARY) == [("Water", 1, 2500)]
+
+
+def test_open_ranges_are_not_cached(db):
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    db.fetch_sales_stats("2025-01-01T00:00:00", f"{tomorrow.isoformat()}T00:00:00")
+    assert _cached(db) == set()
+
+
+def test_new_sale_invalidates_only_its_ranges(db, cached_reports):
+    _sell(db, "2025-01-20T09:00:00")  # Back-dated into January
+
+    assert _cached(db) == {("sales_stats", *FEBRUARY, ""), ("product_summary", *FEBRUARY, "")}
+    assert db.fetch_sales_stats(*JANUARY) == (7500, 3, 2)
+    assert db.fetch_product_summary_by_date_range(*JANUARY) == [("Water", 3, 7500)]
+
+
+def test_deleted_sale_invalidates_its_ranges(db, cached_reports):
+    assert db.delete_sale_from_db(cached_reports[1])
+
+    assert _cached(db) == {("sales_stats", *JANUARY, ""), ("product_summary", *JANUARY, ""),
+                           ("sales_stats", *JANUARY, "Ana")}
+    assert db.fetch_sales_stats(*FEBRUARY) == (0, 0, 0)
+
+
+def test_sale_item_changes_invalidate_their_ranges(db, cached_reports):
+    assert db.save_sale_items_records(cached_reports[0], [{"name": "Water", "price": 2500, "quantity": 1}])
+    assert ("product_summary", *JANUARY, "") not in _cached(db)
+    assert db.fetch_product_summary_by_date_range(*JANUARY) == [("Water", 3, 7500)]
+
+    db.fetch_product_summary_by_date_range(*FEBRUARY)
+    with db._connections.writer() as conn:
+        conn.execute("DELETE FROM SaleItems WHERE SaleID = ?", (cached_reports[1],))
+        conn.commit()
+    assert ("product_summary", *FEBRUARY, "") not in _cached(db)
+    assert db.fetch_product_summary_by_date_range(*FEBRUARY) == []
+
+
+def test_product_rename_invalidates_product_summaries(db, cached_reports):
+    assert db.update_product_in_db("Water", "Spring Water", 2500)
+
+    assert _cached(db) == {("sales_stats", *JANUARY, ""), ("sales_stats", *JANUARY, "Ana"),
+                           ("sales_stats", *FEBRUARY, "")}
+    assert db.fetch_product_summary_by_date_range(*JANUARY) == [("Spring Water", 2, 5000)]
+
+
+def test_customer_rename_invalidates_customer_reports(db, cached_reports):
+    customer_id = db.fetch_customer_by_name("Ana")[0]
+    assert db.update_customer_in_db(customer_id, "Anna", None, None)
+
+    assert ("sales_stats", *JANUARY, "Ana") not in _cached(db)
+    assert db.fetch_sales_stats(*JANUARY, "Ana") == (0, 0, 0)
+    assert db.fetch_sales_stats(*JANUARY, "Anna") == (5000, 2, 1)
+
+
+def test_result_computed_across_a_change_is_not_stored(db):
+    db.insert_product_to_db("Water", 2500)
+
+    def compute_while_selling():
+        result = db._compute_sales_stats(*JANUARY)
+        _sell(db, "2025-01-15T09:00:00")  # Committed after the result was computed
+        return result
+
+    assert db._cached_report("sales_stats", *JANUARY, None, compute_while_selling, tuple) == (0, 0, 0)
+    assert _cached(db) == set()
+    assert db.fetch_sales_stats(*JANUARY) == (2500, 1, 1)
+
+
+def test_report_generation_counts_changes(db, cached_reports):
+    generation = db.fetch_report_generation()
+    db.fetch_sales_stats(*JANUARY)  # Reads do not count
+    assert db.fetch_report_generation() == generation
+    assert db.update_product_in_db("Water", "Spring Water", 2500)
+    assert db.fetch_report_generation() > generation
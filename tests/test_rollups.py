@@ -0,0 +1,155 @@
+import datetime
+
+import pytest
+
+import db_operations
+
+
+def _sell(db, when, *items, customer="Ana"):
+    """Commits a sale of (product name, quantity) pairs at their current prices."""
+    prices = db.fetch_products_from_db()
+    sale_id = db.commit_sale(datetime.datetime.fromisoformat(when), customer,
+                             [{"name": name, "price": prices.get(name, 100), "quantity": quantity}
+                              for name, quantity in items])
+    assert sale_id is not None
+    return sale_id
+
+
+def _rollups(cursor):
+    cursor.execute("SELECT * FROM DailySales ORDER BY SaleDate")
+    daily = cursor.fetchall()
+    cursor.execute("SELECT * FROM DailyProductSales ORDER BY SaleDate, ProductID, ProductName")
+    return daily, cursor.fetchall()
+
+
+def _assert_rollups_match_recompute(db):
+    """The trigger-maintained rollups must equal a rebuild_rollups() recompute from the raw rows."""
+    with db._connections.writer() as conn:
+        cursor = conn.cursor()
+        maintained = _rollups(cursor)
+        cursor.execute("SAVEPOINT recompute")
+        db.rebuild_rollups(cursor)
+        recomputed = _rollups(cursor)
+        cursor.execute("ROLLBACK TO recompute")
+        cursor.execute("RELEASE recompute")
+    assert maintained == recomputed
+    return maintained
+
+
+@pytest.fixture
+def sales(db):
+    db.insert_product_to_db("Water", 2500)
+    db.insert_product_to_db("Ice", 1200)
+    return [
+        _sell(db, "2025-01-01T08:00:00", ("Water", 2), ("Ice", 1)),
+        _sell(db, "2025-01-01T23:59:59", ("Water", 1)),
+        _sell(db, "2025-01-02T00:00:00", ("Ice", 3), ("Loose Item", 1)),
+        _sell(db, "2025-01-03T12:30:00", ("Water", 4), customer="Ben"),
+    ]
+
+
+def test_rollups_follow_inserted_sales(db, sales):
+    daily, _ = _assert_rollups_match_recompute(db)
+    assert daily == [("2025-01-01", 8700, 2, 4), ("2025-01-02", 3700, 1, 4), ("2025-01-03", 10000, 1, 4)]
+
+
+def test_rollups_follow_deleted_sales(db, sales):
+    assert db.delete_sale_from_db(sales[0])
+    assert db.delete_sale_from_db(sales[3])
+    daily, _ = _assert_rollups_match_recompute(db)
+    assert daily == [("2025-01-01", 2500, 1, 1), ("2025-01-02", 3700, 1, 4)]
+
+
+def test_rollups_follow_deleted_products(db, sales):
+    assert db.delete_product_from_db("Water")
+    _, product_rows = _assert_rollups_match_recompute(db)
+    assert ("2025-01-03", 0, "Water", 4, 10000) in product_rows  # Moved to the name snapshot key
+
+    # A new product with the old name shares the deleted one's summary row
+    db.insert_product_to_db("Water", 2500)
+    _sell(db, "2025-01-03T13:00:00", ("Water", 1))
+    _assert_rollups_match_recompute(db)
+    assert db._fetch_product_summary("2025-01-01T00:00:00", "2025-01-04T00:00:00")[-1] == ("Water", 8, 20000)
+
+
+def test_rollup_reports_match_raw_rows(db, sales):
+    start, end = "2025-01-01T06:00:00", "2025-01-03T13:00:00"  # Partial edges on both sides
+    with db._connections.reader() as conn:
+        raw_summary = conn.execute(db._product_summary_sql(), (start, end)).fetchall()
+    assert db._fetch_product_summary(start, end) == raw_summary
+    assert db._compute_sales_stats(start, end) == (22400, 12, 4)
+    assert db._compute_sales_stats("2025-01-01T09:00:00", "2025-01-03T12:00:00") == (6200, 5, 2)
+
+
+def test_dashboard_stats_bring_the_summary_and_generation(db, sales):
+    day = datetime.date(2025, 1, 1)
+    periods = {"first": (day, day + datetime.timedelta(days=1)), "all": (day, day + datetime.timedelta(days=3))}
+
+    stats, product_summary, generation = db.fetch_dashboard_stats(periods, summary_period="all")
+
+    assert stats == {"first": (8700, 4, 2), "all": (22400, 12, 4)}
+    assert product_summary == db.fetch_product_summary_by_date_range("2025-01-01T00:00:00", "2025-01-04T00:00:00")
+    assert generation == db.fetch_report_generation()
+    assert db.fetch_dashboard_stats(periods) == (stats, None, generation)
+    assert db.fetch_dashboard_stats({}) == ({}, None, None)
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    # Aligned to midnight: whole days only
+    ("2025-01-01T00:00:00", "2025-01-04T00:00:00", (("2025-01-01", "2025-01-04"), [])),
+    ("2025-01-01T00:00:00", "2025-01-02T00:00:00", (("2025-01-01", "2025-01-02"), [])),
+    # Partial edges on both sides
+    ("2025-01-01T10:00:00", "2025-01-04T05:00:00",
+     (("2025-01-02", "2025-01-04"),
+      [("2025-01-01T10:00:00", "2025-01-02T00:00:00"), ("2025-01-04T00:00:00", "2025-01-04T05:00:00")])),
+    ("2025-01-01T00:00:00.500000", "2025-01-03T00:00:00",
+     (("2025-01-02", "2025-01-03"), [("2025-01-01T00:00:00.500000", "2025-01-02T00:00:00")])),
+    # Across a month end
+    ("2025-01-31T00:00:00", "2025-02-02T00:00:00", (("2025-01-31", "2025-02-02"), [])),
+    # No whole day inside: the range stays raw
+    ("2025-01-01T10:00:00", "2025-01-02T05:00:00", (None, [("2025-01-01T10:00:00", "2025-01-02T05:00:00")])),
+    ("2025-01-01T06:00:00", "2025-01-02T06:00:00", (None, [("2025-01-01T06:00:00", "2025-01-02T06:00:00")])),
+    ("2025-01-02T00:00:00", "2025-01-01T00:00:00", (None, [("2025-01-02T00:00:00", "2025-01-01T00:00:00")])),
+    # Unparseable input is passed through as one raw range
+    ("yesterday", "2025-01-02T00:00:00", (None, [("yesterday", "2025-01-02T00:00:00")])),
+    (None, "2025-01-02T00:00:00", (None, [(None, "2025-01-02T00:00:00")])),
+])
+def test_split_whole_days(start, end, expected):
+    assert db_operations._split_whole_days(start, end) == expected
+
+
+# Thursday, Sunday, Monday (twice), the next Sunday and a Saturday in the next month
+BUCKET_SALES = ["2025-01-30T09:00:00", "2025-02-02T23:00:00", "2025-02-03T00:00:00", "2025-02-03T18:00:00",
+                "2025-02-09T10:00:00", "2025-03-01T08:00:00"]
+
+
+def _bucket_start(day, bucket):
+    if bucket == "week":
+        return day - datetime.timedelta(days=day.weekday())  # Monday
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+@pytest.mark.parametrize("bucket", ["day", "week", "month"])
+@pytest.mark.parametrize("start, end", [("2025-01-01", "2025-04-01"), ("2025-02-02", "2025-02-10"),
+                                        ("2025-02-03", "2025-03-01")])
+def test_sales_buckets_match_raw_sales(db, bucket, start, end):
+    db.insert_product_to_db("Water", 2500)
+    for index, when in enumerate(BUCKET_SALES, 1):
+        _sell(db, when, ("Water", index))
+
+    expected = {}
+    for index, when in enumerate(BUCKET_SALES, 1):
+        day = datetime.date.fromisoformat(when[:10])
+        if start <= str(day) < end:
+            revenue, items, count = expected.get(str(_bucket_start(day, bucket)), (0, 0, 0))
+            expected[str(_bucket_start(day, bucket))] = (revenue + 2500 * index, items + index, count + 1)
+    assert db.fetch_sales_buckets(start, end, bucket) == [(key,) + value for key, value in sorted(expected.items())]
+    assert db.fetch_sales_buckets(datetime.date.fromisoformat(start), datetime.date.fromisoformat(end), bucket) == \
+           db.fetch_sales_buckets(start, end, bucket)
+
+
+def test_sales_buckets_reject_an_unknown_bucket(db):
+    with pytest.raises(ValueError):
+        db.fetch_sales_buckets("2025-01-01", "2025-02-01", "year")
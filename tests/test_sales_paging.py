@@ -0,0 +1,75 @@
+import datetime
+
+import pytest
+
+# (timestamp, customer); several sales share a timestamp so the SaleID tie-break is exercised
+SALES = [
+    ("2025-03-01T09:00:00", "Ana"),
+    ("2025-03-01T09:00:00", "Ben"),
+    ("2025-03-01T09:00:00", "Ana"),
+    ("2025-03-02T10:00:00", "Carla"),
+    ("2025-02-27T08:00:00", "Ben"),  # Back-dated: a higher SaleID that sorts before the others
+    ("2025-03-03T11:00:00", "Ana"),
+    ("2025-03-03T11:00:00", "Ana"),
+]
+
+
+@pytest.fixture
+def sale_ids(db):
+    return [db.commit_sale(datetime.datetime.fromisoformat(timestamp), customer,
+                           [{"name": "Water", "price": 2500, "quantity": 1}])
+            for timestamp, customer in SALES]
+
+
+def _expected(sale_ids, customer=None):
+    """(SaleID, ReceiptNo) newest first, numbering the matching sales oldest first."""
+    matching = sorted((SALES[index][0], sale_id) for index, sale_id in enumerate(sale_ids)
+                      if customer is None or SALES[index][1] == customer)
+    return [(sale_id, receipt_no) for receipt_no, (timestamp, sale_id) in enumerate(matching, 1)][::-1]
+
+
+def _all_pages(db, limit, filters=None):
+    pages, after_key = [], None
+    while True:
+        page = db.fetch_sales_page(after_key, limit, filters)
+        assert len(page) <= limit
+        pages.append(page)
+        if len(page) < limit:
+            return pages
+        last = page[-1]
+        after_key = (last[1], last[0], last[4])
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, len(SALES), len(SALES) + 1])
+def test_pages_cover_every_sale_once_in_order(db, sale_ids, limit):
+    pages = _all_pages(db, limit)
+
+    rows = [row for page in pages for row in page]
+    assert [(row[0], row[4]) for row in rows] == _expected(sale_ids)
+    assert len(pages) == len(SALES) // limit + 1  # A final short (possibly empty) page ends the list
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+@pytest.mark.parametrize("limit", [1, 2, 5])
+def test_filtered_pages_number_matching_sales_only(db, sale_ids, limit):
+    rows = [row for page in _all_pages(db, limit, {"customer_prefix": "an"}) for row in page]
+    assert [(row[0], row[4]) for row in rows] == _expected(sale_ids, "Ana")
+
+
+def test_page_after_the_oldest_sale_is_empty(db, sale_ids):
+    oldest = db.fetch_sales_page(limit=len(SALES))[-1]
+    assert oldest[4] == 1
+    assert db.fetch_sales_page((oldest[1], oldest[0], oldest[4])) == []
+
+
+def test_empty_history_has_an_empty_first_page(db):
+    assert db.fetch_sales_page() == []
+
+
+def test_sales_since_watermark_are_numbered_like_pages(db, sale_ids):
+    watermark = sale_ids[3]
+    new_sales = db.fetch_sales_since(watermark)
+
+    assert [row[0] for row in new_sales] == [sale_id for sale_id, _ in _expected(sale_ids) if sale_id > watermark]
+    first_page = {row[0]: row for row in db.fetch_sales_page()}
+    assert all(first_page[row[0]] == row for row in new_sales)
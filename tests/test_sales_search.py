@@ -0,0 +1,121 @@
+import datetime
+
+import pytest
+
+import db_operations
+
+PRICES = {"Water": 2500, "Ice": 1200}
+
+# (timestamp, customer, [(product, quantity)])
+SALES = [
+    ("2025-03-01T09:00:00", "Juan dela Cruz", [("Water", 1)]),
+    ("2025-03-01T18:30:00", "Ana", [("Ice", 2)]),
+    ("2025-03-02T10:00:00", "juana", [("Water", 2), ("Ice", 1)]),
+    ("2025-03-03T11:00:00", "Ben", [("Water", 4)]),
+    ("2025-03-04T12:00:00", "N/A", [("Ice", 1)]),
+    ("2025-03-05T08:00:00", "Ana", [("Water", 1), ("Ice", 1)]),
+]
+
+
+@pytest.fixture(params=[True, False], ids=["fts", "like"])
+def sales(request, db, monkeypatch):
+    """Sale IDs of SALES, searched through the FTS5 index or (without it) the LIKE fallback."""
+    if request.param and not db._search_index_ready:
+        pytest.skip("SQLite build without FTS5")
+    monkeypatch.setattr(db, "_search_index_ready", request.param)
+    for name, price in PRICES.items():
+        db.insert_product_to_db(name, price)
+    return [db.commit_sale(datetime.datetime.fromisoformat(timestamp), customer,
+                           [{"name": name, "price": PRICES[name], "quantity": quantity} for name, quantity in items])
+            for timestamp, customer, items in SALES]
+
+
+def _total(items):
+    return sum(PRICES[name] * quantity for name, quantity in items)
+
+
+def _matches(sale_id, sale, filters):
+    """Brute-force version of the filters for one SALES entry."""
+    timestamp, customer, items = sale
+    if "customer_prefix" in filters and not customer.casefold().startswith(filters["customer_prefix"].casefold()):
+        return False
+    if "start_dt" in filters and timestamp < filters["start_dt"]:
+        return False
+    if "end_dt_exclusive" in filters and timestamp >= filters["end_dt_exclusive"]:
+        return False
+    if "min_total_cents" in filters and _total(items) < filters["min_total_cents"]:
+        return False
+    if "max_total_cents" in filters and _total(items) > filters["max_total_cents"]:
+        return False
+    if "sale_id" in filters and sale_id != filters["sale_id"]:
+        return False
+    if "text" in filters:
+        words = (customer + " " + " ".join(name for name, _ in items)).casefold().split()
+        if not all(any(word.startswith(typed) for word in words) for typed in filters["text"].casefold().split()):
+            return False
+    return True
+
+
+def _expected(sale_ids, filters):
+    """(SaleID, ReceiptNo) newest first, numbering the matching sales oldest first."""
+    matching = sorted((SALES[index][0], sale_id) for index, sale_id in enumerate(sale_ids)
+                      if _matches(sale_id, SALES[index], filters))
+    return [(sale_id, receipt_no) for receipt_no, (_, sale_id) in enumerate(matching, 1)][::-1]
+
+
+def _search(filters):
+    return [(row[0], row[4]) for row in db_operations.fetch_sales_page(limit=len(SALES) + 1, filters=filters)]
+
+
+@pytest.mark.parametrize("filters", [
+    {"customer_prefix": "jua"},
+    {"customer_prefix": "AN"},
+    {"customer_prefix": "Juan dela Cruz"},
+    {"start_dt": "2025-03-02T00:00:00"},
+    {"start_dt": "2025-03-02T10:00:00"},  # Inclusive
+    {"end_dt_exclusive": "2025-03-02T10:00:00"},  # Exclusive
+    {"min_total_cents": 2500},
+    {"max_total_cents": 3700},
+    {"text": "ice"},
+    {"text": "CRUZ"},
+    {"text": "wat ice"},  # Every word must match, each at the start of a word
+    {"text": "ben water"},
+    {"text": "juan"},
+])
+def test_each_filter_alone(sales, filters):
+    expected = _expected(sales, filters)
+    assert expected and len(expected) < len(SALES)  # The filter is actually selective here
+    assert _search(filters) == expected
+
+
+def test_sale_id_filter(sales):
+    assert _search({"sale_id": sales[2]}) == [(sales[2], 1)]
+    assert _search({"sale_id": max(sales) + 1}) == []
+
+
+@pytest.mark.parametrize("filters", [
+    {"customer_prefix": "an", "min_total_cents": 3000},
+    {"start_dt": "2025-03-01T12:00:00", "end_dt_exclusive": "2025-03-05T00:00:00", "text": "ice"},
+    {"min_total_cents": 2400, "max_total_cents": 6200, "text": "water"},
+    {"customer_prefix": "ju", "start_dt": "2025-03-02T00:00:00", "max_total_cents": 6200, "text": "ice"},
+    {"customer_prefix": "b", "text": "ice"},  # Nothing matches both
+])
+def test_filters_combined(sales, filters):
+    assert _search(filters) == _expected(sales, filters)
+
+
+def test_every_filter_at_once(sales):
+    filters = {"customer_prefix": "ana", "start_dt": "2025-03-01T00:00:00", "end_dt_exclusive": "2025-03-06T00:00:00",
+               "min_total_cents": 2000, "max_total_cents": 4000, "sale_id": sales[5], "text": "water"}
+    assert set(filters) == set(db_operations.SALES_FILTER_KEYS)
+    assert _search(filters) == [(sales[5], 1)]
+    assert _search(dict(filters, sale_id=sales[1])) == []  # Ana's other sale has no water
+
+
+def test_empty_filters_return_every_sale(sales):
+    assert _search({}) == _search(None) == _expected(sales, {})
+
+
+def test_unknown_filter_is_rejected():
+    with pytest.raises(ValueError):
+        db_operations._sales_filter_sql({"customer": "Ana"})
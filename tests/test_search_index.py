@@ -0,0 +1,203 @@
+import random
+
+import pytest
+
+from search_index import PrefixIndex, TrigramIndex
+
+
+def _brute_force(customers, query):
+    query = query.casefold()
+    return {key for key, fields in customers.items() if any(query in (field or "").casefold() for field in fields)}
+
+
+CUSTOMERS = {
+    1: ("Juan dela Cruz", "0917-555-0101", "12 Rizal St"),
+    2: ("Maria Clara", None, "Rizal Ave"),
+    3: ("JUANITA", "0918", None),
+    4: ("An", "", ""),
+    5: ("Crisostomo Ibarra", "0917-555-0199", "Calle Real"),
+}
+
+
+@pytest.fixture
+def trigram_index():
+    index = TrigramIndex()
+    for key, fields in CUSTOMERS.items():
+        index.add(key, *fields)
+    return index
+
+
+@pytest.mark.parametrize("query", ["juan", "JUAN", "Cruz", "rizal", "0917", "555-01", "a", "An", "an", "z",
+                                   "ia c", "xyz", "juan dela cruz", "Calle Real", "Crisostomo Ibarra!"])
+def test_trigram_search_matches_substring_scan(trigram_index, query):
+    assert trigram_index.search(query) == _brute_force(CUSTOMERS, query)
+
+
+def test_trigram_search_short_and_empty_queries(trigram_index):
+    assert trigram_index.search("") == set(CUSTOMERS)
+    assert trigram_index.search("n") == {1, 3, 4}  # Shorter than a trigram: scanned
+    assert trigram_index.search("an") == {1, 3, 4}
+    assert trigram_index.search("RA") == {2, 5}
+    assert trigram_index.search("q") == set()
+
+
+@pytest.mark.parametrize("query", ["cruz0917", "Cruz 0917", "z0", "uz0", "0101 12", "010112", "clararizal",
+                                   "juanita0918", "ta0"])
+def test_trigram_search_never_matches_across_fields(trigram_index, query):
+    joined = {key: "".join(field or "" for field in fields).casefold() for key, fields in CUSTOMERS.items()}
+    spaced = {key: " ".join(field or "" for field in fields).casefold() for key, fields in CUSTOMERS.items()}
+    assert any(query.casefold() in text for text in list(joined.values()) + list(spaced.values()))
+    assert trigram_index.search(query) == set()
+
+
+def test_trigram_remove_and_re_add(trigram_index):
+    trigram_index.remove(1)
+    assert 1 not in trigram_index
+    assert len(trigram_index) == len(CUSTOMERS) - 1
+    assert trigram_index.search("juan") == {3}
+    assert trigram_index.search("cruz") == set()
+    trigram_index.remove(1)  # Removing a missing key is a no-op
+
+    trigram_index.add(1, "Juan Santos", None, None)
+    assert trigram_index.search("juan") == {1, 3}
+    assert trigram_index.search("cruz") == set()
+    assert trigram_index.search("santos") == {1}
+
+
+def test_trigram_add_replaces_previous_fields(trigram_index):
+    trigram_index.add(2, "Maria Makiling", None, None)
+    assert trigram_index.search("clara") == set()
+    assert trigram_index.search("rizal") == {1}
+    assert trigram_index.search("makiling") == {2}
+    assert len(trigram_index) == len(CUSTOMERS)
+
+
+def test_trigram_remove_drops_unused_postings():
+    index = TrigramIndex()
+    index.add("a", "abcdef")
+    index.add("b", "abcxyz")
+    index.remove("a")
+    index.remove("b")
+    assert len(index) == 0
+    assert not index._postings
+
+
+# Most active first, so each name's rank is its position
+RANKED_NAMES = ["Juan dela Cruz", "maria clara", "Juanita", "Ana", "Juan Santos", "Andres", "ana", "Zed"]
+
+
+@pytest.fixture
+def prefix_index():
+    return PrefixIndex(RANKED_NAMES)
+
+
+def test_prefix_lookup_is_case_insensitive(prefix_index):
+    assert prefix_index.lookup("MARIA CLARA") == "maria clara"
+    assert prefix_index.lookup("juan") is None
+    assert "juanita" in prefix_index
+    assert prefix_index.rank("ANA") == 3  # A later case variant keeps the first spelling and rank
+    assert prefix_index.lookup("ana") == "Ana"
+    assert len(prefix_index) == len(RANKED_NAMES) - 1
+
+
+def test_prefix_completion_ranks_best_first(prefix_index):
+    assert prefix_index.complete("ju") == ["Juan dela Cruz", "Juanita", "Juan Santos"]
+    assert prefix_index.complete("JUAN ") == ["Juan dela Cruz", "Juan Santos"]
+    assert prefix_index.complete("an") == ["Ana", "Andres"]
+    assert prefix_index.complete("juan dela cruz") == ["Juan dela Cruz"]
+    assert prefix_index.complete("juan dela cruzz") == []
+    assert prefix_index.complete("b") == []
+    assert prefix_index.complete("z") == ["Zed"]
+
+
+def test_prefix_completion_of_short_prefixes(prefix_index):
+    assert prefix_index.complete("") == ["Juan dela Cruz", "maria clara", "Juanita", "Ana", "Juan Santos",
+                                         "Andres", "Zed"]
+    assert prefix_index.complete("", limit=2) == ["Juan dela Cruz", "maria clara"]
+    assert prefix_index.complete("j", limit=2) == ["Juan dela Cruz", "Juanita"]
+    assert prefix_index.complete("j", limit=0) == []
+
+
+def test_prefix_completion_breaks_rank_ties_alphabetically():
+    index = PrefixIndex()
+    for name in ["carlo", "Bea", "ben", "Abe", "bert"]:
+        index.add(name, rank=5)
+    index.add("Bong", rank=1)
+    assert index.complete("b") == ["Bong", "Bea", "ben", "bert"]
+    assert index.complete("") == ["Bong", "Abe", "Bea", "ben", "bert", "carlo"]
+    assert index.complete("", limit=3) == ["Bong", "Abe", "Bea"]
+
+
+def test_prefix_names_added_without_rank_go_last(prefix_index):
+    prefix_index.add("Juana")
+    assert prefix_index.rank("Juana") == len(RANKED_NAMES)
+    assert prefix_index.complete("juan") == ["Juan dela Cruz", "Juanita", "Juan Santos", "Juana"]
+    prefix_index.add("Juancho", rank=100)
+    prefix_index.add("Juanito")
+    assert prefix_index.rank("Juanito") == 101
+
+
+def test_prefix_remove_and_re_add(prefix_index):
+    prefix_index.remove("JUANITA")
+    assert "Juanita" not in prefix_index
+    assert prefix_index.lookup("juanita") is None
+    assert prefix_index.rank("juanita") is None
+    assert prefix_index.complete("juan") == ["Juan dela Cruz", "Juan Santos"]
+    prefix_index.remove("Juanita")  # Removing a missing name is a no-op
+    assert len(prefix_index) == len(RANKED_NAMES) - 2
+
+    prefix_index.add("JUANITA", rank=-1)
+    assert prefix_index.lookup("juanita") == "JUANITA"
+    assert prefix_index.complete("juan") == ["JUANITA", "Juan dela Cruz", "Juan Santos"]
+
+
+def test_prefix_add_replaces_a_case_variant(prefix_index):
+    prefix_index.add("MARIA CLARA", prefix_index.rank("maria clara"))
+    assert prefix_index.lookup("Maria Clara") == "MARIA CLARA"
+    assert prefix_index.complete("m") == ["MARIA CLARA"]
+    assert len(prefix_index) == len(RANKED_NAMES) - 1
+
+
+def test_prefix_completions_are_refreshed_after_changes(prefix_index):
+    assert prefix_index.complete("an") == ["Ana", "Andres"]
+    assert prefix_index.complete("an") == ["Ana", "Andres"]  # Served from the completion cache
+
+    prefix_index.add("Angela", rank=-1)
+    assert prefix_index.complete("an") == ["Angela", "Ana", "Andres"]
+    assert prefix_index.complete("an", limit=1) == ["Angela"]
+
+    prefix_index.remove("Ana")
+    assert prefix_index.complete("an") == ["Angela", "Andres"]
+    assert prefix_index.complete("an", limit=1) == ["Angela"]
+
+    prefix_index.remove("Angela")
+    prefix_index.add("Angela")  # Re-added without a rank: now last
+    assert prefix_index.complete("an") == ["Andres", "Angela"]
+
+
+def test_prefix_completions_are_copies(prefix_index):
+    for prefix in ["an", "juan"]:  # A ranked short prefix and a remembered longer one
+        prefix_index.complete(prefix).clear()
+        assert prefix_index.complete(prefix) != []
+
+
+def test_prefix_completion_matches_brute_force_through_changes():
+    rng = random.Random(7)
+    names = ["".join(rng.choice("abAB ") for _ in range(rng.randint(1, 5))) for _ in range(300)]
+    index = PrefixIndex(names)
+    expected = {}  # casefolded name -> (rank, name)
+    for rank, name in enumerate(names):
+        expected.setdefault(name.casefold(), (rank, name))
+    for step in range(300):
+        name = rng.choice(names)
+        if rng.random() < 0.4:
+            index.remove(name)
+            expected.pop(name.casefold(), None)
+        else:
+            rank = rng.randint(-5, 400)
+            index.add(name, rank)
+            expected[name.casefold()] = (rank, name)
+        prefix = name[:rng.randint(0, 4)].upper()
+        limit = rng.randint(0, 12)
+        best = sorted((rank, key) for key, (rank, _) in expected.items() if key.startswith(prefix.casefold()))
+        assert index.complete(prefix, limit) == [expected[key][1] for _, key in best[:limit]], step
@@ -0,0 +1,136 @@
+import datetime
+
+import pytest
+
+WHEN = datetime.datetime(2025, 4, 1, 9, 30)
+
+
+@pytest.fixture
+def db(db):
+    if not db._search_index_ready:
+        pytest.skip("SQLite build without FTS5")
+    for name, price in [("Water", 2500), ("Ice", 1200), ("Cup", 5)]:
+        db.insert_product_to_db(name, price)
+    db.add_customer_to_db("Ana Cruz", "0917", "Rizal St")
+    db.add_customer_to_db("Ben", None, "Cruz Ave")
+    return db
+
+
+def _sale(db, customer, *names):
+    return db.commit_sale(WHEN, customer, [{"name": name, "price": 100, "quantity": 1} for name in names])
+
+
+def _customer_id(db, name):
+    return db.fetch_customer_by_name(name)[0]
+
+
+def _assert_in_sync(db):
+    """Both full-text tables index exactly what Customers, Sales and SaleItems hold now."""
+    with db._connections.writer() as conn:
+        # Checks the external content index against the Customers rows themselves (writes nothing)
+        conn.execute("INSERT INTO CustomerSearch (CustomerSearch, rank) VALUES ('integrity-check', 1)")
+        conn.rollback()
+    with db._connections.reader() as conn:
+        customers = conn.execute("SELECT CustomerID, CustomerName, ContactNumber, Address FROM Customers").fetchall()
+        for word in {word.casefold() for row in customers for field in row[1:] for word in (field or "").split()}:
+            indexed = {row[0] for row in conn.execute(
+                "SELECT rowid FROM CustomerSearch WHERE CustomerSearch MATCH ?", (f'"{word}"',))}
+            assert indexed == {row[0] for row in customers
+                               if any(word in (field or "").casefold().split() for field in row[1:])}, word
+
+        expected = {sale_id: (customer, []) for sale_id, customer in conn.execute(
+            "SELECT SaleID, CustomerName FROM Sales")}
+        for sale_id, name in conn.execute("""
+                SELECT si.SaleID, COALESCE(p.ProductName, si.ProductName)
+                FROM SaleItems si LEFT JOIN Products p ON p.ProductID = si.ProductID"""):
+            expected[sale_id][1].extend(name.split())
+        indexed = {sale_id: (customer, product_names.split()) for sale_id, customer, product_names in conn.execute(
+            "SELECT rowid, CustomerName, ProductNames FROM SaleSearch")}
+    assert {key: (customer, sorted(names)) for key, (customer, names) in indexed.items()} == \
+           {key: (customer, sorted(names)) for key, (customer, names) in expected.items()}
+
+
+def _customer_names(db, text):
+    return {row[1] for row in db.search_customers(text)}
+
+
+def _sale_ids(db, text):
+    return {row[0] for row in db.search_sales(text)}
+
+
+def test_customer_add_rename_and_delete_keep_the_index_in_sync(db):
+    _assert_in_sync(db)
+    assert _customer_names(db, "cruz") == {"Ana Cruz", "Ben"}
+
+    db.add_customer_to_db("Carla Reyes", "0918", None)
+    _assert_in_sync(db)
+    assert _customer_names(db, "reyes 0918") == {"Carla Reyes"}
+
+    db.update_customer_in_db(_customer_id(db, "Ana Cruz"), "Ana Santos", "0919", "Mabini St")
+    _assert_in_sync(db)
+    assert _customer_names(db, "cruz") == {"Ben"}  # Old name and address are gone from the index
+    assert _customer_names(db, "0917") == set()
+    assert _customer_names(db, "santos mabini") == {"Ana Santos"}
+
+    db.delete_customer_from_db(_customer_id(db, "Ben"))
+    _assert_in_sync(db)
+    assert _customer_names(db, "cruz") == set()
+    assert _customer_names(db, "ben") == set()
+
+
+def test_sale_insert_and_delete_keep_the_index_in_sync(db):
+    first = _sale(db, "Ana Cruz", "Water", "Ice")
+    second = _sale(db, "Ben", "Cup")
+    loose = _sale(db, "N/A", "Loose Item")  # Not a product: indexed by its snapshot name
+    _assert_in_sync(db)
+    assert _sale_ids(db, "ice") == {first}
+    assert _sale_ids(db, "ben cup") == {second}
+    assert _sale_ids(db, "loose") == {loose}
+
+    db.delete_sale_from_db(first)  # Its items go by cascade
+    _assert_in_sync(db)
+    assert _sale_ids(db, "ice") == set()
+    assert _sale_ids(db, "ana") == set()
+
+
+def test_item_inserts_and_deletes_update_the_product_names(db):
+    sale_id = _sale(db, "Ana Cruz", "Water")
+    _assert_in_sync(db)
+
+    with db._connections.writer() as conn:
+        conn.execute("""
+            INSERT INTO SaleItems (SaleID, ProductID, Quantity, PriceAtSaleCents, SubtotalCents)
+            SELECT ?, ProductID, 1, 1200, 1200 FROM Products WHERE ProductName = 'Ice'
+        """, (sale_id,))
+        conn.commit()
+    _assert_in_sync(db)
+    assert _sale_ids(db, "water ice") == {sale_id}
+
+    with db._connections.writer() as conn:
+        conn.execute("DELETE FROM SaleItems WHERE SaleID = ? AND ProductID IS NOT NULL", (sale_id,))
+        conn.commit()
+    _assert_in_sync(db)
+    assert _sale_ids(db, "water") == set()
+    assert _sale_ids(db, "ana") == {sale_id}  # The receipt is still found by its customer
+
+
+def test_product_and_customer_renames_update_sale_search(db):
+    water_sale = _sale(db, "Ana Cruz", "Water", "Cup")
+    other_sale = _sale(db, "Ben", "Ice")
+
+    db.update_product_in_db("Water", "Mineral Water", 2500)
+    _assert_in_sync(db)
+    assert _sale_ids(db, "mineral") == {water_sale}
+    assert _sale_ids(db, "water cup") == {water_sale}
+
+    db.update_customer_in_db(_customer_id(db, "Ben"), "Benjamin Reyes", None, "Cruz Ave")
+    _assert_in_sync(db)
+    assert _sale_ids(db, "reyes ice") == {other_sale}
+
+    db.delete_product_from_db("Mineral Water")  # The items keep the name as a snapshot
+    _assert_in_sync(db)
+    assert _sale_ids(db, "mineral") == {water_sale}
+
+    db.delete_customer_from_db(_customer_id(db, "Ana Cruz"))  # The sale keeps its customer name
+    _assert_in_sync(db)
+    assert _sale_ids(db, "ana mineral") == {water_sale}